@@ -1,28 +1,31 @@
 from fastapi import APIRouter, HTTPException, status,Depends
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime
 from app.models.user import UserCreate, UserLogin, Token
-from app.core.security import get_password_hash, verify_password, create_access_token,get_current_user
+from app.core.security import aget_password_hash, averify_password, create_access_token,get_current_user
 from app.db.mongodb import db
+from app.utils.logger import get_logger
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
+logger = get_logger(__name__)
 
 @router.post("/register", response_model=Token)
 async def register(user: UserCreate):
-    print(f"\n Registration attempt: {user.email}")
+    logger.info("Registration attempt: %s", user.email)
     
     database = db.get_db()
     users_collection = database["users"]
     
     existing_user = await users_collection.find_one({"email": user.email})
     if existing_user:
-        print(f" User already exists: {user.email}")
+        logger.info("User already exists: %s", user.email)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
-    hashed_password = get_password_hash(user.password)
-    print(f" Password hashed")
+    hashed_password = await aget_password_hash(user.password)
+    logger.debug("Password hashed")
     
     user_document = {
         "email": user.email,
@@ -32,13 +35,21 @@ async def register(user: UserCreate):
         "is_active": True
     }
     
-    result = await users_collection.insert_one(user_document)
-    print(f" User saved with ID: {result.inserted_id}")
+    try:
+        result = await users_collection.insert_one(user_document)
+    except DuplicateKeyError:
+        # Registered concurrently, after the check above (email_unique index)
+        logger.info("User already exists: %s", user.email)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
+    logger.debug("User saved with ID: %s", result.inserted_id)
     
     access_token = create_access_token(data={"sub": user.email})
-    print(f" Token created")
+    logger.debug("Token created")
     
-    print(f" Registration successful: {user.email}")
+    logger.info("Registration successful: %s", user.email)
     
     return {
         "access_token": access_token,
@@ -48,7 +59,7 @@ async def register(user: UserCreate):
 @router.post("/login", response_model=Token)
 async def login(credentials: UserLogin):
     
-    print(f"\n Login attempt: {credentials.email}")
+    logger.info("Login attempt: %s", credentials.email)
     
     database = db.get_db()
     users_collection = database["users"]
@@ -56,27 +67,27 @@ async def login(credentials: UserLogin):
     user = await users_collection.find_one({"email": credentials.email})
     
     if not user:
-        print(f" User not found: {credentials.email}")
+        logger.info("User not found: %s", credentials.email)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    if not verify_password(credentials.password, user["hashed_password"]):
-        print(f" Invalid password for: {credentials.email}")
+    if not await averify_password(credentials.password, user["hashed_password"]):
+        logger.info("Invalid password for: %s", credentials.email)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    print(f" Password verified")
+    logger.debug("Password verified")
     
     access_token = create_access_token(data={"sub": credentials.email})
-    print(f" Token created")
+    logger.debug("Token created")
     
-    print(f" Login successful: {credentials.email}")
+    logger.info("Login successful: %s", credentials.email)
     
     return {
         "access_token": access_token,
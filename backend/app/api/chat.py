@@ -1,82 +1,449 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from bson import ObjectId
+from bson.errors import InvalidId
 from app.core.security import get_current_user
-from app.models.chat import ChatRequest, ChatResponse
+from app.models.chat import (
+    ChatRequest,
+    ChatResponse,
+    BatchChatRequest,
+    BatchChatResponse,
+    ChatHistoryItem,
+    ChatHistoryPage,
+    ChatSessionInfo,
+)
+from app.config import settings
 from app.core.rag import rag
+from app.core.conversation import Conversation
 from app.db.mongodb import db
+from app.utils.pagination import encode_cursor, decode_cursor, after_cursor
+from app.core.metrics import QUERY_STAGE_SECONDS, observe
+from app.utils.logger import get_logger
 from datetime import datetime
+from typing import Dict, List, Literal, Optional, Tuple
+import asyncio
+import json
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
+logger = get_logger(__name__)
+
+MAX_PAGE_SIZE = 100
+HISTORY_SUMMARY_CHARS = 200  # Answer characters kept in the summary view
+
+# Summary updates running after their responses, by session id
+_summary_tasks: Dict[str, asyncio.Task] = {}
+
+def _session_object_id(session_id: str) -> ObjectId:
+    try:
+        return ObjectId(session_id)
+    except InvalidId:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+
+async def _load_conversation(
+    current_user: str,
+    session_id: Optional[str]
+) -> Tuple[Optional[dict], Optional[Conversation]]:
+    """The session and its summary + recent turns (None, None without one)."""
+    if session_id is None:
+        return None, None
+    
+    # Before any coroutine is created: a bad id raises right here
+    session_object_id = _session_object_id(session_id)
+    database = db.get_db()
+    
+    async def recent_entries() -> List[dict]:
+        if settings.CHAT_MEMORY_TURNS <= 0:
+            return []
+        # One query on the (user_id, session_id, timestamp) index
+        return await database["chat_history"].find(
+            {"user_id": current_user, "session_id": session_id},
+            {"question": 1, "answer": 1, "timestamp": 1}
+        ).sort(
+            [("timestamp", -1), ("_id", -1)]
+        ).limit(settings.CHAT_MEMORY_TURNS).to_list(length=settings.CHAT_MEMORY_TURNS)
+    
+    with observe(QUERY_STAGE_SECONDS, "history"):
+        session, entries = await asyncio.gather(
+            database["chat_sessions"].find_one(
+                {"_id": session_object_id, "user_id": current_user}
+            ),
+            recent_entries()
+        )
+    if not session:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    
+    return session, Conversation.from_history(session.get("summary", ""), entries)
+
+async def _update_summary(current_user: str, session_id: str):
+    """Fold turns before the last CHAT_MEMORY_TURNS into the session summary."""
+    database = db.get_db()
+    sessions = database["chat_sessions"]
+    
+    session = await sessions.find_one({"_id": ObjectId(session_id), "user_id": current_user})
+    if not session:
+        return
+    summarized = session.get("summarized_turns", 0)
+    backlog = session.get("turns", 0) - summarized - settings.CHAT_MEMORY_TURNS
+    if backlog <= 0:
+        return
+    
+    # Oldest turns not summarized yet
+    entries = await database["chat_history"].find(
+        {"user_id": current_user, "session_id": session_id},
+        {"question": 1, "answer": 1, "timestamp": 1}
+    ).sort([("timestamp", 1), ("_id", 1)]).skip(summarized).limit(backlog).to_list(length=backlog)
+    if not entries:
+        return
+    
+    turns = Conversation.from_history("", entries[::-1]).turns
+    summary = await rag.asummarize(session.get("summary", ""), turns)
+    
+    # Another worker may have folded the same turns meanwhile; first one wins
+    await sessions.update_one(
+        {"_id": session["_id"], "summarized_turns": summarized},
+        {"$set": {"summary": summary, "summarized_turns": summarized + len(entries)}}
+    )
+    logger.debug("Folded %d turns into the summary of session %s", len(entries), session_id)
+
+def _schedule_summary(current_user: str, session_id: str):
+    if session_id in _summary_tasks:
+        return
+    
+    async def run():
+        try:
+            await _update_summary(current_user, session_id)
+        except Exception as e:
+            # Retried after the next turn; the prompt stays bounded meanwhile
+            logger.warning("Could not update summary of session %s: %s", session_id, e)
+        finally:
+            _summary_tasks.pop(session_id, None)
+    
+    _summary_tasks[session_id] = asyncio.create_task(run())
+
+async def _save_history(
+    current_user: str,
+    request: ChatRequest,
+    answer: str,
+    sources: List[str],
+    session: Optional[dict] = None
+):
+    database = db.get_db()
+    chat_collection = database["chat_history"]
+    timestamp = datetime.utcnow()
+    
+    chat_entry = {
+        "user_id": current_user,
+        "question": request.message,
+        "answer": answer,
+        "sources": sources,
+        "document_ids": request.document_ids,
+        "timestamp": timestamp
+    }
+    if session is not None:
+        chat_entry["session_id"] = request.session_id
+    
+    with observe(QUERY_STAGE_SECONDS, "history"):
+        await chat_collection.insert_one(chat_entry)
+        if session is not None:
+            await database["chat_sessions"].update_one(
+                {"_id": session["_id"]},
+                {"$inc": {"turns": 1}, "$set": {"updated_at": timestamp}}
+            )
+    logger.debug("Saved to chat history")
+    
+    # Keep the summary in step once turns fall out of the recent window
+    if session is not None:
+        unsummarized = session.get("turns", 0) + 1 - session.get("summarized_turns", 0)
+        if unsummarized > settings.CHAT_MEMORY_TURNS:
+            _schedule_summary(current_user, request.session_id)
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
 
 @router.post("/query", response_model=ChatResponse)
 async def chat_query(
     request: ChatRequest,
     current_user: str = Depends(get_current_user)
 ):
-    print(f"\n💬 Chat query from: {current_user}")
-    print(f"❓ Question: {request.message}")
+    logger.info("Chat query from: %s", current_user)
+    
+    # Step 1: Load the conversation so far (if continuing a session)
+    session, conversation = await _load_conversation(current_user, request.session_id)
     
     try:
-        # Step 1: Query RAG system
-        answer, sources = rag.query(
+        # Step 2: Query RAG system
+        answer, sources = await rag.aquery(
             user_id=current_user,
             question=request.message,
-            document_ids=request.document_ids
+            document_ids=request.document_ids,
+            conversation=conversation
         )
         
-        print(f" Answer generated from {len(sources)} sources")
+        logger.debug("Answer generated from %d sources", len(sources))
         
-        # Step 2: Save to chat history
-        database = db.get_db()
-        chat_collection = database["chat_history"]
+        # Step 3: Save to chat history
+        await _save_history(current_user, request, answer, sources, session)
         
-        chat_entry = {
-            "user_id": current_user,
-            "question": request.message,
-            "answer": answer,
-            "sources": sources,
-            "document_ids": request.document_ids,
-            "timestamp": datetime.utcnow()
-        }
-        
-        await chat_collection.insert_one(chat_entry)
-        print(f" Saved to chat history")
-        
-        # Step 3: Return response
+        # Step 4: Return response
         return ChatResponse(
             answer=answer,
             sources=sources,
+            session_id=request.session_id,
             timestamp=datetime.utcnow()
         )
     
     except Exception as e:
-        print(f"❌ Error: {e}")
+        logger.exception("Error processing query: %s", e)
         raise HTTPException(
             status_code=500, 
             detail=f"Error processing query: {str(e)}"
         )
 
-@router.get("/history")
+@router.post("/batch", response_model=BatchChatResponse)
+async def chat_batch(
+    request: BatchChatRequest,
+    current_user: str = Depends(get_current_user)
+):
+    """Answer many questions over the same documents in one call.
+
+    Results come back in question order; a question that fails gets an
+    `error` instead of an answer without failing the others.
+    """
+    logger.info("Batch query from: %s (%d questions)", current_user, len(request.questions))
+    
+    if len(request.questions) > settings.CHAT_BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.CHAT_BATCH_MAX_QUESTIONS} questions per batch"
+        )
+    
+    try:
+        # Step 1: Shared embedding + search, concurrent generation
+        outcomes = await rag.abatch_query(
+            user_id=current_user,
+            questions=request.questions,
+            document_ids=request.document_ids
+        )
+    except Exception as e:
+        logger.exception("Error processing query: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing batch: {str(e)}"
+        )
+    
+    # Step 2: Collect per-question results
+    results = []
+    history = []
+    timestamp = datetime.utcnow()
+    for question, outcome in zip(request.questions, outcomes):
+        if isinstance(outcome, BaseException):
+            logger.warning("Error for %r: %s", question, outcome)
+            results.append({"question": question, "error": str(outcome)})
+            continue
+        
+        answer, sources = outcome
+        results.append({"question": question, "answer": answer, "sources": sources})
+        history.append({
+            "user_id": current_user,
+            "question": question,
+            "answer": answer,
+            "sources": sources,
+            "document_ids": request.document_ids,
+            "timestamp": timestamp
+        })
+    
+    # Step 3: Save the answered questions to history in one write
+    if history:
+        with observe(QUERY_STAGE_SECONDS, "history"):
+            await db.get_db()["chat_history"].insert_many(history)
+        logger.debug("Saved %d entries to chat history", len(history))
+    
+    return BatchChatResponse(results=results, timestamp=timestamp)
+
+@router.post("/query/stream")
+async def chat_query_stream(
+    request: ChatRequest,
+    current_user: str = Depends(get_current_user)
+):
+    """Server-Sent Events version of /chat/query.
+
+    Emits a `sources` event as soon as retrieval is done, then `token`
+    events while the answer is generated, and `done` once it has been
+    saved to chat history (or `error` if anything fails).
+    """
+    logger.info("Streaming chat query from: %s", current_user)
+    
+    # Before the stream starts, so an unknown session is a plain 404
+    session, conversation = await _load_conversation(current_user, request.session_id)
+    
+    async def event_stream():
+        sources: List[str] = []
+        parts: List[str] = []
+        saved = False
+        try:
+            async for event, payload in rag.astream_query(
+                user_id=current_user,
+                question=request.message,
+                document_ids=request.document_ids,
+                conversation=conversation
+            ):
+                if event == "sources":
+                    sources = payload
+                    yield _sse("sources", {"sources": sources})
+                elif event == "token":
+                    parts.append(payload)
+                    yield _sse("token", {"text": payload})
+                else:
+                    saved = True
+                    await _save_history(current_user, request, payload, sources, session)
+                    yield _sse("done", {
+                        "answer": payload,
+                        "sources": sources,
+                        "session_id": request.session_id,
+                        "timestamp": datetime.utcnow()
+                    })
+        except Exception as e:
+            logger.exception("Error processing query: %s", e)
+            yield _sse("error", {"detail": f"Error processing query: {str(e)}"})
+        finally:
+            # Keep the partial answer if the client went away or generation
+            # failed midway; shielded, since a disconnect cancels this task
+            if not saved and parts:
+                try:
+                    await asyncio.shield(
+                        _save_history(current_user, request, "".join(parts), sources, session)
+                    )
+                except Exception as e:
+                    logger.error("Could not save partial answer: %s", e)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Don't let proxies buffer the stream
+        }
+    )
+
+@router.get("/history", response_model=ChatHistoryPage)
 async def get_chat_history(
     current_user: str = Depends(get_current_user),
-    limit: int = 50
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    view: Literal["summary", "full"] = "full",
+    session_id: Optional[str] = None
 ):
-   
-    print(f"\n Chat history request from: {current_user}")
+    """Newest first, one page at a time.
+
+    `view=summary` returns truncated answers without sources (sidebar);
+    fetch a single entry in full from /chat/history/{entry_id}. Pass
+    `session_id` for the turns of one conversation.
+    """
+    
+    logger.debug("Chat history request from: %s", current_user)
     
     database = db.get_db()
     chat_collection = database["chat_history"]
     
-    # Find chat history, sorted by newest first
-    cursor = chat_collection.find(
-        {"user_id": current_user}
-    ).sort("timestamp", -1).limit(limit)
+    # Step 1: Continue after the last entry of the previous page
+    match = {"user_id": current_user}
+    if session_id is not None:
+        match["session_id"] = session_id
+    if cursor:
+        try:
+            timestamp, entry_id = decode_cursor(cursor)
+            match.update(after_cursor("timestamp", timestamp, ObjectId(entry_id)))
+        except (ValueError, InvalidId):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    # Step 2: Read one extra entry to know whether there's a next page;
+    # the summary view truncates answers inside MongoDB
+    if view == "summary":
+        projection = {
+            "question": 1,
+            "timestamp": 1,
+            "answer": {"$substrCP": ["$answer", 0, HISTORY_SUMMARY_CHARS]},
+            "answer_truncated": {"$gt": [{"$strLenCP": "$answer"}, HISTORY_SUMMARY_CHARS]},
+        }
+    else:
+        projection = {"user_id": 0}
+    
+    history = await chat_collection.aggregate([
+        {"$match": match},
+        {"$sort": {"timestamp": -1, "_id": -1}},
+        {"$limit": limit + 1},
+        {"$project": projection},
+    ]).to_list(length=limit + 1)
     
-    history = await cursor.to_list(length=limit)
+    next_cursor = None
+    if len(history) > limit:
+        history = history[:limit]
+        next_cursor = encode_cursor(history[-1]["timestamp"], str(history[-1]["_id"]))
     
     # Convert ObjectId to string for JSON serialization
     for item in history:
         item["_id"] = str(item["_id"])
     
-    print(f" Found {len(history)} messages")
+    logger.debug("Found %d messages", len(history))
+    
+    return {"items": history, "next_cursor": next_cursor}
+
+@router.get("/history/{entry_id}", response_model=ChatHistoryItem)
+async def get_chat_entry(
+    entry_id: str,
+    current_user: str = Depends(get_current_user)
+):
+    try:
+        object_id = ObjectId(entry_id)
+    except InvalidId:
+        raise HTTPException(status_code=404, detail="Chat entry not found")
+    
+    database = db.get_db()
+    entry = await database["chat_history"].find_one(
+        {"_id": object_id, "user_id": current_user}
+    )
+    if not entry:
+        raise HTTPException(status_code=404, detail="Chat entry not found")
+    
+    entry["_id"] = str(entry["_id"])
+    return entry
+
+@router.post("/sessions", response_model=ChatSessionInfo, status_code=201)
+async def create_chat_session(current_user: str = Depends(get_current_user)):
+    """Start a conversation; pass its id as `session_id` with each question."""
+    now = datetime.utcnow()
+    session = {
+        "user_id": current_user,
+        "turns": 0,
+        "summary": "",  # Turns before the recent ones, summarized
+        "summarized_turns": 0,
+        "created_at": now,
+        "updated_at": now
+    }
+    
+    result = await db.get_db()["chat_sessions"].insert_one(session)
+    logger.info("Chat session created: %s", result.inserted_id)
+    
+    session["_id"] = str(result.inserted_id)
+    return session
+
+@router.delete("/sessions/{session_id}")
+async def delete_chat_session(
+    session_id: str,
+    current_user: str = Depends(get_current_user)
+):
+    database = db.get_db()
+    
+    result = await database["chat_sessions"].delete_one(
+        {"_id": _session_object_id(session_id), "user_id": current_user}
+    )
+    if not result.deleted_count:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    
+    # Its turns go with it
+    removed = await database["chat_history"].delete_many(
+        {"user_id": current_user, "session_id": session_id}
+    )
+    logger.info("Chat session deleted: %s (%d turns)", session_id, removed.deleted_count)
     
-    return history
\ No newline at end of file
+    return {"message": "Chat session deleted successfully"}
@@ -1,23 +1,269 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query
+from starlette.concurrency import run_in_threadpool
 from app.core.security import get_current_user
 from app.db.mongodb import db
 from app.core.rag import rag
+from app.core.jobs import ingestion_queue, IngestionJob, QueueFullError, DONE
+from app.core.revisions import PageIndex
 from app.config import settings
-from app.models.chat import DocumentInfo
+from app.models.chat import DocumentPage, DocumentStatus
+from app.utils.pagination import encode_cursor, decode_cursor, after_cursor
+from app.utils.logger import get_logger
 import os
-import shutil
+import hashlib
+import json
+import time
 from datetime import datetime
-from typing import List
+from typing import Optional
 
 router = APIRouter(prefix="/documents", tags=["Documents"])
+logger = get_logger(__name__)
 
-@router.post("/upload")
+UPLOAD_READ_SIZE = 1024 * 1024  # Bytes read per step while saving uploads
+MAX_PAGE_SIZE = 100
+
+def _manifest_path(document_id: str) -> str:
+    return os.path.join(settings.UPLOAD_DIR, f"{document_id}.json")
+
+def _write_manifest(manifest: dict):
+    with open(_manifest_path(manifest["document_id"]), "w") as f:
+        json.dump(manifest, f)
+
+def _remove_manifest(document_id: str):
+    path = _manifest_path(document_id)
+    if os.path.exists(path):
+        os.remove(path)
+
+def _page_fields(pages: Optional[PageIndex]) -> dict:
+    # Page hashes let a later replacement re-process only changed pages
+    if pages is None:
+        return {}
+    return {"page_hashes": pages.hashes, "page_chars": pages.chars}
+
+def _stored_pages(document: dict) -> Optional[PageIndex]:
+    if document.get("page_hashes") is None:
+        return None
+    return PageIndex(document["page_hashes"], document["page_chars"])
+
+async def _save_upload(file: UploadFile, file_path: str) -> str:
+    """Stream the upload to disk; returns its SHA-256."""
+    hasher = hashlib.sha256()
+    with open(file_path, "wb") as buffer:
+        while True:
+            block = await file.read(UPLOAD_READ_SIZE)
+            if not block:
+                break
+            hasher.update(block)
+            buffer.write(block)
+    return hasher.hexdigest()
+
+def _queue_ingestion(manifest: dict) -> IngestionJob:
+    document_id = manifest["document_id"]
+    user_id = manifest["user_id"]
+    file_path = manifest["file_path"]
+    
+    async def ingest(job: IngestionJob) -> int:
+        database = db.get_db()
+        documents_collection = database["documents"]
+        
+        # Look for an already ingested copy of the same file
+        source = await documents_collection.find_one(
+            {"content_hash": manifest["content_hash"]},
+            projection={"_id": 1, "user_id": 1, "page_hashes": 1, "page_chars": 1}
+        )
+        
+        num_chunks = 0
+        pages = None
+        if source:
+            num_chunks = await ingestion_queue.run_in_worker(
+                job,
+                rag.copy_document,
+                source["user_id"],
+                source["_id"],
+                user_id,
+                document_id,
+                progress_callback=job.update_progress
+            )
+            pages = _stored_pages(source)
+            logger.info("Reused %d chunks from %s", num_chunks, source["_id"])
+        
+        if not num_chunks:
+            num_chunks, pages = await ingestion_queue.run_in_worker(
+                job,
+                rag.process_pdf,
+                file_path,
+                user_id,
+                document_id,
+                progress_callback=job.update_progress
+            )
+            logger.info("Processed into %d chunks", num_chunks)
+        
+        doc_metadata = {
+            "_id": document_id,
+            "user_id": user_id,
+            "filename": manifest["filename"],
+            "upload_date": datetime.utcnow(),
+            "num_chunks": num_chunks,
+            "file_path": file_path,
+            "content_hash": manifest["content_hash"],
+            "revision": 0,
+            **_page_fields(pages)
+        }
+        
+        await documents_collection.insert_one(doc_metadata)
+        logger.debug("Metadata saved to MongoDB")
+        
+        _remove_manifest(document_id)
+        rag.answer_cache.invalidate_documents(user_id, [document_id])
+        
+        return num_chunks
+    
+    async def cleanup(job: IngestionJob):
+        # Clean up file if processing fails
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        _remove_manifest(document_id)
+        
+        # Chunks stored before the failure; without a documents record
+        # nothing else would ever delete them
+        if await db.get_db()["documents"].find_one({"_id": document_id}, projection={"_id": 1}) is None:
+            removed = await run_in_threadpool(
+                rag.vector_store.delete_documents, user_id, [document_id]
+            )
+            logger.info("Removed %d chunks of failed ingestion %s", removed, document_id)
+    
+    return ingestion_queue.submit(
+        document_id,
+        user_id,
+        manifest["filename"],
+        ingest,
+        on_failure=cleanup
+    )
+
+def _queue_replacement(manifest: dict) -> IngestionJob:
+    document_id = manifest["document_id"]
+    user_id = manifest["user_id"]
+    file_path = manifest["file_path"]
+    revision = manifest["revision"]
+    
+    async def replace(job: IngestionJob) -> int:
+        documents_collection = db.get_db()["documents"]
+        
+        current = await documents_collection.find_one(
+            {"_id": document_id},
+            projection={"file_path": 1, "page_hashes": 1, "page_chars": 1}
+        )
+        if current is None:
+            raise Exception("Document was deleted")
+        
+        num_chunks, pages = await ingestion_queue.run_in_worker(
+            job,
+            rag.replace_pdf,
+            file_path,
+            user_id,
+            document_id,
+            _stored_pages(current),
+            revision,
+            progress_callback=job.update_progress
+        )
+        
+        await documents_collection.update_one(
+            {"_id": document_id},
+            {"$set": {
+                "filename": manifest["filename"],
+                "num_chunks": num_chunks,
+                "file_path": file_path,
+                "content_hash": manifest["content_hash"],
+                "revision": revision,
+                "updated_at": datetime.utcnow(),
+                **_page_fields(pages)
+            }}
+        )
+        logger.debug("Metadata updated in MongoDB")
+        
+        if current["file_path"] != file_path and os.path.exists(current["file_path"]):
+            os.remove(current["file_path"])
+        _remove_manifest(document_id)
+        rag.answer_cache.invalidate_documents(user_id, [document_id])
+        
+        return num_chunks
+    
+    async def cleanup(job: IngestionJob):
+        # The previous version stays in place
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        _remove_manifest(document_id)
+    
+    return ingestion_queue.submit(
+        document_id,
+        user_id,
+        manifest["filename"],
+        replace,
+        on_failure=cleanup
+    )
+
+async def resume_interrupted_uploads():
+    """Re-queue uploads whose ingestion never finished (e.g. a crash).
+
+    process_pdf picks up after the last batch that was committed;
+    replacements are re-planned and skip the work already applied. Every
+    worker runs this at startup: a job is only resumed by the worker that
+    claims it, once its previous owner's lease has run out.
+    """
+    if not os.path.isdir(settings.UPLOAD_DIR):
+        return
+    
+    documents_collection = db.get_db()["documents"]
+    
+    for name in sorted(os.listdir(settings.UPLOAD_DIR)):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(settings.UPLOAD_DIR, name)
+        # Just written: the worker that queued it hasn't saved its status yet
+        if time.time() - os.path.getmtime(path) < settings.INGESTION_JOB_LEASE_SECONDS:
+            continue
+        with open(path) as f:
+            manifest = json.load(f)
+        document_id = manifest["document_id"]
+        
+        if ingestion_queue.get(document_id):
+            continue
+        document = await documents_collection.find_one(
+            {"_id": document_id}, projection={"revision": 1}
+        )
+        
+        if "revision" in manifest:
+            # Finished, or the document was deleted meanwhile
+            if document is None or document.get("revision", 0) >= manifest["revision"]:
+                if document is None and os.path.exists(manifest["file_path"]):
+                    os.remove(manifest["file_path"])
+                _remove_manifest(document_id)
+                continue
+        elif document:
+            _remove_manifest(document_id)
+            continue
+        
+        # Other workers resume the same manifests; one of them wins
+        if not await ingestion_queue.claim(document_id, manifest["user_id"], manifest["filename"]):
+            logger.debug("Ingestion of %s is running elsewhere", document_id)
+            continue
+        
+        try:
+            if "revision" in manifest:
+                _queue_replacement(manifest)
+            else:
+                _queue_ingestion(manifest)
+            logger.info("Resumed interrupted ingestion: %s", document_id)
+        except QueueFullError:
+            logger.warning("Ingestion queue full, %s will resume on next start", document_id)
+            break
+
+@router.post("/upload", status_code=202)
 async def upload_document(
     file: UploadFile = File(...),
     current_user: str = Depends(get_current_user)
 ):
-    print(f"\n Upload request from: {current_user}")
-    print(f" File: {file.filename}")
+    logger.info("Upload request from: %s (%s)", current_user, file.filename)
     
     # Step 1: Validate file type
     if not file.filename.endswith('.pdf'):
@@ -38,72 +284,211 @@ async def upload_document(
         f"{document_id}.pdf"
     )
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Hash the content while it streams to disk
+    content_hash = await _save_upload(file, file_path)
+    
+    logger.debug("File saved: %s", file_path)
     
-    print(f" File saved: {file_path}")
+    # Step 5: Record the pending job so it survives a restart
+    manifest = {
+        "document_id": document_id,
+        "user_id": current_user,
+        "filename": file.filename,
+        "file_path": file_path,
+        "content_hash": content_hash
+    }
+    _write_manifest(manifest)
     
-    # Step 5: Process with RAG pipeline
+    # Step 6: Queue ingestion; the MongoDB record is written once it finishes
     try:
-        num_chunks = rag.process_pdf(file_path, current_user, document_id)
-        print(f" Processed into {num_chunks} chunks")
-    except Exception as e:
-        # Clean up file if processing fails
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        print(f"❌ Processing failed: {e}")
+        job = _queue_ingestion(manifest)
+    except QueueFullError as e:
+        os.remove(file_path)
+        os.remove(_manifest_path(document_id))
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    logger.info("Upload queued: %s", document_id)
+    
+    return {
+        "message": "Document queued for processing",
+        "document_id": document_id,
+        "job_id": job.job_id,
+        "filename": file.filename,
+        "status": job.status
+    }
+
+@router.put("/{document_id}", status_code=202)
+async def replace_document(
+    document_id: str,
+    file: UploadFile = File(...),
+    current_user: str = Depends(get_current_user)
+):
+    """Upload a revised version of a document, keeping its id.
+
+    Only pages whose content changed are split and embedded again; poll
+    /documents/{document_id}/status like after an upload.
+    """
+    logger.info("Replace request: %s by %s (%s)", document_id, current_user, file.filename)
+    
+    # Step 1: Validate file type
+    if not file.filename.endswith('.pdf'):
         raise HTTPException(
-            status_code=500, 
-            detail=f"Error processing PDF: {str(e)}"
+            status_code=400, 
+            detail="Only PDF files are allowed"
         )
     
-    # Step 6: Save metadata to MongoDB
-    database = db.get_db()
-    documents_collection = database["documents"]
+    # Step 2: Find the current version (ensure it belongs to current user)
+    documents_collection = db.get_db()["documents"]
+    document = await documents_collection.find_one(
+        {"_id": document_id, "user_id": current_user},
+        projection={"content_hash": 1, "revision": 1}
+    )
+    if not document:
+        raise HTTPException(
+            status_code=404, 
+            detail="Document not found"
+        )
     
-    doc_metadata = {
-        "_id": document_id,
+    # Step 3: Save the new version next to the current one
+    revision = document.get("revision", 0) + 1
+    file_path = os.path.join(
+        settings.UPLOAD_DIR,
+        f"{document_id}_r{revision}_{datetime.utcnow().timestamp()}.pdf"
+    )
+    content_hash = await _save_upload(file, file_path)
+    
+    if content_hash == document.get("content_hash"):
+        os.remove(file_path)
+        logger.info("Replacement identical to current version: %s", document_id)
+        return {
+            "message": "Document unchanged",
+            "document_id": document_id,
+            "job_id": document_id,
+            "filename": file.filename,
+            "status": DONE,
+            "revision": revision - 1
+        }
+    
+    # Step 4: One ingestion at a time per document (checked right before
+    # queueing, with no await in between)
+    job = ingestion_queue.get(document_id)
+    if job and job.is_active:
+        os.remove(file_path)
+        raise HTTPException(
+            status_code=409,
+            detail="Document is still being processed"
+        )
+    
+    manifest = {
+        "document_id": document_id,
         "user_id": current_user,
         "filename": file.filename,
-        "upload_date": datetime.utcnow(),
-        "num_chunks": num_chunks,
-        "file_path": file_path
+        "file_path": file_path,
+        "content_hash": content_hash,
+        "revision": revision
     }
+    _write_manifest(manifest)
     
-    await documents_collection.insert_one(doc_metadata)
-    print(f" Metadata saved to MongoDB")
+    try:
+        job = _queue_replacement(manifest)
+    except QueueFullError as e:
+        os.remove(file_path)
+        _remove_manifest(document_id)
+        raise HTTPException(status_code=503, detail=str(e))
     
-    print(f" Upload complete: {document_id}")
+    logger.info("Replacement queued: %s (revision %d)", document_id, revision)
     
     return {
-        "message": "Document uploaded successfully",
+        "message": "Document replacement queued for processing",
         "document_id": document_id,
+        "job_id": job.job_id,
         "filename": file.filename,
-        "chunks": num_chunks
+        "status": job.status,
+        "revision": revision
     }
 
-@router.get("/list", response_model=List[DocumentInfo])
-async def list_documents(current_user: str = Depends(get_current_user)):
+@router.get("/{document_id}/status", response_model=DocumentStatus)
+async def document_status(
+    document_id: str,
+    current_user: str = Depends(get_current_user)
+):
+    # Jobs still known to this worker report live progress
+    job = ingestion_queue.get(document_id)
+    if job and job.user_id == current_user:
+        return job.to_dict()
     
-    print(f"\n List documents for: {current_user}")
+    # Otherwise the status saved by whichever worker ran the job
+    database = db.get_db()
+    record = await database["ingestion_jobs"].find_one({
+        "_id": document_id,
+        "user_id": current_user
+    })
+    if record:
+        return {**record, "document_id": document_id}
+    
+    # Documents ingested before job statuses were saved
+    document = await database["documents"].find_one({
+        "_id": document_id,
+        "user_id": current_user
+    })
+    
+    if not document:
+        raise HTTPException(
+            status_code=404, 
+            detail="Document not found"
+        )
+    
+    return {
+        "document_id": document_id,
+        "status": DONE,
+        "chunks_processed": document["num_chunks"],
+        "chunks_total": document["num_chunks"],
+        "num_chunks": document["num_chunks"]
+    }
+
+@router.get("/list", response_model=DocumentPage)
+async def list_documents(
+    current_user: str = Depends(get_current_user),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
+    
+    logger.debug("List documents for: %s", current_user)
     
     database = db.get_db()
     documents_collection = database["documents"]
     
-    # Find all documents for this user
-    cursor = documents_collection.find({"user_id": current_user})
-    documents = await cursor.to_list(length=100)
+    # Newest first, continuing after the previous page's last document
+    query = {"user_id": current_user}
+    if cursor:
+        try:
+            upload_date, document_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query.update(after_cursor("upload_date", upload_date, document_id))
+    
+    # Only the fields DocumentInfo returns (no file paths or hashes)
+    results = documents_collection.find(
+        query,
+        projection={"filename": 1, "upload_date": 1, "num_chunks": 1}
+    ).sort([("upload_date", -1), ("_id", -1)]).limit(limit + 1)
+    documents = await results.to_list(length=limit + 1)
     
-    print(f" Found {len(documents)} documents")
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = encode_cursor(documents[-1]["upload_date"], documents[-1]["_id"])
     
-    return documents
+    logger.debug("Found %d documents", len(documents))
+    
+    return {"items": documents, "next_cursor": next_cursor}
 
 @router.delete("/{document_id}")
 async def delete_document(
     document_id: str,
     current_user: str = Depends(get_current_user)
 ):
-    print(f"\n Delete request: {document_id} by {current_user}")
+    logger.info("Delete request: %s by %s", document_id, current_user)
     
     database = db.get_db()
     documents_collection = database["documents"]
@@ -115,24 +500,39 @@ async def delete_document(
     })
     
     if not document:
-        print(f" Document not found or unauthorized")
+        logger.info("Document not found or unauthorized")
         raise HTTPException(
             status_code=404, 
             detail="Document not found"
         )
     
+    # A replacement in progress would re-add chunks after the delete
+    job = ingestion_queue.get(document_id)
+    if job and job.is_active:
+        raise HTTPException(
+            status_code=409,
+            detail="Document is still being processed"
+        )
+    
     # Delete file from disk
     if os.path.exists(document["file_path"]):
         os.remove(document["file_path"])
-        print(f" File deleted: {document['file_path']}")
+        logger.debug("File deleted: %s", document["file_path"])
     
     # Delete from database
     await documents_collection.delete_one({"_id": document_id})
-    print(f" Metadata deleted from MongoDB")
+    await database["ingestion_jobs"].delete_one({"_id": document_id})
+    logger.debug("Metadata deleted from MongoDB")
+    
+    # Delete its chunks from the vector index (one bulk delete)
+    removed = await run_in_threadpool(
+        rag.vector_store.delete_documents, current_user, [document_id]
+    )
+    logger.debug("%d chunks deleted from the vector index", removed)
     
-    # Note: We're not deleting from ChromaDB in this version
-    # You could add that functionality here
+    # Cached answers citing this document are no longer valid
+    rag.answer_cache.invalidate_documents(current_user, [document_id])
     
-    print(f" Document deleted: {document_id}")
+    logger.info("Document deleted: %s", document_id)
     
     return {"message": "Document deleted successfully"}
\ No newline at end of file
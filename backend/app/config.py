@@ -7,20 +7,111 @@ class Settings(BaseSettings):
     # MongoDB
     MONGODB_URL: str = "mongodb://localhost:27017"
     DATABASE_NAME: str = "studymate"
+    MONGODB_MAX_POOL_SIZE: int = 100  # Connections per worker process
+    MONGODB_MIN_POOL_SIZE: int = 0  # Kept open even when idle
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = 5000  # Fail fast when MongoDB is down
+    MONGODB_CONNECT_TIMEOUT_MS: int = 10000
+    MONGODB_SOCKET_TIMEOUT_MS: int = 0  # 0 = no limit
+    MONGODB_MAX_IDLE_TIME_MS: int = 0  # 0 = pooled connections never expire
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: int = 0  # Max wait for a free pooled connection (0 = no limit)
+    MONGODB_SLOW_QUERY_MS: int = 100  # Log commands slower than this (0 disables)
     
     # Security (for JWT)
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    PASSWORD_HASH_WORKERS: int = 2  # Threads for bcrypt (max hashes running at once)
+    TOKEN_CACHE_SIZE: int = 10000  # Verified tokens remembered until they expire (0 disables)
     
     # Storage
     UPLOAD_DIR: str = "./uploads"
     CHROMA_DIR: str = "./chroma_db"
+    DATA_DIR: str = "./data"  # Caches and other local state
+    
+    # Vector store
+    VECTOR_BACKEND: str = "chroma"  # "chroma" or "numpy" (memory-mapped, exact search)
+    VECTOR_DIR: str = "./vector_store"  # Used by the numpy backend
+    # numpy backend search matrix layout (applies to newly created collections)
+    VECTOR_DTYPE: str = "float32"  # "float32", "float16" or "int8" (per-vector scale)
+    VECTOR_REDUCED_DIM: int = 0  # 0 keeps every dimension
+    VECTOR_REDUCTION: str = "pca"  # "pca" (fit once a collection has 4 vectors per kept dimension) or "truncate"
+    VECTOR_RESCORE_FACTOR: int = 4  # Compact layouts re-score top_k * factor candidates exactly
     
     # Model settings
     GROQ_MODEL: str = "llama-3.1-70b-versatile"  # Fast and powerful!
+    GROQ_BASE_URL: str = ""  # Empty uses the Groq API; set for compatible servers (e.g. the benchmark stand-in)
     EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"  # Local embeddings
     
+    # Embedding backend
+    EMBEDDING_BACKEND: str = "sentence_transformers"  # or "onnx" (needs onnxruntime; exported on first use)
+    EMBEDDING_ONNX_DIR: str = "./onnx_models"  # Exported ONNX models
+    EMBEDDING_ONNX_QUANTIZE: bool = True  # Run the dynamically int8-quantized export
+    EMBEDDING_PARITY_MIN_COSINE: float = 0.99  # Export is rejected below this similarity to the reference
+    EMBEDDING_THREADS: int = 0  # Intra-op threads per worker process (0 = library default)
+    
+    # Shared embedding sidecar (python -m app.core.embedding_sidecar)
+    EMBEDDING_SIDECAR_SOCKET: str = ""  # Unix socket path; empty encodes in each worker
+    EMBEDDING_SIDECAR_TIMEOUT_SECONDS: float = 30  # Falls back to in-process encoding on timeout
+    EMBEDDING_SIDECAR_BATCH_SIZE: int = 64  # Texts encoded together by the sidecar at most
+    EMBEDDING_SIDECAR_MAX_WAIT_MS: float = 5  # How long a sidecar batch waits to fill up
+    WARMUP_ON_STARTUP: bool = True  # Load the model etc. in the background at startup (else on first use)
+    
+    # Embedding cache
+    EMBEDDING_CACHE_SIZE: int = 10000  # Vectors kept in memory (LRU)
+    EMBEDDING_CACHE_PATH: str = "embedding_cache.sqlite3"  # Relative to DATA_DIR; empty disables the disk tier
+    
+    # Semantic answer cache
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_THRESHOLD: float = 0.95  # Min cosine similarity between questions
+    ANSWER_CACHE_SIZE: int = 1000  # Cached answers across all users
+    ANSWER_CACHE_TTL_SECONDS: int = 3600
+    
+    # Prompt context packing
+    CONTEXT_MAX_TOKENS: int = 1500  # Token budget for retrieved context
+    CONTEXT_MAX_CHUNKS: int = 8  # Chunks retrieved as candidates for the budget
+    CONTEXT_CHARS_PER_TOKEN: float = 4.0  # Token estimate (no local Groq tokenizer)
+    
+    # Query path concurrency
+    QUERY_WORKERS: int = 4  # Threads for question embedding + vector search
+    QUERY_SEARCH_CONCURRENCY: int = 4
+    QUERY_LLM_CONCURRENCY: int = 32  # In-flight Groq requests per worker
+    CHAT_BATCH_MAX_QUESTIONS: int = 50  # Questions accepted by /chat/batch
+    
+    # Chat sessions (multi-turn memory)
+    CHAT_MEMORY_TURNS: int = 4  # Recent turns sent verbatim with each question
+    CHAT_MEMORY_TURN_CHARS: int = 1000  # Longer questions/answers are cut in the prompt
+    CHAT_SUMMARY_MAX_CHARS: int = 1500  # Running summary of the turns before those
+    CHAT_QUERY_REWRITE: bool = True  # Rewrite follow-ups into standalone questions for retrieval
+    
+    # Query embedding micro-batching
+    EMBED_BATCH_MAX_SIZE: int = 32  # Questions encoded together at most
+    EMBED_BATCH_MAX_WAIT_MS: float = 5  # How long a batch waits to fill up
+    
+    # PDF extraction
+    PDF_EXTRACT_WORKERS: int = 2  # Processes for page-parallel extraction (1 = in-thread)
+    PDF_PAGES_PER_TASK: int = 16  # Pages handed to a worker at a time
+    PDF_PARALLEL_MIN_PAGES: int = 32  # Smaller PDFs are extracted in-thread
+    
+    # Background ingestion
+    INGESTION_WORKERS: int = 2  # Threads running PDF processing
+    INGESTION_MAX_PENDING: int = 20  # Queued + running jobs before uploads are refused
+    INGESTION_STATUS_SAVE_SECONDS: float = 2  # How often job progress is saved for other workers
+    INGESTION_JOB_LEASE_SECONDS: int = 60  # Unsaved for this long, an active job is resumed by another worker
+    INGESTION_JOB_RETENTION_DAYS: int = 7  # Finished job statuses are kept this long
+    INGESTION_EMBED_BATCH_SIZE: int = 64  # Chunks per encode + store batch
+    INGEST_MAX_PENDING_BATCHES: int = 4  # Split batches waiting for embedding (backpressure)
+    INGEST_SPLIT_WINDOW_CHARS: int = 50000  # Text buffered before splitting
+    
+    # Chunking
+    CHUNK_SIZE: int = 1000  # Max chunk length, in CHUNK_UNIT
+    CHUNK_OVERLAP: int = 200  # Overlap to preserve context, in CHUNK_UNIT
+    CHUNK_UNIT: str = "chars"  # "chars" or "tokens" (words and punctuation marks)
+    CHUNK_SENTENCE_BOUNDARIES: bool = False  # Prefer ending chunks at sentence ends over word breaks
+    
+    # Logging
+    LOG_LEVEL: str = "INFO"  # DEBUG for per-step detail, WARNING to silence request logs
+    LOG_FORMAT: str = "text"  # "text" or "json" (one object per line)
+    
     class Config:
         env_file = ".env"
 
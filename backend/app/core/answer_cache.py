@@ -0,0 +1,147 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+
+
+class _CachedAnswer:
+
+    def __init__(
+        self,
+        user_id: str,
+        embedding: np.ndarray,
+        chunk_ids: frozenset,
+        answer: str,
+        sources: List[str]
+    ):
+        self.user_id = user_id
+        self.embedding = embedding
+        self.chunk_ids = chunk_ids
+        self.answer = answer
+        self.sources = sources
+        self.created_at = time.monotonic()
+
+
+class SemanticAnswerCache:
+    """Reuses answers for near-identical questions over the same chunks.
+
+    A hit needs the cosine similarity between question embeddings to reach
+    `threshold` AND the retrieved chunk ids to match exactly, so an answer
+    is never served from a different context.
+    """
+
+    def __init__(self, threshold: float, max_entries: int, ttl_seconds: float):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, _CachedAnswer]" = OrderedDict()
+        self._by_user: Dict[str, Set[int]] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(
+        self,
+        user_id: str,
+        question_embedding,
+        chunk_ids: Iterable[str]
+    ) -> Optional[Tuple[str, List[str]]]:
+        chunk_ids = frozenset(chunk_ids)
+        query = self._normalize(question_embedding)
+
+        with self._lock:
+            self._expire()
+            entry_ids = [
+                entry_id for entry_id in self._by_user.get(user_id, ())
+                if self._entries[entry_id].chunk_ids == chunk_ids
+            ]
+            if entry_ids:
+                matrix = np.vstack([self._entries[i].embedding for i in entry_ids])
+                scores = matrix @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    entry_id = entry_ids[best]
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    entry = self._entries[entry_id]
+                    return entry.answer, list(entry.sources)
+
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        user_id: str,
+        question_embedding,
+        chunk_ids: Iterable[str],
+        answer: str,
+        sources: List[str]
+    ):
+        entry = _CachedAnswer(
+            user_id,
+            self._normalize(question_embedding),
+            frozenset(chunk_ids),
+            answer,
+            list(sources)
+        )
+
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = entry
+            self._by_user.setdefault(user_id, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_documents(self, user_id: str, document_ids: Iterable[str]) -> int:
+        """Drop a user's answers that cite any of `document_ids`."""
+        document_ids = set(document_ids)
+
+        with self._lock:
+            stale = [
+                entry_id for entry_id in self._by_user.get(user_id, ())
+                if document_ids.intersection(self._entries[entry_id].sources)
+            ]
+            for entry_id in stale:
+                self._remove(entry_id)
+            self.invalidations += len(stale)
+
+        return len(stale)
+
+    def _expire(self):
+        # Entries are in LRU order, not age order, so check them all
+        now = time.monotonic()
+        expired = [
+            entry_id for entry_id, entry in self._entries.items()
+            if now - entry.created_at > self.ttl_seconds
+        ]
+        for entry_id in expired:
+            self._remove(entry_id)
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        user_entries = self._by_user.get(entry.user_id)
+        if user_entries is not None:
+            user_entries.discard(entry_id)
+            if not user_entries:
+                del self._by_user[entry.user_id]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
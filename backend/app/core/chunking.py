@@ -0,0 +1,182 @@
+"""Splits document text into overlapping chunks, tracking offsets.
+
+Same size/overlap semantics as LangChain's RecursiveCharacterTextSplitter
+(which this replaces): chunks are at most `chunk_size` long and end at
+the strongest boundary that fits - paragraph, (optionally) sentence,
+line, word, or a hard cut - and the next chunk starts up to
+`chunk_overlap` back, on a boundary of the same kind. Chunks never start
+or end with whitespace.
+
+It is a single greedy left-to-right pass: each chunk depends only on the
+text from its start to one window ahead, so a stream can be split window
+by window (`split_partial`) with the same result as splitting it whole.
+"""
+import re
+from bisect import bisect_left
+from typing import List, NamedTuple, Optional, Tuple
+
+CHARS = "chars"
+TOKENS = "tokens"
+
+# Approximates LLM tokens: words and single punctuation marks
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+# End of a sentence: punctuation (plus closing quotes/brackets) before a space
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]*(?=\s)")
+
+# Boundary kinds, strongest first
+_PARAGRAPH, _LINE, _SENTENCE, _WORD, _CUT = range(5)
+_SEPARATORS = {_PARAGRAPH: "\n\n", _LINE: "\n", _WORD: " "}
+
+
+class TextSpan(NamedTuple):
+    start: int
+    end: int
+
+
+class TextChunker:
+
+    def __init__(
+        self,
+        chunk_size: int,
+        chunk_overlap: int,
+        unit: str = CHARS,
+        sentence_boundaries: bool = False
+    ):
+        if unit not in (CHARS, TOKENS):
+            raise ValueError(f"Unknown chunk unit: {unit}")
+        if not 0 <= chunk_overlap < chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.unit = unit
+        self.sentence_boundaries = sentence_boundaries
+
+    def split(self, text: str) -> List[TextSpan]:
+        return self._split(text, final=True)[0]
+
+    def split_partial(self, text: str) -> Tuple[List[TextSpan], int]:
+        """Chunks of a text that continues after `text`.
+
+        Only chunks that more text can't change are returned, with the
+        offset the next chunk starts at; split text[offset:] + more next.
+        """
+        return self._split(text, final=False)
+
+    def _split(self, text: str, final: bool) -> Tuple[List[TextSpan], int]:
+        length = len(text)
+        token_starts: Optional[List[int]] = None
+        if self.unit == TOKENS:
+            token_starts = [match.start() for match in _TOKEN.finditer(text)]
+
+        spans: List[TextSpan] = []
+        pos = _skip_space(text, 0)
+        while pos < length:
+            window_end = self._window_end(pos, length, token_starts, final)
+            if window_end is None:
+                if not final:
+                    return spans, pos
+                spans.append(TextSpan(pos, _strip_end(text, pos, length)))
+                return spans, length
+            if not final and window_end + 2 > length:
+                # Boundaries are searched up to 2 characters past the window
+                return spans, pos
+
+            end, kind = self._find_end(text, pos, window_end)
+            spans.append(TextSpan(pos, end))
+            pos = _skip_space(text, self._next_start(text, pos, end, kind, token_starts))
+        return spans, length
+
+    def _window_end(
+        self,
+        pos: int,
+        length: int,
+        token_starts: Optional[List[int]],
+        final: bool
+    ) -> Optional[int]:
+        """Furthest end for a chunk starting at `pos`; None if the rest fits."""
+        if token_starts is None:
+            end = pos + self.chunk_size
+            return end if end < length else None
+        # Token mode: end where token number `chunk_size` (counted from
+        # pos) starts. Unless the text is final, the last token may still
+        # grow, so it can't be counted on
+        index = bisect_left(token_starts, pos) + self.chunk_size
+        if index >= len(token_starts) - (0 if final else 1):
+            return None
+        return token_starts[index]
+
+    def _find_end(self, text: str, pos: int, window_end: int) -> Tuple[int, int]:
+        end = self._find_separator(text, pos, window_end, _PARAGRAPH)
+        if end is not None:
+            return end, _PARAGRAPH
+
+        if self.sentence_boundaries:
+            # Line breaks in extracted PDF text are mostly layout, so
+            # sentence ends win over them, where they keep the chunk at
+            # least half full
+            last = None
+            for match in _SENTENCE_END.finditer(text, pos + (window_end - pos) // 2, window_end + 1):
+                last = match
+            if last is not None:
+                return last.end(), _SENTENCE
+
+        for kind in (_LINE, _WORD):
+            end = self._find_separator(text, pos, window_end, kind)
+            if end is not None:
+                return end, kind
+        return _strip_end(text, pos, window_end), _CUT
+
+    def _find_separator(self, text: str, pos: int, window_end: int, kind: int) -> Optional[int]:
+        # Last separator of this kind that ends the chunk within the window
+        separator = _SEPARATORS[kind]
+        i = text.rfind(separator, pos + 1, window_end + len(separator))
+        return _strip_end(text, pos, i) if i > pos else None
+
+    def _next_start(
+        self,
+        text: str,
+        pos: int,
+        end: int,
+        kind: int,
+        token_starts: Optional[List[int]]
+    ) -> int:
+        """Start of the next chunk: the earliest boundary of the same kind
+        within `chunk_overlap` of `end` (no overlap if there is none)."""
+        if self.chunk_overlap == 0:
+            return end
+        if token_starts is None:
+            low = end - self.chunk_overlap
+        else:
+            index = bisect_left(token_starts, end) - self.chunk_overlap
+            low = token_starts[index] if index >= 0 else 0
+        low = max(low, pos + 1)
+        if low >= end:
+            return end
+
+        if kind == _CUT:
+            if token_starts is not None:
+                # Stay on token starts so a carried-over stream tokenizes the same
+                return token_starts[bisect_left(token_starts, low)]
+            return low
+
+        if kind == _SENTENCE:
+            match = _SENTENCE_END.search(text, low - 1, end)
+            if match is not None:
+                return match.end()
+            kind = _WORD
+
+        separator = _SEPARATORS[kind]
+        i = text.find(separator, low - 1, end)
+        return end if i < 0 else i + len(separator)
+
+
+def _skip_space(text: str, pos: int) -> int:
+    while pos < len(text) and text[pos].isspace():
+        pos += 1
+    return pos
+
+
+def _strip_end(text: str, start: int, end: int) -> int:
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return end
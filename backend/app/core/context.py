@@ -0,0 +1,150 @@
+import math
+import threading
+from typing import Dict, List, NamedTuple, Optional, Sequence
+from app.db.vector import VectorHit
+
+
+def estimate_tokens(text: str, chars_per_token: float) -> int:
+    # Groq's tokenizer isn't available locally; characters per token is a
+    # stable enough proxy for budgeting
+    return math.ceil(len(text) / chars_per_token)
+
+
+class PackedContext(NamedTuple):
+    text: str
+    chunk_ids: List[str]  # Chunks whose text made it into the context
+    sources: List[str]  # Their document ids
+    tokens: int
+    tokens_saved: int  # vs. joining the same chunks as retrieved
+
+
+class _Span:
+    """Contiguous text of one document covered by one or more chunks."""
+
+    def __init__(self, hit: VectorHit):
+        metadata = hit.metadata
+        self.document_id = metadata["document_id"]
+        self.first_index = self.last_index = metadata.get("chunk_index", 0)
+        self.start = metadata.get("char_start")
+        self.end = metadata.get("char_end")
+        self.text = hit.document
+
+    def try_merge(self, other: "_Span", max_overlap: int) -> bool:
+        """Append `other` (which starts at or after this span) if they touch."""
+        if self.start is not None and other.start is not None:
+            if other.start > self.end:
+                return False
+            if other.end > self.end:
+                self.text += other.text[self.end - other.start:]
+                self.end = other.end
+        else:
+            # Older chunks without offsets: only neighbours by index, with
+            # the splitter overlap found by matching text
+            if other.first_index != self.last_index + 1:
+                return False
+            self.text += other.text[_overlap(self.text, other.text, max_overlap):]
+        self.last_index = max(self.last_index, other.last_index)
+        return True
+
+
+def _overlap(left: str, right: str, max_overlap: int) -> int:
+    for size in range(min(len(left), len(right), max_overlap), 0, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+class ContextAssembler:
+    """Packs retrieved chunks into the prompt context.
+
+    Chunks are taken in relevance order while the packed context fits in
+    `max_tokens`; chunks of the same document that overlap or sit next to
+    each other are merged so the splitter overlap is sent once, and the
+    result is ordered by document and position.
+    """
+
+    def __init__(self, max_tokens: int, chars_per_token: float, max_overlap: int):
+        self.max_tokens = max_tokens
+        self.chars_per_token = chars_per_token
+        self.max_overlap = max_overlap
+        self._lock = threading.Lock()
+
+        # Aggregate stats for /health
+        self.requests = 0
+        self.tokens_packed = 0
+        self.tokens_saved = 0
+        self.chunks_merged = 0
+        self.chunks_over_budget = 0
+
+    def _merge(self, hits: Sequence[VectorHit]) -> List[_Span]:
+        by_document: Dict[str, List[_Span]] = {}
+        for hit in hits:
+            span = _Span(hit)
+            by_document.setdefault(span.document_id, []).append(span)
+
+        merged = []
+        for document_id in sorted(by_document):
+            spans = sorted(
+                by_document[document_id],
+                key=lambda s: (s.start if s.start is not None else -1, s.first_index)
+            )
+            current = spans[0]
+            for span in spans[1:]:
+                if not current.try_merge(span, self.max_overlap):
+                    merged.append(current)
+                    current = span
+            merged.append(current)
+        return merged
+
+    def _render(self, spans: List[_Span]) -> str:
+        return "\n\n".join(span.text for span in spans)
+
+    def _tokens(self, text: str) -> int:
+        return estimate_tokens(text, self.chars_per_token)
+
+    def pack(self, hits: Sequence[VectorHit], max_tokens: Optional[int] = None) -> PackedContext:
+        """`hits` in relevance order (best first)."""
+        budget = max_tokens or self.max_tokens
+
+        # Greedy by relevance; merging makes a neighbour cheaper than its
+        # raw size, so cost is measured on the packed result
+        selected: List[VectorHit] = []
+        spans: List[_Span] = []
+        skipped = 0
+        for hit in hits:
+            candidate = self._merge(selected + [hit])
+            if selected and self._tokens(self._render(candidate)) > budget:
+                skipped += 1
+                continue
+            selected.append(hit)
+            spans = candidate
+
+        text = self._render(spans)
+        tokens = self._tokens(text)
+        saved = self._tokens("\n\n".join(hit.document for hit in selected)) - tokens
+
+        with self._lock:
+            self.requests += 1
+            self.tokens_packed += tokens
+            self.tokens_saved += saved
+            self.chunks_merged += len(selected) - len(spans)
+            self.chunks_over_budget += skipped
+
+        return PackedContext(
+            text=text,
+            chunk_ids=[hit.id for hit in selected],
+            sources=sorted({hit.metadata["document_id"] for hit in selected}),
+            tokens=tokens,
+            tokens_saved=saved
+        )
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "max_tokens": self.max_tokens,
+            "tokens_packed": self.tokens_packed,
+            "tokens_saved": self.tokens_saved,
+            "mean_tokens_saved": self.tokens_saved / self.requests if self.requests else 0.0,
+            "chunks_merged": self.chunks_merged,
+            "chunks_over_budget": self.chunks_over_budget,
+        }
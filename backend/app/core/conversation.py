@@ -0,0 +1,101 @@
+"""Memory for multi-turn chat sessions.
+
+Each question in a session is sent with the session's last
+CHAT_MEMORY_TURNS turns verbatim and a running summary of everything
+before them. Older turns are folded into the summary after the answer is
+returned, so the prompt stays the same size however long the
+conversation gets. Follow-up questions ("what about its efficiency?")
+are rewritten into standalone ones before retrieval, so they find the
+chunks the conversation is about.
+"""
+from typing import List, NamedTuple, Sequence
+from app.config import settings
+from app.models.chat import ChatMessage
+
+REWRITE_TURN_CHARS = 300  # Answer characters shown when rewriting a question
+
+
+class Conversation(NamedTuple):
+    summary: str  # Turns older than `turns`, summarized
+    turns: List[ChatMessage]  # Recent questions and answers, oldest first
+
+    @classmethod
+    def from_history(cls, summary: str, entries: Sequence[dict]) -> "Conversation":
+        """From chat_history entries, newest first (as they are queried)."""
+        turns = []
+        for entry in reversed(entries):
+            turns.append(ChatMessage(role="user", content=entry["question"], timestamp=entry["timestamp"]))
+            turns.append(ChatMessage(role="assistant", content=entry["answer"], timestamp=entry["timestamp"]))
+        return cls(summary or "", turns)
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.summary and not self.turns
+
+
+def _clip(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit].rstrip() + "..."
+
+
+def _transcript(turns: Sequence[ChatMessage], limit: int) -> str:
+    speakers = {"user": "Student", "assistant": "Assistant"}
+    return "\n".join(f"{speakers[turn.role]}: {_clip(turn.content, limit)}" for turn in turns)
+
+
+def history_messages(conversation: Conversation) -> List[dict]:
+    """Chat messages carrying the conversation into the answer prompt."""
+    messages = []
+    if conversation.summary:
+        messages.append({
+            "role": "system",
+            "content": f"Summary of the conversation so far:\n{conversation.summary}"
+        })
+    for turn in conversation.turns:
+        messages.append({
+            "role": turn.role,
+            "content": _clip(turn.content, settings.CHAT_MEMORY_TURN_CHARS)
+        })
+    return messages
+
+
+def rewrite_messages(conversation: Conversation, question: str) -> List[dict]:
+    """Prompt turning a follow-up question into a standalone search query."""
+    history = _transcript(conversation.turns, REWRITE_TURN_CHARS)
+    if conversation.summary:
+        history = f"{conversation.summary}\n{history}"
+    return [
+        {
+            "role": "system",
+            "content": "Rewrite the student's latest question as a standalone question for searching their study documents. Use the conversation to resolve references like \"it\" or \"that\". Reply with the question only."
+        },
+        {
+            "role": "user",
+            "content": f"Conversation:\n{history}\n\nLatest question: {question}"
+        }
+    ]
+
+
+def fallback_rewrite(conversation: Conversation, question: str) -> str:
+    # Without the LLM: search for the previous question along with this one
+    previous = [turn.content for turn in conversation.turns if turn.role == "user"]
+    return f"{previous[-1]} {question}" if previous else question
+
+
+def summary_messages(summary: str, turns: Sequence[ChatMessage]) -> List[dict]:
+    """Prompt folding `turns` into the running summary."""
+    max_words = settings.CHAT_SUMMARY_MAX_CHARS // 6
+    current = summary or "(empty)"
+    return [
+        {
+            "role": "system",
+            "content": f"You maintain a running summary of a study conversation. Update the summary with the new turns. Keep the topics, documents and terms the student asked about and the key points of the answers. Use at most {max_words} words and reply with the summary only."
+        },
+        {
+            "role": "user",
+            "content": f"Current summary:\n{current}\n\nNew turns:\n{_transcript(turns, settings.CHAT_MEMORY_TURN_CHARS)}"
+        }
+    ]
+
+
+def clip_summary(summary: str) -> str:
+    return _clip(summary.strip(), settings.CHAT_SUMMARY_MAX_CHARS)
@@ -0,0 +1,149 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence
+import numpy as np
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache keyed by (model name, text hash).
+
+    Tier 1 is a size-bounded in-memory LRU, tier 2 a SQLite file that
+    survives restarts. Rows written by another model are dropped on open,
+    so changing EMBEDDING_MODEL invalidates the cache.
+    """
+
+    def __init__(self, model_name: str, path: Optional[str], max_memory_items: int):
+        self.model_name = model_name
+        self.path = path
+        self.max_memory_items = max_memory_items
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        # Hit/miss counters
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if path:
+            self._open_disk()
+
+    def _open_disk(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " text_hash TEXT NOT NULL,"
+            " dim INTEGER NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, text_hash))"
+        )
+
+        # Invalidate vectors produced by any other model
+        deleted = self._conn.execute(
+            "DELETE FROM embeddings WHERE model != ?", (self.model_name,)
+        ).rowcount
+        self._conn.commit()
+        if deleted:
+            logger.info("Embedding cache: dropped %d vectors from other models", deleted)
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Return cached vectors in input order, None where missing."""
+        hashes = [text_hash(text) for text in texts]
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+
+        with self._lock:
+            disk_lookup = {}
+            for i, key in enumerate(hashes):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    results[i] = vector
+                    self.memory_hits += 1
+                else:
+                    disk_lookup.setdefault(key, []).append(i)
+
+            if disk_lookup and self._conn is not None:
+                for key, vector in self._read_disk(list(disk_lookup)):
+                    for i in disk_lookup.pop(key):
+                        results[i] = vector
+                        self.disk_hits += 1
+                    self._remember(key, vector)
+
+            self.misses += sum(len(positions) for positions in disk_lookup.values())
+
+        return results
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[np.ndarray]):
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = text_hash(text)
+                vector = np.asarray(vector, dtype=np.float32)
+                self._remember(key, vector)
+                rows.append((self.model_name, key, vector.shape[0], vector.tobytes()))
+
+            if rows and self._conn is not None:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, text_hash, dim, vector)"
+                    " VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                self._conn.commit()
+
+    def _read_disk(self, keys: List[str]):
+        # SQLite limits the number of bound parameters per statement
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._conn.execute(
+                f"SELECT text_hash, vector FROM embeddings"
+                f" WHERE model = ? AND text_hash IN ({placeholders})",
+                [self.model_name, *batch]
+            )
+            for key, blob in rows:
+                yield key, np.frombuffer(blob, dtype=np.float32)
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM embeddings")
+                self._conn.commit()
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "model": self.model_name,
+            "memory_items": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,248 @@
+"""Shared embedding server for multi-worker deployments.
+
+One process loads the embedding model and serves encode requests from
+every API worker over a Unix socket; requests arriving together are
+encoded as one batch. Start it next to uvicorn:
+
+    python -m app.core.embedding_sidecar --socket /tmp/studymate-embed.sock
+
+and point the workers at it with EMBEDDING_SIDECAR_SOCKET.
+
+Wire format: every message is a 4-byte big-endian length and a payload.
+Requests are JSON ({"op": "info"} or {"op": "encode", "texts": [...]});
+responses are a JSON header, followed for encodes by one message of raw
+float32 rows.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Sequence
+import numpy as np
+from app.config import settings
+from app.core.embeddings import (
+    EmbeddingBackend,
+    EmbeddingBatcher,
+    create_embedding_backend,
+    embedding_model_id,
+)
+from app.utils.logger import get_logger
+
+# Named explicitly: run with -m, __name__ is "__main__", outside the "app" logger
+logger = get_logger("app.core.embedding_sidecar")
+
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+_LENGTH = struct.Struct(">I")
+
+
+class SidecarMismatchError(ConnectionError):
+    """The sidecar serves different embeddings than this worker expects."""
+
+
+# -- client ------------------------------------------------------------
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        part = sock.recv(size - len(data))
+        if not part:
+            raise ConnectionError("Embedding sidecar closed the connection")
+        data += part
+    return bytes(data)
+
+
+def _recv_message(sock: socket.socket) -> bytes:
+    (size,) = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+    return _recv_exact(sock, size)
+
+
+def _send_message(sock: socket.socket, payload: bytes):
+    sock.sendall(_LENGTH.pack(len(payload)) + payload)
+
+
+class SidecarEmbeddingBackend(EmbeddingBackend):
+    """Encodes through the sidecar, falling back to an in-process model.
+
+    Each calling thread keeps its own connection. When the sidecar can't
+    be reached the fallback is used and the sidecar retried after
+    `retry_seconds`.
+    """
+
+    name = "sidecar"
+
+    def __init__(
+        self,
+        socket_path: str,
+        timeout: float,
+        fallback: Callable[[], EmbeddingBackend],
+        retry_seconds: float = 30
+    ):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.fallback = fallback
+        self.retry_seconds = retry_seconds
+        self._retry_at = 0.0
+        self._local = threading.local()
+
+    def _call(self, sock: socket.socket, request: dict) -> dict:
+        _send_message(sock, json.dumps(request).encode("utf-8"))
+        return json.loads(_recv_message(sock))
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            return sock
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+            info = self._call(sock, {"op": "info"})
+            if info.get("model") != embedding_model_id():
+                raise SidecarMismatchError(
+                    f"sidecar serves {info.get('model')}, expected {embedding_model_id()}"
+                )
+        except Exception:
+            sock.close()
+            raise
+
+        self._local.sock = sock
+        return sock
+
+    def _disconnect(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _request(self, texts: Sequence[str]) -> np.ndarray:
+        sock = self._connection()
+        try:
+            header = self._call(sock, {"op": "encode", "texts": list(texts)})
+            if not header["ok"]:
+                raise RuntimeError(f"Embedding sidecar error: {header['error']}")
+            data = _recv_message(sock)
+        except OSError:
+            self._disconnect()
+            raise
+        return np.frombuffer(data, dtype=np.float32).reshape(header["rows"], header["dim"])
+
+    def encode(self, texts):
+        if time.monotonic() >= self._retry_at:
+            try:
+                return self._request(texts)
+            except OSError as e:
+                logger.warning("Embedding sidecar unavailable (%s), encoding in-process", e)
+                self._retry_at = time.monotonic() + self.retry_seconds
+        return self.fallback().encode(texts)
+
+
+# -- server ------------------------------------------------------------
+
+class EmbeddingSidecar:
+
+    def __init__(self, backend: EmbeddingBackend, max_batch_size: int, max_wait_ms: float):
+        self.backend = backend
+        # One encode at a time: the model's own thread pool uses the cores
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed")
+        self.batcher = EmbeddingBatcher(
+            encode_fn=backend.encode,
+            executor=self.executor,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms
+        )
+        self.model_id = embedding_model_id()
+
+    async def _read_message(self, reader: asyncio.StreamReader) -> bytes:
+        (size,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+        if size > MAX_MESSAGE_BYTES:
+            raise ValueError(f"Message too large ({size} bytes)")
+        return await reader.readexactly(size)
+
+    def _write_message(self, writer: asyncio.StreamWriter, payload: bytes):
+        writer.write(_LENGTH.pack(len(payload)) + payload)
+
+    def _write_header(self, writer: asyncio.StreamWriter, header: dict):
+        self._write_message(writer, json.dumps(header).encode("utf-8"))
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = json.loads(await self._read_message(reader))
+                except asyncio.IncompleteReadError:
+                    break  # Client went away
+
+                try:
+                    if request["op"] == "info":
+                        self._write_header(writer, {
+                            "ok": True,
+                            "model": self.model_id,
+                            "batcher": self.batcher.stats()
+                        })
+                    elif request["op"] == "encode":
+                        vectors = await self.batcher.embed_many(request["texts"])
+                        self._write_header(writer, {
+                            "ok": True,
+                            "rows": vectors.shape[0],
+                            "dim": vectors.shape[1]
+                        })
+                        self._write_message(writer, vectors.tobytes())
+                    else:
+                        self._write_header(writer, {"ok": False, "error": f"Unknown op: {request['op']}"})
+                except Exception as e:
+                    self._write_header(writer, {"ok": False, "error": str(e)})
+                await writer.drain()
+        except (ConnectionError, ValueError) as e:
+            logger.error("Embedding sidecar connection error: %s", e)
+        finally:
+            writer.close()
+
+    async def serve(self, socket_path: str):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)  # Left over from a previous run
+
+        server = await asyncio.start_unix_server(self.handle, path=socket_path)
+        os.chmod(socket_path, 0o660)
+        logger.info("Embedding sidecar serving %s on %s", self.model_id, socket_path)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.batcher.shutdown()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared embedding server")
+    parser.add_argument(
+        "--socket",
+        default=settings.EMBEDDING_SIDECAR_SOCKET or "./embedding.sock",
+        help="Unix socket path to listen on"
+    )
+    args = parser.parse_args()
+
+    logger.info("Loading embedding model: %s", embedding_model_id())
+    backend = create_embedding_backend()
+    backend.encode(["warmup"])
+
+    sidecar = EmbeddingSidecar(
+        backend,
+        max_batch_size=settings.EMBEDDING_SIDECAR_BATCH_SIZE,
+        max_wait_ms=settings.EMBEDDING_SIDECAR_MAX_WAIT_MS
+    )
+    try:
+        asyncio.run(sidecar.serve(args.socket))
+    except KeyboardInterrupt:
+        logger.info("Embedding sidecar stopped")
+
+
+if __name__ == "__main__":
+    main()
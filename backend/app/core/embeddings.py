@@ -0,0 +1,388 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor
+from typing import Callable, List, Optional, Sequence
+import numpy as np
+from app.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Sentences used to compare an exported model with the reference model
+PARITY_SENTENCES = [
+    "Photosynthesis converts light energy into chemical energy stored in glucose.",
+    "The derivative of a function measures its instantaneous rate of change.",
+    "What were the main causes of the First World War?",
+    "Explain the difference between mitosis and meiosis.",
+    "A linked list stores elements in nodes that point to the next node.",
+    "Supply and demand determine the market price of a good.",
+    "Newton's second law states that force equals mass times acceleration.",
+    "summarize chapter 3",
+]
+
+
+class EmbeddingBackend(ABC):
+    """Turns texts into float32 embeddings, one row per text."""
+
+    name: str
+
+    @abstractmethod
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        ...
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """The reference PyTorch model."""
+
+    name = "sentence_transformers"
+
+    def __init__(self, model_name: str, threads: int = 0):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads > 0:
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    def encode(self, texts):
+        return np.asarray(self.model.encode(list(texts)), dtype=np.float32)
+
+
+class OnnxEmbeddingBackend(EmbeddingBackend):
+    """The same transformer exported to ONNX and run with ONNX Runtime.
+
+    Token embeddings are pooled and normalized here exactly as the
+    sentence-transformers pipeline does (settings saved at export time).
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_dir: str, quantized: bool, threads: int = 0, batch_size: int = 32):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(model_dir, "export.json")) as f:
+            self.export = json.load(f)
+
+        options = ort.SessionOptions()
+        if threads > 0:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        model_file = "model.int8.onnx" if quantized else "model.onnx"
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, model_file),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.batch_size = batch_size
+
+    def encode(self, texts):
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, self.export["dim"]), dtype=np.float32)
+
+        # Similar lengths together means less padding per batch
+        order = np.argsort([len(text) for text in texts])
+        vectors = np.empty((len(texts), self.export["dim"]), dtype=np.float32)
+
+        for start in range(0, len(texts), self.batch_size):
+            rows = order[start:start + self.batch_size]
+            tokens = self.tokenizer(
+                [texts[i] for i in rows],
+                padding=True,
+                truncation=True,
+                max_length=self.export["max_seq_length"],
+                return_tensors="np"
+            )
+            inputs = {name: tokens[name].astype(np.int64) for name in self.input_names}
+            hidden = self.session.run(None, inputs)[0]
+            vectors[rows] = self._pool(hidden, tokens["attention_mask"])
+
+        return vectors
+
+    def _pool(self, hidden: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        if self.export["pooling"] == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = mask[:, :, None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.export["normalize"]:
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent single-text encode requests into batched calls.
+
+    Callers await `embed(text)`; a background task gathers pending texts
+    for up to `max_wait_ms` or `max_batch_size` items, runs one encode on
+    the executor and hands each caller its own vector.
+    """
+
+    # Upper bounds of the batch-size histogram buckets
+    BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        executor: Executor,
+        max_batch_size: int,
+        max_wait_ms: float
+    ):
+        self.encode_fn = encode_fn
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop = None
+
+        # Batch-size metrics
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.histogram = {bucket: 0 for bucket in self.BUCKETS}
+        self.histogram["+Inf"] = 0
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def embed(self, text: str) -> np.ndarray:
+        self._ensure_started()
+        future = self._loop.create_future()
+        self._queue.put_nowait((text, future))
+        return await future
+
+    async def embed_many(self, texts: Sequence[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        vectors = await asyncio.gather(*(self.embed(text) for text in texts))
+        return np.vstack(vectors).astype(np.float32, copy=False)
+
+    async def _next_batch(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already waiting before sleeping
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        # Callers that gave up don't need a vector
+        return [(text, future) for text, future in batch if not future.done()]
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            if not batch:
+                continue
+
+            texts = [text for text, _ in batch]
+            try:
+                vectors = await self._loop.run_in_executor(
+                    self.executor, self.encode_fn, texts
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self._record(len(batch))
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+    def _record(self, size: int):
+        self.batches += 1
+        self.items += size
+        self.largest_batch = max(self.largest_batch, size)
+        for bucket in self.BUCKETS:
+            if size <= bucket:
+                self.histogram[bucket] += 1
+                break
+        else:
+            self.histogram["+Inf"] += 1
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "batch_size_histogram": {str(k): v for k, v in self.histogram.items()},
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+    def shutdown(self):
+        if self._worker is not None:
+            self._worker.cancel()
+
+
+def cosine_parity(candidate: np.ndarray, reference: np.ndarray) -> dict:
+    """Row-wise cosine similarity between two backends' embeddings."""
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    cosines = (candidate * reference).sum(axis=1)
+    return {
+        "texts": len(cosines),
+        "min_cosine": float(cosines.min()),
+        "mean_cosine": float(cosines.mean()),
+    }
+
+
+def onnx_model_dir(model_name: str) -> str:
+    return os.path.join(settings.EMBEDDING_ONNX_DIR, model_name.replace("/", "__"))
+
+
+def export_onnx_model(model_name: str, model_dir: str, min_cosine: float) -> dict:
+    """Export `model_name` to ONNX (fp32 + dynamic int8) and check parity.
+
+    Raises RuntimeError, leaving nothing behind, if either variant falls
+    below `min_cosine` against the sentence-transformers model.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize
+
+    logger.info("Exporting %s to ONNX", model_name)
+    reference = SentenceTransformer(model_name, device="cpu")
+    transformer = reference[0].auto_model.eval()
+    tokenizer = reference.tokenizer
+
+    parent = os.path.dirname(model_dir) or "."
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix=".export-")
+    try:
+        sample = tokenizer(["warmup export"], return_tensors="pt")
+        input_names = [
+            name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample
+        ]
+
+        class _Wrapper(torch.nn.Module):
+            def __init__(self, model):
+                super().__init__()
+                self.model = model
+
+            def forward(self, *tensors):
+                return self.model(**dict(zip(input_names, tensors)))[0]
+
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["token_embeddings"] = {0: "batch", 1: "sequence"}
+        with torch.no_grad():
+            torch.onnx.export(
+                _Wrapper(transformer),
+                tuple(sample[name] for name in input_names),
+                os.path.join(tmp_dir, "model.onnx"),
+                input_names=input_names,
+                output_names=["token_embeddings"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14
+            )
+        quantize_dynamic(
+            os.path.join(tmp_dir, "model.onnx"),
+            os.path.join(tmp_dir, "model.int8.onnx"),
+            weight_type=QuantType.QInt8
+        )
+        tokenizer.save_pretrained(tmp_dir)
+
+        export = {
+            "model": model_name,
+            "dim": reference.get_sentence_embedding_dimension(),
+            "max_seq_length": reference.max_seq_length,
+            "pooling": "cls" if reference[1].pooling_mode_cls_token else "mean",
+            "normalize": any(isinstance(module, Normalize) for module in reference),
+            "parity": {},
+        }
+        with open(os.path.join(tmp_dir, "export.json"), "w") as f:
+            json.dump(export, f)
+
+        expected = reference.encode(PARITY_SENTENCES)
+        for quantized in (False, True):
+            backend = OnnxEmbeddingBackend(tmp_dir, quantized)
+            parity = cosine_parity(backend.encode(PARITY_SENTENCES), expected)
+            variant = "int8" if quantized else "fp32"
+            logger.info("ONNX %s parity: min cosine %.4f", variant, parity["min_cosine"])
+            if parity["min_cosine"] < min_cosine:
+                raise RuntimeError(
+                    f"ONNX {variant} export of {model_name} differs from the reference "
+                    f"model (min cosine {parity['min_cosine']:.4f} < {min_cosine})"
+                )
+            export["parity"][variant] = parity
+
+        with open(os.path.join(tmp_dir, "export.json"), "w") as f:
+            json.dump(export, f)
+
+        # Another worker may have finished the same export first
+        try:
+            os.rename(tmp_dir, model_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    return export
+
+
+def export_meets_parity(model_dir: str, quantized: bool, min_cosine: float) -> bool:
+    """Whether a saved export's parity check reached `min_cosine`."""
+    with open(os.path.join(model_dir, "export.json")) as f:
+        export = json.load(f)
+    parity = export.get("parity", {}).get("int8" if quantized else "fp32")
+    return parity is not None and parity["min_cosine"] >= min_cosine
+
+
+def embedding_model_id() -> str:
+    """Identifies the configured embeddings (cache key): the ONNX variants
+    are close to, but not bit-identical with, the reference model."""
+    if settings.EMBEDDING_BACKEND == "onnx":
+        variant = "int8" if settings.EMBEDDING_ONNX_QUANTIZE else "fp32"
+        return f"{settings.EMBEDDING_MODEL}:onnx-{variant}"
+    return settings.EMBEDDING_MODEL
+
+
+def create_embedding_backend(backend: Optional[str] = None) -> EmbeddingBackend:
+    backend = backend or settings.EMBEDDING_BACKEND
+
+    if backend == "sentence_transformers":
+        return SentenceTransformerBackend(settings.EMBEDDING_MODEL, settings.EMBEDDING_THREADS)
+
+    if backend == "onnx":
+        model_dir = onnx_model_dir(settings.EMBEDDING_MODEL)
+        min_cosine = settings.EMBEDDING_PARITY_MIN_COSINE
+        if os.path.exists(os.path.join(model_dir, "export.json")) and not export_meets_parity(
+            model_dir, settings.EMBEDDING_ONNX_QUANTIZE, min_cosine
+        ):
+            # Saved under a lower threshold (or without a check): export
+            # again, which raises if it still falls short
+            shutil.rmtree(model_dir, ignore_errors=True)
+        if not os.path.exists(os.path.join(model_dir, "export.json")):
+            export_onnx_model(settings.EMBEDDING_MODEL, model_dir, min_cosine)
+        return OnnxEmbeddingBackend(
+            model_dir,
+            quantized=settings.EMBEDDING_ONNX_QUANTIZE,
+            threads=settings.EMBEDDING_THREADS
+        )
+
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend}")
@@ -0,0 +1,237 @@
+import asyncio
+import os
+import socket
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+from pymongo.errors import DuplicateKeyError
+from app.config import settings
+from app.db.mongodb import db
+from app.utils.logger import get_logger, in_context
+
+logger = get_logger(__name__)
+
+# Job states reported by /documents/{id}/status
+QUEUED = "queued"
+PROCESSING = "processing"
+DONE = "done"
+FAILED = "failed"
+
+# Owner of the jobs this process runs (one per API worker)
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class IngestionJob:
+
+    def __init__(self, job_id: str, user_id: str, filename: str):
+        self.job_id = job_id
+        self.user_id = user_id
+        self.filename = filename
+        self.status = QUEUED
+        self.chunks_processed = 0
+        self.chunks_total: Optional[int] = None
+        self.num_chunks: Optional[int] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+
+    def update_progress(self, processed: int, total: Optional[int]):
+        # Called from the worker thread; plain attribute writes are enough
+        self.chunks_processed = processed
+        self.chunks_total = total
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in (QUEUED, PROCESSING)
+
+    def to_dict(self) -> dict:
+        return {
+            "document_id": self.job_id,
+            "filename": self.filename,
+            "status": self.status,
+            "chunks_processed": self.chunks_processed,
+            "chunks_total": self.chunks_total,
+            "num_chunks": self.num_chunks,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    def record(self) -> dict:
+        # Stored in the ingestion_jobs collection, keyed by job id;
+        # updated_at doubles as the owner's lease on an active job
+        record = self.to_dict()
+        record["user_id"] = self.user_id
+        record["owner"] = WORKER_ID
+        record["updated_at"] = datetime.utcnow()
+        del record["document_id"]
+        return record
+
+
+class IngestionQueue:
+    """Runs PDF ingestion on a bounded thread pool, off the event loop.
+
+    Job status is kept in memory for live progress and saved to the
+    ingestion_jobs collection, so every API worker can report it and
+    failures outlive pruning and restarts.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        max_pending: int,
+        max_finished: int = 1000
+    ):
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="ingest"
+        )
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self.jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._tasks = set()
+
+    def pending_count(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.is_active)
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self.jobs.get(job_id)
+
+    def submit(
+        self,
+        job_id: str,
+        user_id: str,
+        filename: str,
+        handler: Callable[[IngestionJob], Awaitable[int]],
+        on_failure: Optional[Callable[[IngestionJob], Awaitable[None]]] = None
+    ) -> IngestionJob:
+        """Register a job and schedule `handler` for it.
+
+        `handler` runs on the event loop and should push its blocking work
+        through `run_in_worker`; its return value is the chunk count.
+        """
+        if self.pending_count() >= self.max_pending:
+            raise QueueFullError("Ingestion queue is full, try again later")
+
+        job = IngestionJob(job_id, user_id, filename)
+        self.jobs[job_id] = job
+        self._prune()
+
+        task = asyncio.create_task(self._run(job, handler, on_failure))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+        return job
+
+    async def run_in_worker(self, job: IngestionJob, fn: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+
+        def run():
+            job.status = PROCESSING
+            job.started_at = datetime.utcnow()
+            return fn(*args, **kwargs)
+
+        # Keep the trace id of the request that queued the job
+        return await loop.run_in_executor(self.executor, in_context(run))
+
+    async def claim(self, job_id: str, user_id: str, filename: str) -> bool:
+        """Take over an interrupted job; False if another worker runs it.
+
+        An active job is only claimed once its owner has stopped renewing
+        the lease (every INGESTION_STATUS_SAVE_SECONDS while it runs).
+        Claiming is a single conditional upsert, so one worker wins.
+        """
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=settings.INGESTION_JOB_LEASE_SECONDS)
+        try:
+            await db.get_db()["ingestion_jobs"].update_one(
+                {
+                    "_id": job_id,
+                    "$or": [
+                        {"status": {"$nin": [QUEUED, PROCESSING]}},
+                        {"updated_at": {"$lt": stale}},
+                    ]
+                },
+                {"$set": {
+                    "user_id": user_id,
+                    "filename": filename,
+                    "status": QUEUED,
+                    "owner": WORKER_ID,
+                    "updated_at": now,
+                }},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # The record exists but didn't match: its lease is still live
+            return False
+        return True
+
+    async def _save(self, job: IngestionJob):
+        # Status is informational; a failed write must not fail the job
+        try:
+            await db.get_db()["ingestion_jobs"].update_one(
+                {"_id": job.job_id},
+                {"$set": job.record()},
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning("Could not save status of %s: %s", job.job_id, e)
+
+    async def _save_progress(self, job: IngestionJob):
+        # Also renews this worker's lease on the job
+        while True:
+            await asyncio.sleep(settings.INGESTION_STATUS_SAVE_SECONDS)
+            await self._save(job)
+
+    async def _run(
+        self,
+        job: IngestionJob,
+        handler: Callable[[IngestionJob], Awaitable[int]],
+        on_failure: Optional[Callable[[IngestionJob], Awaitable[None]]]
+    ):
+        await self._save(job)
+        progress = asyncio.create_task(self._save_progress(job))
+        try:
+            job.num_chunks = await handler(job)
+            job.status = DONE
+            logger.info("Ingestion done: %s (%d chunks)", job.job_id, job.num_chunks)
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+            logger.exception("Ingestion failed: %s: %s", job.job_id, e)
+            if on_failure:
+                try:
+                    await on_failure(job)
+                except Exception as cleanup_error:
+                    logger.error("Cleanup failed for %s: %s", job.job_id, cleanup_error)
+        finally:
+            progress.cancel()
+            job.finished_at = datetime.utcnow()
+            await self._save(job)
+
+    def _prune(self):
+        # Forget the oldest finished jobs; their status lives in MongoDB
+        finished = [
+            job_id for job_id, job in self.jobs.items() if not job.is_active
+        ]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job_id]
+
+    def shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Global ingestion queue
+ingestion_queue = IngestionQueue(
+    max_workers=settings.INGESTION_WORKERS,
+    max_pending=settings.INGESTION_MAX_PENDING
+)
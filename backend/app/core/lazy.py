@@ -0,0 +1,60 @@
+import threading
+import time
+from typing import Any, Callable, Optional
+
+# Component states reported by /ready
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class LazyComponent:
+    """A heavy dependency built on first use (or by a background warmup).
+
+    Concurrent callers block on the same load instead of building it twice;
+    a failed load is retried by the next caller.
+    """
+
+    def __init__(self, name: str, loader: Callable[[], Any]):
+        self.name = name
+        self.loader = loader
+        self.status = PENDING
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_ready(self) -> bool:
+        return self.status == READY
+
+    def get(self) -> Any:
+        if self.status == READY:
+            return self._value
+
+        with self._lock:
+            if self.status != READY:
+                self.status = LOADING
+                start = time.perf_counter()
+                try:
+                    self._value = self.loader()
+                except Exception as e:
+                    self.status = FAILED
+                    self.error = str(e)
+                    raise
+                self.load_seconds = time.perf_counter() - start
+                self.error = None
+                self.status = READY
+        return self._value
+
+    def peek(self) -> Any:
+        """The value if already loaded, without triggering a load."""
+        return self._value if self.status == READY else None
+
+    def to_dict(self) -> dict:
+        return {
+            "status": self.status,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "error": self.error,
+        }
@@ -0,0 +1,108 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+
+# Stage timings: from a few ms (cached embedding) up to minutes (big PDFs)
+STAGE_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300
+)
+
+HTTP_REQUESTS = Counter(
+    "studymate_http_requests_total",
+    "HTTP requests by route and status",
+    ["method", "route", "status"]
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "studymate_http_request_seconds",
+    "HTTP request latency",
+    ["method", "route"],
+    buckets=STAGE_BUCKETS
+)
+
+QUERY_STAGE_SECONDS = Histogram(
+    "studymate_query_stage_seconds",
+    "Time per query stage (embed, retrieve, generate, history)",
+    ["stage"],
+    buckets=STAGE_BUCKETS
+)
+QUERIES = Counter(
+    "studymate_queries_total",
+    "Questions answered, by how the answer was produced",
+    ["mode", "source"]  # mode: single/stream/batch, source: llm/cache/error
+)
+
+INGEST_STAGE_SECONDS = Histogram(
+    "studymate_ingest_stage_seconds",
+    "Time per document spent in each ingestion stage (extract, split, embed, store)",
+    ["stage"],
+    buckets=STAGE_BUCKETS
+)
+INGESTED_CHUNKS = Counter(
+    "studymate_ingested_chunks_total",
+    "Chunks stored, by whether their embedding was computed or reused",
+    ["embedding"]
+)
+
+
+@contextmanager
+def observe(histogram: Histogram, stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(stage=stage).observe(time.perf_counter() - start)
+
+
+class StageTimings:
+    """Accumulates time per stage across a whole document."""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def time(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def timed_iter(self, iterable: Iterable, stage: str) -> Iterator:
+        """Charge the time spent producing each item to `stage`."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(stage, time.perf_counter() - start)
+                return
+            self.add(stage, time.perf_counter() - start)
+            yield item
+
+    def observe(self, histogram: Histogram):
+        for stage, seconds in self.seconds.items():
+            histogram.labels(stage=stage).observe(seconds)
+
+
+def render_metrics():
+    """Prometheus text exposition; aggregates all workers when
+    PROMETHEUS_MULTIPROC_DIR is set."""
+    registry = REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
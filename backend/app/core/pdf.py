@@ -0,0 +1,50 @@
+from pypdf import PdfReader
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import Executor
+from typing import Iterator, List, Optional
+
+# Kept free of heavy imports: process-pool workers import this module
+# to run `extract_page_range`, and must not load the embedding model.
+
+PAGE_SEPARATOR = "\n"
+
+
+def count_pages(file_path: str) -> int:
+    return len(PdfReader(file_path).pages)
+
+
+def extract_page_range(file_path: str, start: int, end: int) -> List[str]:
+    """Extract the text of pages [start, end) (0-based)."""
+    reader = PdfReader(file_path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def iter_pages(
+    file_path: str,
+    pool: Optional[Executor] = None,
+    pages_per_task: int = 16,
+    max_in_flight: int = 2
+) -> Iterator[str]:
+    """Yield page texts in order, keeping at most `max_in_flight` page
+    ranges extracted ahead of the consumer."""
+    if pool is None:
+        reader = PdfReader(file_path)
+        for page in reader.pages:
+            yield page.extract_text() or ""
+        return
+
+    num_pages = count_pages(file_path)
+    pending = deque()
+    for start in range(0, num_pages, pages_per_task):
+        end = min(start + pages_per_task, num_pages)
+        pending.append(pool.submit(extract_page_range, file_path, start, end))
+        if len(pending) > max_in_flight:
+            yield from pending.popleft().result()
+    while pending:
+        yield from pending.popleft().result()
+
+
+def page_for_offset(page_starts: List[int], offset: int) -> int:
+    """1-based page number containing character `offset`."""
+    return max(1, bisect_right(page_starts, offset))
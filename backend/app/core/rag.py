@@ -1,182 +1,1005 @@
-from sentence_transformers import SentenceTransformer
-from pypdf import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-import chromadb
-from chromadb.config import Settings as ChromaSettings
-from groq import Groq
 from app.config import settings
+import asyncio
+import multiprocessing
 import os
-from typing import List, Tuple
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import AsyncIterator, Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+import numpy as np
+from app.core.embedding_cache import EmbeddingCache, text_hash
+from app.core.answer_cache import SemanticAnswerCache
+from app.core import pdf
+from app.core.chunking import TOKENS, TextChunker
+from app.core.context import ContextAssembler, PackedContext
+from app.core.conversation import (
+    Conversation,
+    clip_summary,
+    fallback_rewrite,
+    history_messages,
+    rewrite_messages,
+    summary_messages,
+)
+from app.core.embeddings import (
+    EmbeddingBackend,
+    EmbeddingBatcher,
+    create_embedding_backend,
+    embedding_model_id,
+)
+from app.core.embedding_sidecar import SidecarEmbeddingBackend
+from app.core.lazy import LazyComponent
+from app.core.revisions import PageIndex, plan_revision, revision_chunk_id
+from app.core.metrics import (
+    INGEST_STAGE_SECONDS,
+    INGESTED_CHUNKS,
+    QUERIES,
+    QUERY_STAGE_SECONDS,
+    StageTimings,
+    observe,
+)
+from app.models.chat import ChatMessage
+from app.db.vector import CollectionNotFoundError, VectorHit, VectorStore, create_vector_store
+from app.utils.logger import get_logger, in_context, log_fields
+
+logger = get_logger(__name__)
+
+# Marks the end of the producer's batch stream during ingestion
+_END_OF_STREAM = object()
+
+class Chunk(NamedTuple):
+    text: str
+    char_start: int
+    char_end: int
+    page_start: int  # 1-based
+    page_end: int
+
+class IngestResult(NamedTuple):
+    num_chunks: int
+    pages: PageIndex  # Stored with the document for later replacements
 
 class RAGPipeline:
    
     
     def __init__(self):
+        # Heavy dependencies (model, API clients, vector store) are built on
+        # first use or by warmup(), so importing this module stays cheap
+        self.components = {
+            component.name: component
+            for component in (
+                LazyComponent("embedding_model", self._load_embedding_model),
+                LazyComponent("groq", self._load_groq_client),
+                LazyComponent("vector_store", create_vector_store),
+                LazyComponent("embedding_cache", self._load_embedding_cache),
+            )
+        }
+        # Sidecar fallback; only loaded if needed
+        self._local_embedding_model = LazyComponent(
+            "local_embedding_model", self._load_local_embedding_model
+        )
+        
+        # Semantic answer cache (skips the LLM for repeated questions)
+        self.answer_cache = SemanticAnswerCache(
+            threshold=settings.ANSWER_CACHE_THRESHOLD,
+            max_entries=settings.ANSWER_CACHE_SIZE,
+            ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS
+        )
+        
+        # Query path: CPU-bound stages run on their own executor so they
+        # never block the event loop or queue behind PDF ingestion
+        self.query_executor = ThreadPoolExecutor(
+            max_workers=settings.QUERY_WORKERS,
+            thread_name_prefix="query"
+        )
+        self._search_limit = asyncio.Semaphore(settings.QUERY_SEARCH_CONCURRENCY)
+        self._llm_limit = asyncio.Semaphore(settings.QUERY_LLM_CONCURRENCY)
+        
+        # Question embeddings from concurrent requests are encoded together
+        self.embedding_batcher = EmbeddingBatcher(
+            encode_fn=self._create_embeddings,
+            executor=self.query_executor,
+            max_batch_size=settings.EMBED_BATCH_MAX_SIZE,
+            max_wait_ms=settings.EMBED_BATCH_MAX_WAIT_MS
+        )
+        
+        # Packs retrieved chunks into the prompt within a token budget
+        self.context_assembler = ContextAssembler(
+            max_tokens=settings.CONTEXT_MAX_TOKENS,
+            chars_per_token=settings.CONTEXT_CHARS_PER_TOKEN,
+            max_overlap=self._max_overlap_chars()
+        )
+        
+        # Splits text into chunks, keeping character offsets for page mapping
+        self.chunker = TextChunker(
+            chunk_size=settings.CHUNK_SIZE,
+            chunk_overlap=settings.CHUNK_OVERLAP,
+            unit=settings.CHUNK_UNIT,
+            sentence_boundaries=settings.CHUNK_SENTENCE_BOUNDARIES
+        )
+        
+        # Process pool for page-parallel PDF extraction (created on first use)
+        self._extract_pool: Optional[ProcessPoolExecutor] = None
+    
+    def _max_overlap_chars(self) -> int:
+        # Longest text neighbouring chunks share, for chunks stored without offsets
+        if settings.CHUNK_UNIT == TOKENS:
+            return int(settings.CHUNK_OVERLAP * settings.CONTEXT_CHARS_PER_TOKEN)
+        return settings.CHUNK_OVERLAP
+    
+    def _load_embedding_model(self) -> EmbeddingBackend:
+        if settings.EMBEDDING_SIDECAR_SOCKET:
+            # Shared model server; in-process model only if it's unreachable
+            backend = SidecarEmbeddingBackend(
+                socket_path=settings.EMBEDDING_SIDECAR_SOCKET,
+                timeout=settings.EMBEDDING_SIDECAR_TIMEOUT_SECONDS,
+                fallback=self._local_embedding_model.get
+            )
+            backend.encode(["warmup"])
+            logger.info("Embedding sidecar connected: %s", settings.EMBEDDING_SIDECAR_SOCKET)
+            return backend
+        return self._local_embedding_model.get()
+    
+    def _load_local_embedding_model(self) -> EmbeddingBackend:
         # Initialize embedding model (local, FREE!)
-        print(f"Loading embedding model: {settings.EMBEDDING_MODEL}")
-        self.embedding_model = SentenceTransformer(settings.EMBEDDING_MODEL)
-        print(" Embedding model loaded")
+        logger.info("Loading embedding model: %s", embedding_model_id())
+        backend = create_embedding_backend()
+        
+        # Dummy encode so the first real request doesn't pay for lazy init
+        backend.encode(["warmup"])
+        logger.info("Embedding model loaded")
+        return backend
+    
+    def _load_embedding_cache(self) -> EmbeddingCache:
+        # Memory LRU + on-disk store under DATA_DIR
+        path = None
+        if settings.EMBEDDING_CACHE_PATH:
+            path = os.path.join(settings.DATA_DIR, settings.EMBEDDING_CACHE_PATH)
+        return EmbeddingCache(
+            model_name=embedding_model_id(),
+            path=path,
+            max_memory_items=settings.EMBEDDING_CACHE_SIZE
+        )
+    
+    def _load_groq_client(self):
+        from groq import AsyncGroq
+        
+        options = {"api_key": settings.GROQ_API_KEY}
+        if settings.GROQ_BASE_URL:
+            options["base_url"] = settings.GROQ_BASE_URL
+        return AsyncGroq(**options)
+    
+    @property
+    def embedding_model(self) -> EmbeddingBackend:
+        # sentence-transformers, ONNX Runtime or the shared sidecar
+        return self.components["embedding_model"].get()
+    
+    @property
+    def async_groq_client(self):
+        return self.components["groq"].get()
+    
+    @property
+    def embedding_cache(self) -> EmbeddingCache:
+        return self.components["embedding_cache"].get()
+    
+    @property
+    def vector_store(self) -> VectorStore:
+        # Vector store backend (Chroma or built-in numpy, see VECTOR_BACKEND)
+        return self.components["vector_store"].get()
+    
+    def warmup(self):
+        """Build every component now; runs in the background at startup."""
+        for component in self.components.values():
+            try:
+                component.get()
+            except Exception as e:
+                logger.error("Failed to load %s: %s", component.name, e)
         
-        # Initialize Groq client
-        self.groq_client = Groq(api_key=settings.GROQ_API_KEY)
+        if self.is_ready():
+            logger.info("RAG Pipeline initialized")
+    
+    def is_ready(self) -> bool:
+        return all(component.is_ready for component in self.components.values())
+    
+    def readiness(self) -> dict:
+        return {name: component.to_dict() for name, component in self.components.items()}
+    
+    
+    def _get_extract_pool(self) -> ProcessPoolExecutor:
+        if self._extract_pool is None:
+            # "spawn" keeps torch/chroma threads out of the children
+            self._extract_pool = ProcessPoolExecutor(
+                max_workers=settings.PDF_EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._extract_pool
+    
+    def _iter_pages(self, file_path: str) -> Iterator[str]:
         
-        # Text splitter for chunking
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,  # Characters per chunk
-            chunk_overlap=200,  # Overlap to preserve context
-            length_function=len,
+        # Small files aren't worth the inter-process round trip
+        pool = None
+        if (
+            settings.PDF_EXTRACT_WORKERS > 1
+            and pdf.count_pages(file_path) >= settings.PDF_PARALLEL_MIN_PAGES
+        ):
+            pool = self._get_extract_pool()
+        
+        return pdf.iter_pages(
+            file_path,
+            pool=pool,
+            pages_per_task=settings.PDF_PAGES_PER_TASK,
+            max_in_flight=settings.PDF_EXTRACT_WORKERS
         )
+    
+    def extract_page_text(self, file_path: str, page_number: int) -> str:
+        """Text of a single 1-based page, without parsing the rest."""
+        return pdf.extract_page_range(file_path, page_number - 1, page_number)[0]
+    
+    def _iter_chunks(self, pages: Iterable[str]) -> Iterator[Chunk]:
+        """Split a stream of pages without holding the whole text.
+
+        Text is buffered until INGEST_SPLIT_WINDOW_CHARS, then split; chunks
+        more text can't change are emitted, the rest is carried over into
+        the next window. The result is the same as splitting the whole text.
+        """
+        buffer = ""
+        buffer_offset = 0  # Document offset of buffer[0]
+        text_length = 0
+        page_starts = []
+        
+        for page in pages:
+            if page_starts:
+                buffer += pdf.PAGE_SEPARATOR
+                text_length += len(pdf.PAGE_SEPARATOR)
+            page_starts.append(text_length)
+            buffer += page
+            text_length += len(page)
+            
+            if len(buffer) >= settings.INGEST_SPLIT_WINDOW_CHARS:
+                spans, resume = self.chunker.split_partial(buffer)
+                for start, end in spans:
+                    yield self._chunk_at(buffer[start:end], buffer_offset + start, page_starts)
+                buffer = buffer[resume:]
+                buffer_offset += resume
         
-        # Create ChromaDB client
-        os.makedirs(settings.CHROMA_DIR, exist_ok=True)
-        self.chroma_client = chromadb.PersistentClient(
-            path=settings.CHROMA_DIR,
-            settings=ChromaSettings(anonymized_telemetry=False)
+        for start, end in self.chunker.split(buffer):
+            yield self._chunk_at(buffer[start:end], buffer_offset + start, page_starts)
+    
+    def _chunk_at(self, text: str, char_start: int, page_starts: List[int]) -> Chunk:
+        char_end = char_start + len(text)
+        return Chunk(
+            text=text,
+            char_start=char_start,
+            char_end=char_end,
+            page_start=pdf.page_for_offset(page_starts, char_start),
+            page_end=pdf.page_for_offset(page_starts, max(char_start, char_end - 1))
         )
+    
+    def _create_embeddings(self, texts: List[str]) -> np.ndarray:
+        
+        # Only encode texts the cache has not seen for this model
+        vectors = self.embedding_cache.get_many(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            encoded = self.embedding_model.encode(missing_texts)
+            self.embedding_cache.put_many(missing_texts, encoded)
+            for i, vector in zip(missing, encoded):
+                vectors[i] = vector
         
-        print("✅ RAG Pipeline initialized")
+        if not vectors:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.vstack(vectors).astype(np.float32, copy=False)
     
-    def _extract_text_from_pdf(self, file_path: str) -> str:
+    def _embed_chunks(
+        self,
+        user_id: str,
+        texts: List[str],
+        chunk_hashes: List[str]
+    ) -> Tuple[np.ndarray, int]:
         
-        reader = PdfReader(file_path)
-        text = ""
+        # Reuse vectors the current model already stored for identical chunk text
+        stored = self.vector_store.find_by_chunk_hash(
+            user_id, chunk_hashes, embedding_model_id()
+        )
+        rows = [stored.get(chunk_hash) for chunk_hash in chunk_hashes]
+        missing = [i for i, row in enumerate(rows) if row is None]
         
-        for page_num, page in enumerate(reader.pages):
-            text += page.extract_text()
+        if missing:
+            encoded = self._create_embeddings([texts[i] for i in missing])
+            for i, vector in zip(missing, encoded):
+                rows[i] = vector
         
-        return text
+        embeddings = np.vstack(rows).astype(np.float32, copy=False)
+        return embeddings, len(texts) - len(missing)
     
-    def _create_embeddings(self, texts: List[str]) -> List[List[float]]:
+    def _produce_batches(
+        self,
+        file_path: str,
+        batches: queue.Queue,
+        stop: threading.Event,
+        timings: StageTimings,
+        page_index: PageIndex
+    ):
+        """Extract + split in a producer thread, feeding fixed-size batches.
 
-        embeddings = self.embedding_model.encode(texts)
-        return embeddings.tolist()  # Convert numpy array to list
+        `batches` is bounded, so this blocks (backpressure) whenever the
+        embedding side falls behind.
+        """
+        
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        try:
+            # Splitting pulls pages, so page time is inside "split" here
+            # and subtracted once the document is done
+            pages = timings.timed_iter(self._iter_pages(file_path), "extract")
+            pages = self._index_pages(pages, page_index)
+            batch = []
+            for chunk in timings.timed_iter(self._iter_chunks(pages), "split"):
+                batch.append(chunk)
+                if len(batch) >= settings.INGESTION_EMBED_BATCH_SIZE:
+                    if not put(batch):
+                        return
+                    batch = []
+            if batch and not put(batch):
+                return
+            put(_END_OF_STREAM)
+        except Exception as e:
+            put(e)
+    
+    def _index_pages(self, pages: Iterable[str], page_index: PageIndex) -> Iterator[str]:
+        for page in pages:
+            page_index.add(page)
+            yield page
     
     def process_pdf(
         self, 
         file_path: str, 
         user_id: str, 
-        document_id: str
+        document_id: str,
+        progress_callback: Optional[Callable[[int, Optional[int]], None]] = None
+    ) -> IngestResult:
+        """Ingest a PDF as a bounded-memory stream.
+
+        Pages -> splitter -> batched embedding -> batched store. At most
+        INGEST_MAX_PENDING_BATCHES batches wait between the stages. Chunk
+        ids are deterministic, so a re-run after an interruption skips the
+        batches that were already committed.
+        """
+        
+        logger.info("Processing PDF: %s", file_path)
+        timings = StageTimings()
+        
+        # Step 1: Batches are stored in order, so the stored count is the
+        # point an interrupted run got to
+        committed = self.vector_store.count_document(user_id, document_id)
+        if committed:
+            logger.info("Resuming after %d committed chunks", committed)
+        
+        # Step 2: Extract + split pages in a producer thread
+        batches = queue.Queue(maxsize=settings.INGEST_MAX_PENDING_BATCHES)
+        stop = threading.Event()
+        page_index = PageIndex([], [])
+        producer = threading.Thread(
+            target=self._produce_batches,
+            args=(file_path, batches, stop, timings, page_index),
+            name="ingest-producer",
+            daemon=True
+        )
+        producer.start()
+        
+        # Step 3: Embed and store batch by batch
+        model_id = embedding_model_id()
+        total = 0
+        reused = 0
+        try:
+            while True:
+                item = batches.get()
+                if item is _END_OF_STREAM:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                
+                first_index = total
+                total += len(item)
+                
+                # Skip what an interrupted run already stored
+                skip = max(0, committed - first_index)
+                if skip >= len(item):
+                    continue
+                chunks = item[skip:]
+                first_index += skip
+                
+                texts = [chunk.text for chunk in chunks]
+                chunk_hashes = [text_hash(text) for text in texts]
+                with timings.time("embed"):
+                    embeddings, batch_reused = self._embed_chunks(user_id, texts, chunk_hashes)
+                reused += batch_reused
+                INGESTED_CHUNKS.labels(embedding="reused").inc(batch_reused)
+                INGESTED_CHUNKS.labels(embedding="computed").inc(len(chunks) - batch_reused)
+                
+                ids = [f"{document_id}_chunk_{first_index + i}" for i in range(len(chunks))]
+                metadatas = [
+                    {
+                        "document_id": document_id,
+                        "chunk_index": first_index + i,
+                        "user_id": user_id,
+                        "chunk_hash": chunk_hashes[i],
+                        "embedding_model": model_id,
+                        "page_start": chunk.page_start,
+                        "page_end": chunk.page_end,
+                        "char_start": chunk.char_start,
+                        "char_end": chunk.char_end
+                    }
+                    for i, chunk in enumerate(chunks)
+                ]
+                
+                with timings.time("store"):
+                    self.vector_store.upsert(user_id, ids, embeddings, texts, metadatas)
+                
+                if progress_callback:
+                    progress_callback(total, None)
+        finally:
+            stop.set()
+            producer.join()
+        
+        if progress_callback:
+            progress_callback(total, total)
+        
+        timings.seconds["split"] = max(
+            0.0, timings.seconds.get("split", 0.0) - timings.seconds.get("extract", 0.0)
+        )
+        timings.observe(INGEST_STAGE_SECONDS)
+        logger.info(
+            "Stored %d chunks (%d embeddings reused)", total, reused,
+            extra=log_fields(
+                document_id=document_id,
+                chunks=total,
+                **{f"{stage}_seconds": round(seconds, 3) for stage, seconds in timings.seconds.items()}
+            )
+        )
+        
+        return IngestResult(total, page_index)
+    
+    def replace_pdf(
+        self,
+        file_path: str,
+        user_id: str,
+        document_id: str,
+        old_pages: Optional[PageIndex],
+        revision: int,
+        progress_callback: Optional[Callable[[int, Optional[int]], None]] = None
+    ) -> IngestResult:
+        """Move a document to a revised PDF, keeping its id.
+
+        Pages are diffed by content hash against `old_pages`; chunks inside
+        unchanged pages are kept (only their metadata moves), and just the
+        text around changed pages is split, embedded and stored. Unlike
+        process_pdf this holds the new version's text in memory to split
+        it piecewise.
+        """
+        logger.info("Replacing %s with revision %d: %s", document_id, revision, file_path)
+        timings = StageTimings()
+        
+        # Step 1: Extract the new version and diff it against the old pages
+        with timings.time("extract"):
+            pages = list(self._iter_pages(file_path))
+        new_pages = PageIndex.from_pages(pages)
+        text = pdf.PAGE_SEPARATOR.join(pages)
+        page_starts = new_pages.starts()
+        
+        # Chunks embedded by another model can't be kept next to new ones
+        existing = self.vector_store.get(user_id, document_id)
+        model_id = embedding_model_id()
+        if any(m.get("embedding_model") != model_id for m in existing.metadatas):
+            logger.info("Stored chunks use another embedding model; re-embedding all")
+            old_pages = None
+        plan = plan_revision(
+            old_pages, new_pages, text, existing.ids, existing.metadatas,
+            document_id, revision
+        )
+        
+        # Step 2: Split only the text no kept chunk covers
+        with timings.time("split"):
+            new_chunks = [
+                self._chunk_at(text[start + s:start + e], start + s, page_starts)
+                for start, end in plan.spans
+                for s, e in self.chunker.split(text[start:end])
+            ]
+        
+        # Step 3: Number kept and new chunks in document order
+        entries = [(m["char_start"], m["char_end"], chunk_id, m, None) for chunk_id, m in plan.kept]
+        entries += [(c.char_start, c.char_end, None, None, c) for c in new_chunks]
+        entries.sort(key=lambda entry: (entry[0], entry[1]))
+        
+        stored_metadata = dict(zip(existing.ids, existing.metadatas))
+        moved_ids, moved_metadatas = [], []
+        new_ids, new_metadatas = [], []
+        for index, (_, _, chunk_id, metadata, chunk) in enumerate(entries):
+            if chunk is None:
+                metadata = {**metadata, "chunk_index": index}
+                if metadata != stored_metadata[chunk_id]:
+                    moved_ids.append(chunk_id)
+                    moved_metadatas.append({**metadata, "revision": revision})
+                continue
+            new_ids.append(revision_chunk_id(document_id, revision, index))
+            new_metadatas.append({
+                "document_id": document_id,
+                "chunk_index": index,
+                "user_id": user_id,
+                "chunk_hash": text_hash(chunk.text),
+                "embedding_model": model_id,
+                "page_start": chunk.page_start,
+                "page_end": chunk.page_end,
+                "char_start": chunk.char_start,
+                "char_end": chunk.char_end,
+                "revision": revision
+            })
+        new_texts = [chunk.text for *_, chunk in entries if chunk is not None]
+        
+        # Step 4: Embed and store the new chunks (identical chunk text,
+        # e.g. a paragraph that only moved, reuses its stored vector)
+        batch_size = settings.INGESTION_EMBED_BATCH_SIZE
+        reused = 0
+        try:
+            for start in range(0, len(new_ids), batch_size):
+                texts = new_texts[start:start + batch_size]
+                metadatas = new_metadatas[start:start + batch_size]
+                with timings.time("embed"):
+                    embeddings, batch_reused = self._embed_chunks(
+                        user_id, texts, [m["chunk_hash"] for m in metadatas]
+                    )
+                reused += batch_reused
+                INGESTED_CHUNKS.labels(embedding="reused").inc(batch_reused)
+                INGESTED_CHUNKS.labels(embedding="computed").inc(len(texts) - batch_reused)
+                
+                with timings.time("store"):
+                    self.vector_store.upsert(
+                        user_id, new_ids[start:start + batch_size], embeddings, texts, metadatas
+                    )
+                
+                if progress_callback:
+                    progress_callback(start + len(texts), len(new_ids))
+        except Exception:
+            # The old version is still intact; drop what this attempt added
+            if new_ids:
+                self.vector_store.delete(user_id, new_ids)
+            raise
+        
+        # Step 5: Drop chunks of changed pages, then move the kept ones
+        rewritten = set(new_ids)
+        removed = [chunk_id for chunk_id in plan.removed if chunk_id not in rewritten]
+        with timings.time("store"):
+            if removed:
+                self.vector_store.delete(user_id, removed)
+            if moved_ids:
+                self.vector_store.update_metadata(user_id, moved_ids, moved_metadatas)
+        
+        if progress_callback:
+            progress_callback(len(new_ids), len(new_ids))
+        
+        timings.observe(INGEST_STAGE_SECONDS)
+        logger.info(
+            "Replaced %s: %d of %d pages changed, %d chunks kept, %d new, %d removed",
+            document_id, plan.changed_pages, len(pages), len(plan.kept), len(new_ids), len(removed),
+            extra=log_fields(
+                document_id=document_id,
+                revision=revision,
+                changed_pages=plan.changed_pages,
+                chunks_kept=len(plan.kept),
+                chunks_new=len(new_ids),
+                chunks_removed=len(removed),
+                embeddings_reused=reused,
+                **{f"{stage}_seconds": round(seconds, 3) for stage, seconds in timings.seconds.items()}
+            )
+        )
+        
+        return IngestResult(len(entries), new_pages)
+    
+    def copy_document(
+        self,
+        source_user_id: str,
+        source_document_id: str,
+        user_id: str,
+        document_id: str,
+        progress_callback: Optional[Callable[[int, Optional[int]], None]] = None
     ) -> int:
+        """Reuse the chunks and vectors of an already ingested, identical PDF.
+
+        Returns the number of chunks copied (0 if the source has none left
+        or was embedded by another model).
+        """
+        logger.info("Reusing chunks of %s for %s", source_document_id, document_id)
         
-        print(f"\n Processing PDF: {file_path}")
+        batch_size = settings.INGESTION_EMBED_BATCH_SIZE
+        model_id = embedding_model_id()
+        copied = 0
         
-        # Step 1: Extract text
-        text = self._extract_text_from_pdf(file_path)
-        print(f" Extracted {len(text)} characters")
+        # Page through the source so only one batch is in memory at a time
+        while True:
+            records = self.vector_store.get(
+                source_user_id,
+                source_document_id,
+                include_embeddings=True,
+                limit=batch_size,
+                offset=copied
+            )
+            if not records.ids:
+                break
+            if any(m.get("embedding_model") != model_id for m in records.metadatas):
+                logger.info("Source was embedded by another model; not reusing it")
+                self.vector_store.delete_documents(user_id, [document_id])
+                return 0
+            
+            metadatas = []
+            for metadata in records.metadatas:
+                metadata = dict(metadata)
+                metadata["document_id"] = document_id
+                metadata["user_id"] = user_id
+                metadatas.append(metadata)
+            ids = [f"{document_id}_chunk_{meta['chunk_index']}" for meta in metadatas]
+            
+            self.vector_store.upsert(
+                user_id, ids, records.embeddings, records.documents, metadatas
+            )
+            copied += len(ids)
+            
+            if progress_callback:
+                progress_callback(copied, None)
         
-        # Step 2: Split into chunks
-        chunks = self.text_splitter.split_text(text)
-        print(f" Created {len(chunks)} chunks")
+        if progress_callback:
+            progress_callback(copied, copied)
         
-        # Step 3: Create embeddings
-        print("Creating embeddings...")
-        embeddings = self._create_embeddings(chunks)
-        print(f"Created {len(embeddings)} embeddings")
+        logger.info("Copied %d chunks", copied)
         
-        # Step 4: Store in ChromaDB
-        # Get or create collection for this user
-        collection_name = f"user_{user_id.replace('@', '_').replace('.', '_')}"
+        return copied
+    
+    def _search(
+        self,
+        user_id: str,
+        question_embeddings: np.ndarray,
+        document_ids: Optional[List[str]],
+        top_k: int
+    ) -> List[List[VectorHit]]:
         
+        # Search the user's collection for similar chunks (one list per question)
         try:
-            collection = self.chroma_client.get_collection(collection_name)
-        except:
-            collection = self.chroma_client.create_collection(
-                name=collection_name,
-                metadata={"user_id": user_id}
+            return self.vector_store.query(
+                user_id,
+                np.atleast_2d(question_embeddings),
+                top_k,
+                document_ids
             )
+        except CollectionNotFoundError as e:
+            raise Exception(str(e))
+    
+    def _retrieve(
+        self,
+        user_id: str,
+        question_embedding: np.ndarray,
+        document_ids: Optional[List[str]],
+        top_k: int
+    ) -> PackedContext:
+        hits = self._search(user_id, question_embedding, document_ids, top_k)[0]
+        return self._pack(hits)
+    
+    def _pack(self, hits: List[VectorHit]) -> PackedContext:
         
-        # Add chunks to collection
-        ids = [f"{document_id}_chunk_{i}" for i in range(len(chunks))]
-        metadatas = [
+        # Merge overlapping chunks and fill the token budget
+        packed = self.context_assembler.pack(hits)
+        logger.debug(
+            "Found %d relevant chunks, packed %d from %d documents (%d tokens, %d saved)",
+            len(hits), len(packed.chunk_ids), len(packed.sources), packed.tokens, packed.tokens_saved,
+            extra=log_fields(context_tokens=packed.tokens, context_tokens_saved=packed.tokens_saved)
+        )
+        return packed
+    
+    def _build_messages(
+        self,
+        context: str,
+        question: str,
+        conversation: Optional[Conversation] = None
+    ) -> List[dict]:
+        history = history_messages(conversation) if conversation else []
+        return [
             {
-                "document_id": document_id,
-                "chunk_index": i,
-                "user_id": user_id
+                "role": "system",
+                "content": "You are a helpful study assistant. Answer questions based ONLY on the provided context. If the answer is not in the context, say so."
+            },
+            *history,
+            {
+                "role": "user",
+                "content": f"""Context from documents:
+{context}
+
+Question: {question}
+
+Please provide a clear, accurate answer based on the context above."""
             }
-            for i in range(len(chunks))
         ]
+    
+    async def _aretrieve(
+        self,
+        user_id: str,
+        question: str,
+        document_ids: Optional[List[str]],
+        top_k: int
+    ) -> Tuple[np.ndarray, PackedContext]:
+        loop = asyncio.get_running_loop()
         
-        collection.add(
-            documents=chunks,
-            embeddings=embeddings,
-            metadatas=metadatas,
-            ids=ids
-        )
+        # Create question embedding (micro-batched with other requests)
+        with observe(QUERY_STAGE_SECONDS, "embed"):
+            question_embedding = await self.embedding_batcher.embed(question)
+        
+        # Search the user's collection for similar chunks
+        with observe(QUERY_STAGE_SECONDS, "retrieve"):
+            async with self._search_limit:
+                context = await loop.run_in_executor(
+                    self.query_executor,
+                    in_context(self._retrieve),
+                    user_id,
+                    question_embedding,
+                    document_ids,
+                    top_k or settings.CONTEXT_MAX_CHUNKS
+                )
         
-        print(f" Stored in vector database (collection: {collection_name})")
+        return question_embedding, context
+    
+    async def _arewrite(self, question: str, conversation: Optional[Conversation]) -> str:
+        """Standalone version of a follow-up question, for retrieval."""
+        if conversation is None or conversation.is_empty or not settings.CHAT_QUERY_REWRITE:
+            return question
+        
+        try:
+            with observe(QUERY_STAGE_SECONDS, "rewrite"):
+                async with self._llm_limit:
+                    response = await self.async_groq_client.chat.completions.create(
+                        model=settings.GROQ_MODEL,
+                        messages=rewrite_messages(conversation, question),
+                        temperature=0,
+                        max_tokens=100
+                    )
+            rewritten = (response.choices[0].message.content or "").strip()
+        except Exception as e:
+            logger.warning("Question rewrite failed, searching with the previous question: %s", e)
+            return fallback_rewrite(conversation, question)
         
-        return len(chunks)
+        logger.debug("Rewrote question for retrieval: %s", rewritten)
+        return rewritten or question
     
-    def query(
+    async def asummarize(self, summary: str, turns: List[ChatMessage]) -> str:
+        """Running summary of a conversation with `turns` folded in."""
+        with observe(QUERY_STAGE_SECONDS, "summarize"):
+            async with self._llm_limit:
+                response = await self.async_groq_client.chat.completions.create(
+                    model=settings.GROQ_MODEL,
+                    messages=summary_messages(summary, turns),
+                    temperature=0,
+                    max_tokens=int(settings.CHAT_SUMMARY_MAX_CHARS / settings.CONTEXT_CHARS_PER_TOKEN)
+                )
+        return clip_summary(response.choices[0].message.content or summary)
+    
+    async def aquery(
         self, 
         user_id: str, 
         question: str, 
         document_ids: List[str] = None,
-        top_k: int = 3
+        top_k: Optional[int] = None,
+        conversation: Optional[Conversation] = None
+    ) -> Tuple[str, List[str]]:
+        """Answer a question without blocking the event loop.
+
+        Embedding and vector search run on the query executor, generation
+        uses the async Groq client; each stage has its own concurrency cap.
+        With a `conversation`, follow-ups are rewritten for retrieval and
+        answered with the conversation in the prompt.
+        """
+        
+        logger.info("Query: %s", question)
+        
+        # Step 1: Embed the (standalone) question and retrieve similar chunks
+        search_question = await self._arewrite(question, conversation)
+        question_embedding, context = await self._aretrieve(
+            user_id, search_question, document_ids, top_k
+        )
+        
+        # Step 2: Generate answer with Groq
+        return await self._agenerate(
+            user_id, question, question_embedding, context, "single", conversation
+        )
+    
+    async def _agenerate(
+        self,
+        user_id: str,
+        question: str,
+        question_embedding: np.ndarray,
+        context: PackedContext,
+        mode: str,
+        conversation: Optional[Conversation] = None
     ) -> Tuple[str, List[str]]:
-       
-        print(f"\n❓ Query: {question}")
         
-        # Step 1: Create question embedding
-        question_embedding = self._create_embeddings([question])[0]
+        # Reuse the answer to a near-identical question over the same chunks
+        if settings.ANSWER_CACHE_ENABLED:
+            cached = self.answer_cache.lookup(user_id, question_embedding, context.chunk_ids)
+            if cached:
+                logger.info("Answer served from semantic cache")
+                QUERIES.labels(mode=mode, source="cache").inc()
+                return cached
         
-        # Step 2: Get user's collection
-        collection_name = f"user_{user_id.replace('@', '_').replace('.', '_')}"
+        logger.debug("Generating answer with Groq")
         
         try:
-            collection = self.chroma_client.get_collection(collection_name)
-        except:
-            raise Exception(f"No documents found for user {user_id}")
-        
-        # Step 3: Search for similar chunks
-        where_filter = None
-        if document_ids:
-            where_filter = {"document_id": {"$in": document_ids}}
-        
-        results = collection.query(
-            query_embeddings=[question_embedding],
-            n_results=top_k,
-            where=where_filter
-        )
-        
-        # Extract chunks and sources
-        chunks = results['documents'][0]
-        metadatas = results['metadatas'][0]
-        sources = list(set(meta['document_id'] for meta in metadatas))
-        
-        print(f"🔍 Found {len(chunks)} relevant chunks from {len(sources)} documents")
-        
-        # Step 4: Create context from chunks
-        context = "\n\n".join(chunks)
-        
-        # Step 5: Generate answer with Groq
-        print("🤖 Generating answer with Groq...")
-        
-        response = self.groq_client.chat.completions.create(
-            model=settings.GROQ_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful study assistant. Answer questions based ONLY on the provided context. If the answer is not in the context, say so."
-                },
-                {
-                    "role": "user",
-                    "content": f"""Context from documents:
-{context}
+            with observe(QUERY_STAGE_SECONDS, "generate"):
+                async with self._llm_limit:
+                    response = await self.async_groq_client.chat.completions.create(
+                        model=settings.GROQ_MODEL,
+                        messages=self._build_messages(context.text, question, conversation),
+                        temperature=0.3,
+                        max_tokens=500
+                    )
+        except Exception:
+            QUERIES.labels(mode=mode, source="error").inc()
+            raise
+        
+        answer = response.choices[0].message.content
+        QUERIES.labels(mode=mode, source="llm").inc()
+        logger.info("Answer generated (%d characters)", len(answer))
+        
+        # Answers written with a conversation may refer back to it
+        if settings.ANSWER_CACHE_ENABLED and (conversation is None or conversation.is_empty):
+            self.answer_cache.store(
+                user_id, question_embedding, context.chunk_ids, answer, context.sources
+            )
+        
+        return answer, context.sources
+    
+    async def abatch_query(
+        self,
+        user_id: str,
+        questions: List[str],
+        document_ids: List[str] = None,
+        top_k: Optional[int] = None
+    ) -> List[Union[Tuple[str, List[str]], Exception]]:
+        """Answer several questions over the same documents at once.
 
-Question: {question}
+        All questions are embedded in one encode call and looked up in one
+        multi-query vector search; generation then fans out under the LLM
+        concurrency cap. Returns (answer, sources) or the exception raised,
+        per question, in order.
+        """
+        
+        logger.info("Batch query: %d questions", len(questions))
+        loop = asyncio.get_running_loop()
+        
+        # Step 1: Embed every question in one call
+        with observe(QUERY_STAGE_SECONDS, "embed"):
+            question_embeddings = await loop.run_in_executor(
+                self.query_executor, in_context(self._create_embeddings), list(questions)
+            )
+        
+        # Step 2: One multi-query search for all of them
+        with observe(QUERY_STAGE_SECONDS, "retrieve"):
+            async with self._search_limit:
+                hit_lists = await loop.run_in_executor(
+                    self.query_executor,
+                    in_context(self._search),
+                    user_id,
+                    question_embeddings,
+                    document_ids,
+                    top_k or settings.CONTEXT_MAX_CHUNKS
+                )
+        
+        # Step 3: Generate the answers concurrently
+        return await asyncio.gather(
+            *(
+                self._agenerate(user_id, question, embedding, self._pack(hits), "batch")
+                for question, embedding, hits in zip(questions, question_embeddings, hit_lists)
+            ),
+            return_exceptions=True
+        )
+    
+    async def _astream_tokens(self, messages: List[dict], tokens: asyncio.Queue):
+        """Put the answer's tokens on `tokens`, then None (or the error)."""
+        try:
+            with observe(QUERY_STAGE_SECONDS, "generate"):
+                async with self._llm_limit:
+                    stream = await self.async_groq_client.chat.completions.create(
+                        model=settings.GROQ_MODEL,
+                        messages=messages,
+                        temperature=0.3,
+                        max_tokens=500,
+                        stream=True
+                    )
+                    async for event in stream:
+                        if not event.choices:
+                            continue
+                        token = event.choices[0].delta.content
+                        if token:
+                            tokens.put_nowait(token)
+        except Exception as e:
+            tokens.put_nowait(e)
+            return
+        tokens.put_nowait(None)
+    
+    async def astream_query(
+        self, 
+        user_id: str, 
+        question: str, 
+        document_ids: List[str] = None,
+        top_k: Optional[int] = None,
+        conversation: Optional[Conversation] = None
+    ) -> AsyncIterator[Tuple[str, object]]:
+        """Streaming variant of `aquery`.
 
-Please provide a clear, accurate answer based on the context above."""
-                }
-            ],
-            temperature=0.3,
-            max_tokens=500
+        Yields ("sources", [document ids]) first, then ("token", text) for
+        each piece of the answer and finally ("done", full answer).
+        """
+        
+        logger.info("Streaming query: %s", question)
+        
+        # Step 1: Embed the (standalone) question and retrieve similar chunks
+        search_question = await self._arewrite(question, conversation)
+        question_embedding, context = await self._aretrieve(
+            user_id, search_question, document_ids, top_k
         )
+        yield "sources", context.sources
         
-        answer = response.choices[0].message.content
-        print(f" Answer generated ({len(answer)} characters)")
+        # Reuse the answer to a near-identical question over the same chunks
+        if settings.ANSWER_CACHE_ENABLED:
+            cached = self.answer_cache.lookup(user_id, question_embedding, context.chunk_ids)
+            if cached:
+                logger.info("Answer served from semantic cache")
+                QUERIES.labels(mode="stream", source="cache").inc()
+                yield "token", cached[0]
+                yield "done", cached[0]
+                return
+        
+        # Step 2: Stream the answer from Groq as tokens arrive. A task reads
+        # the upstream stream into a queue, so the LLM slot and generate
+        # timer aren't held while the client reads
+        logger.debug("Streaming answer from Groq")
+        
+        tokens: asyncio.Queue = asyncio.Queue()
+        producer = asyncio.create_task(self._astream_tokens(
+            self._build_messages(context.text, question, conversation), tokens
+        ))
+        parts = []
+        try:
+            while True:
+                token = await tokens.get()
+                if token is None:
+                    break
+                if isinstance(token, Exception):
+                    QUERIES.labels(mode="stream", source="error").inc()
+                    raise token
+                parts.append(token)
+                yield "token", token
+        finally:
+            # Stops generating if the client went away
+            producer.cancel()
         
-        return answer, sources
+        answer = "".join(parts)
+        QUERIES.labels(mode="stream", source="llm").inc()
+        logger.info("Answer streamed (%d characters)", len(answer))
+        
+        if settings.ANSWER_CACHE_ENABLED and (conversation is None or conversation.is_empty):
+            self.answer_cache.store(
+                user_id, question_embedding, context.chunk_ids, answer, context.sources
+            )
+        
+        yield "done", answer
+    
+    def shutdown(self):
+        self.embedding_batcher.shutdown()
+        self.query_executor.shutdown(wait=False, cancel_futures=True)
+        if self._extract_pool is not None:
+            self._extract_pool.shutdown(wait=False, cancel_futures=True)
 
 # Global RAG instance
 rag = RAGPipeline()
\ No newline at end of file
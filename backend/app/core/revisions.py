@@ -0,0 +1,151 @@
+"""Page-level diff between two versions of a document.
+
+When a document is replaced, only the text around changed pages is split
+and embedded again. Chunks that lie entirely inside a run of unchanged
+pages are kept, with their page numbers and character offsets moved to
+where those pages are now. All other chunks are removed, and the text
+that no kept chunk covers is split again.
+"""
+from bisect import bisect_right
+from difflib import SequenceMatcher
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from app.core.embedding_cache import text_hash
+from app.core.pdf import PAGE_SEPARATOR
+
+
+class PageIndex(NamedTuple):
+    """Content hash and length of every page, stored with the document."""
+    hashes: List[str]
+    chars: List[int]
+
+    @classmethod
+    def from_pages(cls, pages: Iterable[str]) -> "PageIndex":
+        index = cls([], [])
+        for page in pages:
+            index.add(page)
+        return index
+
+    def add(self, page: str):
+        self.hashes.append(text_hash(page))
+        self.chars.append(len(page))
+
+    def starts(self) -> List[int]:
+        """Offset of each page in the joined document text."""
+        starts, offset = [], 0
+        for chars in self.chars:
+            starts.append(offset)
+            offset += chars + len(PAGE_SEPARATOR)
+        return starts
+
+
+class RevisionPlan(NamedTuple):
+    kept: List[Tuple[str, dict]]  # (chunk id, metadata in the new version's coordinates)
+    removed: List[str]  # Chunk ids to delete
+    spans: List[Tuple[int, int]]  # New text ranges to split again
+    changed_pages: int  # Pages of the new version not found in the old one
+
+
+def revision_chunk_id(document_id: str, revision: int, chunk_index: int) -> str:
+    # Kept chunks keep their ids; new ones get the revision in theirs
+    return f"{document_id}_r{revision}_chunk_{chunk_index}"
+
+
+def plan_revision(
+    old_pages: Optional[PageIndex],
+    new_pages: PageIndex,
+    new_text: str,
+    chunk_ids: Sequence[str],
+    chunk_metadatas: Sequence[dict],
+    document_id: str,
+    revision: int
+) -> RevisionPlan:
+    """Decide which stored chunks survive the move to `new_pages`.
+
+    Without `old_pages` (documents ingested before page hashes were
+    recorded) nothing can be mapped and the whole text is split again.
+    Chunks already written for `revision` by an interrupted earlier
+    attempt are recognised, so running the same revision twice is safe.
+    """
+    # Matching runs of identical pages: (old start, new start, length)
+    blocks = []
+    if old_pages is not None:
+        matcher = SequenceMatcher(None, old_pages.hashes, new_pages.hashes, autojunk=False)
+        blocks = [block for block in matcher.get_matching_blocks() if block.size]
+    unchanged_pages = sum(block.size for block in blocks)
+
+    block_starts = [block.a for block in blocks]
+    old_starts = old_pages.starts() if old_pages is not None else []
+    new_starts = new_pages.starts()
+
+    def block_of(page: int):
+        # Block containing 1-based old page `page`, if any
+        i = bisect_right(block_starts, page - 1) - 1
+        if i >= 0 and page - 1 < blocks[i].a + blocks[i].size:
+            return i
+        return None
+
+    new_prefix = revision_chunk_id(document_id, revision, 0)[:-1]
+    kept, removed = [], []
+    for chunk_id, metadata in zip(chunk_ids, chunk_metadatas):
+        if chunk_id.startswith(new_prefix):
+            # Written by an interrupted attempt at this revision; redone below
+            removed.append(chunk_id)
+            continue
+        if metadata.get("revision") == revision:
+            # Already moved by an interrupted attempt at this revision
+            kept.append((chunk_id, dict(metadata)))
+            continue
+        if "char_start" not in metadata or "page_start" not in metadata:
+            removed.append(chunk_id)
+            continue
+
+        block = block_of(metadata["page_start"])
+        if block is None or block != block_of(metadata["page_end"]):
+            removed.append(chunk_id)
+            continue
+
+        a, b, _ = blocks[block]
+        page_shift = b - a
+        char_shift = new_starts[b] - old_starts[a]
+        moved = dict(metadata)
+        moved["page_start"] += page_shift
+        moved["page_end"] += page_shift
+        moved["char_start"] += char_shift
+        moved["char_end"] += char_shift
+        kept.append((chunk_id, moved))
+
+    # Text no kept chunk covers gets split again, together with the kept
+    # chunk on either side, so the new chunks start and end where chunks
+    # did before (and the first and last usually get their old vectors)
+    kept.sort(key=lambda item: (item[1]["char_start"], item[1]["char_end"]))
+    text_length = len(new_text)
+    spans: List[Tuple[int, int]] = []
+    released = set()
+    position, last = 0, None  # Coverage so far, and the chunk reaching it
+    for i, (_, metadata) in enumerate(kept + [(None, None)]):
+        start = metadata["char_start"] if metadata else text_length
+        if start > position and new_text[position:start].strip():
+            span_start = 0
+            if last is not None:
+                released.add(last)
+                span_start = kept[last][1]["char_start"]
+            span_end = text_length
+            if metadata:
+                released.add(i)
+                span_end = metadata["char_end"]
+            if spans and span_start <= spans[-1][1]:
+                spans[-1] = (spans[-1][0], max(spans[-1][1], span_end))
+            else:
+                spans.append((span_start, span_end))
+        if metadata and metadata["char_end"] > position:
+            position, last = metadata["char_end"], i
+
+    removed += [kept[i][0] for i in sorted(released)]
+    kept = [item for i, item in enumerate(kept) if i not in released]
+
+    return RevisionPlan(
+        kept=kept,
+        removed=removed,
+        spans=spans,
+        changed_pages=len(new_pages.hashes) - unchanged_pages
+    )
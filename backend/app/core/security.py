@@ -1,5 +1,9 @@
+import asyncio
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
@@ -12,6 +16,60 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # JWT bearer scheme (extracts token from Authorization header)
 security = HTTPBearer()
 
+# bcrypt is deliberately slow; run it here instead of on the event loop.
+# The pool size caps how many hashes run at once.
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="bcrypt"
+)
+
+class TokenCache:
+    """Recently verified tokens -> (subject, exp), bounded LRU.
+
+    Entries are dropped once the token's `exp` has passed, so a cached
+    token is never accepted for longer than its signature allows.
+    """
+    
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, token: str) -> Optional[str]:
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        subject, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[token]
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return subject
+    
+    def put(self, token: str, subject: str, expires_at: float):
+        if self.max_entries <= 0:
+            return
+        self._entries[token] = (subject, expires_at)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+token_cache = TokenCache(max_entries=settings.TOKEN_CACHE_SIZE)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     
     return pwd_context.verify(plain_password, hashed_password)
@@ -20,6 +78,16 @@ def get_password_hash(password: str) -> str:
    
     return pwd_context.hash(password)
 
+async def averify_password(plain_password: str, hashed_password: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        password_executor, verify_password, plain_password, hashed_password
+    )
+
+async def aget_password_hash(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
    
     to_encode = data.copy()
@@ -53,10 +121,15 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
+    # Extract token from credentials
+    token = credentials.credentials
+    
+    # Recently verified and not yet expired: skip signature verification
+    email = token_cache.get(token)
+    if email is not None:
+        return email
+    
     try:
-        # Extract token from credentials
-        token = credentials.credentials
-        
         # Decode the token
         payload = jwt.decode(
             token, 
@@ -69,6 +142,10 @@ async def get_current_user(
         
         if email is None:
             raise credentials_exception
+        
+        # Only tokens that expire are cached
+        if "exp" in payload:
+            token_cache.put(token, email, float(payload["exp"]))
             
         return email
         
@@ -1,28 +1,131 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel, monitoring
+from pymongo.errors import OperationFailure
 from app.config import settings
-from typing import Optional
+from typing import Dict, List, Optional
+from app.utils.logger import get_logger, log_fields
+
+logger = get_logger(__name__)
+
+# Indexes the API's queries rely on, ensured at startup (idempotent)
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        # Login and register look users up by email
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "chat_history": [
+        # History: filter by user, newest first (keyset pages on timestamp, _id)
+        IndexModel(
+            [("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+            name="user_timestamp_id"
+        ),
+        # A session's recent turns, and its history pages
+        IndexModel(
+            [("user_id", ASCENDING), ("session_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+            name="user_session_timestamp_id"
+        ),
+    ],
+    "documents": [
+        # Document list: filter by user, newest first (keyset pages)
+        IndexModel(
+            [("user_id", ASCENDING), ("upload_date", DESCENDING), ("_id", DESCENDING)],
+            name="user_upload_date_id"
+        ),
+        # Duplicate upload detection
+        IndexModel([("content_hash", ASCENDING)], name="content_hash"),
+    ],
+    "ingestion_jobs": [
+        # Finished job statuses expire; active ones have no finished_at
+        IndexModel(
+            [("finished_at", ASCENDING)],
+            name="finished_at_ttl",
+            expireAfterSeconds=settings.INGESTION_JOB_RETENTION_DAYS * 86400
+        ),
+    ],
+}
+
+
+class SlowCommandLogger(monitoring.CommandListener):
+    """Warns about commands slower than MONGODB_SLOW_QUERY_MS."""
+
+    def __init__(self, threshold_ms: int):
+        self.threshold_ms = threshold_ms
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        duration_ms = event.duration_micros / 1000
+        if duration_ms >= self.threshold_ms:
+            # Runs in the thread motor ran the command on, in the request's context
+            logger.warning(
+                "Slow MongoDB %s on %s: %.0f ms", event.command_name, event.database_name, duration_ms,
+                extra=log_fields(command=event.command_name, database=event.database_name, duration_ms=duration_ms)
+            )
+
+    def failed(self, event):
+        duration_ms = event.duration_micros / 1000
+        if duration_ms >= self.threshold_ms:
+            logger.warning(
+                "Slow failed MongoDB %s: %.0f ms (%s)", event.command_name, duration_ms, event.failure,
+                extra=log_fields(command=event.command_name, database=event.database_name, duration_ms=duration_ms)
+            )
+
 
 class MongoDB:
     
     client: Optional[AsyncIOMotorClient] = None
     
+    @classmethod
+    def _client_options(cls) -> dict:
+        options = {
+            "maxPoolSize": settings.MONGODB_MAX_POOL_SIZE,
+            "minPoolSize": settings.MONGODB_MIN_POOL_SIZE,
+            "serverSelectionTimeoutMS": settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+            "connectTimeoutMS": settings.MONGODB_CONNECT_TIMEOUT_MS,
+        }
+        # 0 keeps the driver default (no limit)
+        if settings.MONGODB_SOCKET_TIMEOUT_MS:
+            options["socketTimeoutMS"] = settings.MONGODB_SOCKET_TIMEOUT_MS
+        if settings.MONGODB_MAX_IDLE_TIME_MS:
+            options["maxIdleTimeMS"] = settings.MONGODB_MAX_IDLE_TIME_MS
+        if settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS:
+            options["waitQueueTimeoutMS"] = settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS
+        if settings.MONGODB_SLOW_QUERY_MS:
+            options["event_listeners"] = [SlowCommandLogger(settings.MONGODB_SLOW_QUERY_MS)]
+        return options
+    
     @classmethod
     async def connect_db(cls):
-        cls.client = AsyncIOMotorClient(settings.MONGODB_URL)
+        cls.client = AsyncIOMotorClient(settings.MONGODB_URL, **cls._client_options())
         
         # Test the connection
         try:
             await cls.client.admin.command('ping')
-            print(f"✅ Connected to MongoDB at {settings.MONGODB_URL}")
+            logger.info("Connected to MongoDB at %s", settings.MONGODB_URL)
         except Exception as e:
-            print(f"❌ Failed to connect to MongoDB: {e}")
+            logger.error("Failed to connect to MongoDB: %s", e)
             raise
+        
+        await cls.ensure_indexes()
+    
+    @classmethod
+    async def ensure_indexes(cls):
+        database = cls.get_db()
+        for collection, indexes in INDEXES.items():
+            try:
+                names = await database[collection].create_indexes(indexes)
+                logger.info("Indexes ready on %s: %s", collection, ", ".join(names))
+            except OperationFailure as e:
+                # e.g. duplicate emails predating the unique index; the API
+                # still works, just without that index
+                logger.error("Could not create indexes on %s: %s", collection, e)
     
     @classmethod
     async def close_db(cls):
         if cls.client:
             cls.client.close()
-            print("❌ Closed MongoDB connection")
+            logger.info("Closed MongoDB connection")
     
     @classmethod
     def get_db(cls):
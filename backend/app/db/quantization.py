@@ -0,0 +1,128 @@
+from typing import Optional, Tuple
+import numpy as np
+
+# Storage types supported by VectorCodec
+DTYPES = ("float32", "float16", "int8")
+REDUCTIONS = ("none", "truncate", "pca")
+
+# Singular values below this fraction of the largest count as zero
+RANK_TOLERANCE = 1e-6
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric scalar quantization with one float32 scale per vector."""
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales = np.where(scales == 0, 1, scales).astype(np.float32)
+    quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales
+
+
+def fit_pca(vectors: np.ndarray, dim: int) -> Tuple[np.ndarray, np.ndarray, int]:
+    """Mean, top-`dim` principal axes (rows) and rank of `vectors`."""
+    mean = vectors.mean(axis=0)
+    _, singular_values, vt = np.linalg.svd(vectors - mean, full_matrices=False)
+    rank = int(np.sum(singular_values > singular_values[0] * RANK_TOLERANCE)) if len(singular_values) else 0
+    return mean.astype(np.float32), vt[:dim].astype(np.float32), rank
+
+
+class VectorCodec:
+    """Compact representation used for the in-memory search matrix.
+
+    Vectors are optionally reduced (truncation or PCA) and stored as
+    float32, float16 or int8 + per-vector scale. Scores from the compact
+    form are approximate; callers re-score the best candidates against
+    the full-precision vectors when `is_exact` is False.
+    """
+
+    def __init__(
+        self,
+        dtype: str = "float32",
+        reduced_dim: int = 0,
+        reduction: str = "none",
+        mean: Optional[np.ndarray] = None,
+        components: Optional[np.ndarray] = None
+    ):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+        if reduction not in REDUCTIONS:
+            raise ValueError(f"Unsupported vector reduction: {reduction}")
+        self.dtype = dtype
+        self.reduction = reduction if reduced_dim else "none"
+        self.reduced_dim = reduced_dim if self.reduction != "none" else 0
+        self.mean = mean
+        self.components = components
+
+    @property
+    def is_exact(self) -> bool:
+        return self.dtype == "float32" and self.reduction == "none"
+
+    @property
+    def storage_dtype(self) -> np.dtype:
+        return np.dtype(self.dtype)
+
+    def needs_fit(self) -> bool:
+        return self.reduction == "pca" and self.components is None
+
+    def fit(self, vectors: np.ndarray) -> int:
+        """Fit the PCA axes; returns the rank of `vectors`.
+
+        PCA can't have more axes than samples or dimensions, so fewer
+        than `reduced_dim` of either is an error rather than a smaller
+        layout. A rank below `reduced_dim` means some axes are noise.
+        """
+        if len(vectors) < self.reduced_dim or vectors.shape[1] < self.reduced_dim:
+            raise ValueError(
+                f"PCA to {self.reduced_dim} dimensions needs at least {self.reduced_dim} "
+                f"vectors of at least that size, got {vectors.shape[0]} x {vectors.shape[1]}"
+            )
+        self.mean, self.components, rank = fit_pca(vectors, self.reduced_dim)
+        return rank
+
+    def output_dim(self, dim: int) -> int:
+        if self.reduction == "truncate":
+            return min(self.reduced_dim, dim)
+        if self.reduction == "pca":
+            return len(self.components)
+        return dim
+
+    def reduce(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.reduction == "truncate":
+            return vectors[:, :self.reduced_dim]
+        if self.reduction == "pca":
+            return (vectors - self.mean) @ self.components.T
+        return vectors
+
+    def encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Compact rows (and int8 scales) for unit-length `vectors`."""
+        reduced = self.reduce(vectors)
+        if self.dtype == "int8":
+            return quantize_int8(reduced)
+        return reduced.astype(self.storage_dtype), None
+
+    def scores(
+        self,
+        queries: np.ndarray,
+        rows: np.ndarray,
+        scales: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Approximate similarity of each query to each compact row."""
+        queries = np.asarray(queries, dtype=np.float32)
+        if self.reduction == "pca":
+            # x ~ mean + C^T c_x, so q.x ~ (C q).c_x + q.mean
+            reduced = queries @ self.components.T
+        else:
+            reduced = self.reduce(queries)
+
+        scores = reduced @ np.asarray(rows).T.astype(np.float32, copy=False)
+        if scales is not None:
+            scores *= np.asarray(scales)[None, :]
+        if self.reduction == "pca":
+            scores += (queries @ self.mean)[:, None]
+        return scores
+
+    def bytes_per_vector(self, dim: int) -> int:
+        size = self.output_dim(dim) * self.storage_dtype.itemsize
+        if self.dtype == "int8":
+            size += 4  # float32 scale
+        return size
@@ -0,0 +1,1040 @@
+import fcntl
+import json
+import os
+import shutil
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+import numpy as np
+from app.config import settings
+from app.db.quantization import VectorCodec
+from app.utils.logger import get_logger, log_fields
+
+logger = get_logger(__name__)
+
+# Rows copied at a time when compacting a numpy collection
+COMPACT_BLOCK_ROWS = 4096
+# PCA is fit once a collection has this many live rows per kept axis
+PCA_FIT_ROWS_PER_DIM = 4
+# Chroma (0.4+) keeps all collections' records in this SQLite file
+CHROMA_SQLITE_FILE = "chroma.sqlite3"
+
+
+class CollectionNotFoundError(Exception):
+    pass
+
+
+class VectorHit(NamedTuple):
+    id: str
+    document: str
+    metadata: dict
+    distance: float
+
+
+class VectorRecords(NamedTuple):
+    ids: List[str]
+    documents: List[str]
+    metadatas: List[dict]
+    embeddings: Optional[np.ndarray]  # Only when requested
+
+
+def collection_name(user_id: str) -> str:
+    return f"user_{user_id.replace('@', '_').replace('.', '_')}"
+
+
+class VectorStore(ABC):
+    """Per-user chunk storage and similarity search.
+
+    Every user has one collection; chunks carry at least `document_id`
+    in their metadata so searches can be restricted to some documents.
+    """
+
+    @abstractmethod
+    def upsert(
+        self,
+        user_id: str,
+        ids: List[str],
+        embeddings: np.ndarray,
+        documents: List[str],
+        metadatas: List[dict]
+    ):
+        ...
+
+    @abstractmethod
+    def query(
+        self,
+        user_id: str,
+        query_embeddings: np.ndarray,
+        top_k: int,
+        document_ids: Optional[List[str]] = None
+    ) -> List[List[VectorHit]]:
+        """Top-k hits for each row of `query_embeddings`, best first.
+
+        Raises CollectionNotFoundError if the user has no collection.
+        """
+
+    @abstractmethod
+    def get(
+        self,
+        user_id: str,
+        document_id: Optional[str] = None,
+        include_embeddings: bool = False,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> VectorRecords:
+        """Stored chunks of one document (or the whole collection)."""
+
+    @abstractmethod
+    def count_document(self, user_id: str, document_id: str) -> int:
+        ...
+
+    @abstractmethod
+    def find_by_chunk_hash(
+        self,
+        user_id: str,
+        chunk_hashes: Sequence[str],
+        embedding_model: str
+    ) -> Dict[str, np.ndarray]:
+        """Map chunk hash -> stored embedding for hashes already present.
+
+        Only chunks embedded by `embedding_model` (see the chunks'
+        "embedding_model" metadata) are returned.
+        """
+
+    @abstractmethod
+    def update_metadata(self, user_id: str, ids: List[str], metadatas: List[dict]):
+        """Replace the metadata of existing chunks, keeping their vectors."""
+
+    @abstractmethod
+    def delete(self, user_id: str, ids: Sequence[str]) -> int:
+        """Remove chunks by id; returns chunks removed (0 for no ids)."""
+
+    @abstractmethod
+    def delete_documents(self, user_id: str, document_ids: Sequence[str]) -> int:
+        """Remove every chunk of `document_ids`; returns chunks removed."""
+
+    @abstractmethod
+    def document_ids(self, user_id: str) -> Set[str]:
+        ...
+
+    @abstractmethod
+    def list_users(self) -> List[str]:
+        """Owners of all collections in the store."""
+
+    @abstractmethod
+    def compact(self, user_id: str) -> int:
+        """Reclaim space held by deleted chunks; returns bytes reclaimed."""
+
+    @abstractmethod
+    def disk_usage(self) -> int:
+        ...
+
+
+class ChromaVectorStore(VectorStore):
+
+    def __init__(self, path: str):
+        import chromadb
+        from chromadb.config import Settings as ChromaSettings
+
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.client = chromadb.PersistentClient(
+            path=path,
+            settings=ChromaSettings(anonymized_telemetry=False)
+        )
+
+    def _get(self, user_id: str):
+        try:
+            return self.client.get_collection(collection_name(user_id))
+        except Exception:
+            raise CollectionNotFoundError(f"No documents found for user {user_id}")
+
+    def _get_or_create(self, user_id: str):
+        return self.client.get_or_create_collection(
+            name=collection_name(user_id),
+            metadata={"user_id": user_id}
+        )
+
+    def upsert(self, user_id, ids, embeddings, documents, metadatas):
+        self._get_or_create(user_id).upsert(
+            ids=ids,
+            embeddings=np.asarray(embeddings).tolist(),
+            documents=documents,
+            metadatas=metadatas
+        )
+
+    def query(self, user_id, query_embeddings, top_k, document_ids=None):
+        collection = self._get(user_id)
+
+        where_filter = None
+        if document_ids:
+            where_filter = {"document_id": {"$in": list(document_ids)}}
+
+        results = collection.query(
+            query_embeddings=np.asarray(query_embeddings).tolist(),
+            n_results=top_k,
+            where=where_filter
+        )
+
+        return [
+            [
+                VectorHit(*hit)
+                for hit in zip(ids, documents, metadatas, distances)
+            ]
+            for ids, documents, metadatas, distances in zip(
+                results["ids"],
+                results["documents"],
+                results["metadatas"],
+                results["distances"]
+            )
+        ]
+
+    def get(self, user_id, document_id=None, include_embeddings=False, limit=None, offset=0):
+        try:
+            collection = self._get(user_id)
+        except CollectionNotFoundError:
+            return VectorRecords([], [], [], None)
+
+        include = ["documents", "metadatas"]
+        if include_embeddings:
+            include.append("embeddings")
+
+        results = collection.get(
+            where={"document_id": document_id} if document_id is not None else None,
+            include=include,
+            limit=limit,
+            offset=offset or None
+        )
+
+        embeddings = None
+        if include_embeddings:
+            embeddings = np.asarray(results["embeddings"], dtype=np.float32)
+        return VectorRecords(
+            results["ids"],
+            results["documents"],
+            results["metadatas"],
+            embeddings
+        )
+
+    def count_document(self, user_id, document_id):
+        try:
+            collection = self._get(user_id)
+        except CollectionNotFoundError:
+            return 0
+        return len(collection.get(where={"document_id": document_id}, include=[])["ids"])
+
+    def find_by_chunk_hash(self, user_id, chunk_hashes, embedding_model):
+        if not chunk_hashes:
+            return {}
+        try:
+            collection = self._get(user_id)
+        except CollectionNotFoundError:
+            return {}
+
+        results = collection.get(
+            where={"$and": [
+                {"chunk_hash": {"$in": list(set(chunk_hashes))}},
+                {"embedding_model": embedding_model}
+            ]},
+            include=["embeddings", "metadatas"]
+        )
+        return {
+            metadata["chunk_hash"]: np.asarray(embedding, dtype=np.float32)
+            for metadata, embedding in zip(results["metadatas"], results["embeddings"])
+        }
+
+    def update_metadata(self, user_id, ids, metadatas):
+        if ids:
+            self._get(user_id).update(ids=ids, metadatas=metadatas)
+
+    def delete(self, user_id, ids):
+        # Chroma's get(ids=[]) applies no filter and returns every id
+        if not ids:
+            return 0
+        try:
+            collection = self._get(user_id)
+        except CollectionNotFoundError:
+            return 0
+
+        existing = collection.get(ids=list(ids), include=[])["ids"]
+        if existing:
+            collection.delete(ids=existing)
+        return len(existing)
+
+    def delete_documents(self, user_id, document_ids):
+        if not document_ids:
+            return 0
+        try:
+            collection = self._get(user_id)
+        except CollectionNotFoundError:
+            return 0
+
+        ids = collection.get(
+            where={"document_id": {"$in": list(document_ids)}},
+            include=[]
+        )["ids"]
+        if ids:
+            collection.delete(ids=ids)
+        return len(ids)
+
+    def document_ids(self, user_id):
+        results = self._get(user_id).get(include=["metadatas"])
+        return {metadata["document_id"] for metadata in results["metadatas"]}
+
+    def list_users(self):
+        return [
+            collection.metadata["user_id"]
+            for collection in self.client.list_collections()
+            if collection.metadata and "user_id" in collection.metadata
+        ]
+
+    def compact(self, user_id):
+        # Deleted records leave free pages in Chroma's SQLite file, shared
+        # by every collection; VACUUM rewrites it without them. Its HNSW
+        # index files are not shrunk
+        self._get(user_id)
+        database = os.path.join(self.path, CHROMA_SQLITE_FILE)
+        if not os.path.exists(database):
+            return 0
+
+        before = self.disk_usage()
+        conn = sqlite3.connect(database, timeout=30)
+        try:
+            # Nothing freed (e.g. already vacuumed for another user)
+            if conn.execute("PRAGMA freelist_count").fetchone()[0] == 0:
+                return 0
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+        return max(0, before - self.disk_usage())
+
+    def disk_usage(self):
+        return _directory_size(self.path)
+
+
+class _NumpyCollection:
+    """One user's vectors as memory-mapped, row-major matrices.
+
+    Files in the collection directory:
+      meta.json       - dimensions and the codec settings it was created with
+      vectors.bin     - compact search rows (float32, float16 or int8)
+      scales.bin      - per-row float32 scales (int8 only)
+      full.bin        - full-precision float32 rows for exact re-scoring
+                        (only when the search rows are not exact)
+      projection.npz  - PCA mean and axes (PCA reduction only)
+      records.jsonl   - append-only log of row assignments, metadata
+                        updates and deletions
+
+    A PCA layout is not fit on the first upsert: rows are stored
+    unreduced until there are PCA_FIT_ROWS_PER_DIM rows per kept axis,
+    then the projection is fit on all of them and every row re-encoded.
+
+    Writers take an exclusive flock and first replay any log lines other
+    processes appended, so several API workers can share a directory.
+    """
+
+    def __init__(self, path: str, user_id: str, codec_options: dict, rescore_factor: int):
+        self.path = path
+        self.user_id = user_id
+        self.codec_options = codec_options  # Used if the collection is new
+        self.rescore_factor = rescore_factor
+        self.codec: Optional[VectorCodec] = None
+        self.dim: Optional[int] = None
+        self.compact_dim: Optional[int] = None
+        self.pending_pca_dim = 0  # PCA still to fit, to this many axes
+        self._lock = threading.RLock()
+
+        self._reset_state()
+
+        os.makedirs(path, exist_ok=True)
+        self._load_meta()
+        self.refresh()
+
+    def _reset_state(self):
+        # Row-indexed state, rebuilt from the log
+        self.ids: List[Optional[str]] = []
+        self.documents: List[Optional[str]] = []
+        self.metadatas: List[Optional[dict]] = []
+        self.alive: List[bool] = []
+        self.doc_codes: List[int] = []
+        self.row_of: Dict[str, int] = {}
+        self.doc_code_of: Dict[str, int] = {}
+        self.rows_by_hash: Dict[Tuple[str, str], int] = {}  # (model, hash) -> row
+
+        self._log_offset = 0
+        self._log_inode = None  # Changes when compaction rewrites the log
+        self._maps: Dict[str, np.memmap] = {}
+        self._arrays = None  # Cached (alive, doc_codes) numpy views
+
+    # -- files ---------------------------------------------------------
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load_meta(self):
+        if not os.path.exists(self._file("meta.json")):
+            return
+        with open(self._file("meta.json")) as f:
+            meta = json.load(f)
+
+        mean = components = None
+        if meta.get("reduction") == "pca":
+            projection = np.load(self._file("projection.npz"))
+            mean, components = projection["mean"], projection["components"]
+
+        self.dim = meta["dim"]
+        self.compact_dim = meta.get("compact_dim", self.dim)
+        self.codec = VectorCodec(
+            dtype=meta["dtype"],
+            reduced_dim=meta.get("reduced_dim", 0),
+            reduction=meta.get("reduction", "none"),
+            mean=mean,
+            components=components
+        )
+        self.pending_pca_dim = meta.get("pending_pca_dim", 0)
+        if self.codec.reduction == "pca" and self.compact_dim < self.codec.reduced_dim < self.dim:
+            # Fit on too few vectors by an older version; fit again
+            self.pending_pca_dim = self.codec.reduced_dim
+
+    def _create(self, sample: np.ndarray):
+        # First write decides the layout; later setting changes only
+        # affect new collections
+        self.codec = VectorCodec(**self.codec_options)
+        self.dim = sample.shape[1]
+        if self.codec.needs_fit():
+            if self.codec.reduced_dim < self.dim:
+                self.pending_pca_dim = self.codec.reduced_dim
+            else:
+                logger.info(
+                    "VECTOR_REDUCED_DIM=%d is not below the %d embedding dimensions; storing %s unreduced",
+                    self.codec.reduced_dim, self.dim, self.user_id
+                )
+            # Unreduced until there are enough rows to fit (_maybe_fit_pca)
+            self.codec = VectorCodec(dtype=self.codec.dtype)
+        self.compact_dim = self.codec.output_dim(self.dim)
+        self._write_meta(self._file("meta.json"))
+
+    def _write_meta(self, path: str):
+        with open(path, "w") as f:
+            json.dump({
+                "user_id": self.user_id,
+                "dim": self.dim,
+                "compact_dim": self.compact_dim,
+                "dtype": self.codec.dtype,
+                "reduced_dim": self.codec.reduced_dim,
+                "reduction": self.codec.reduction,
+                "pending_pca_dim": self.pending_pca_dim
+            }, f)
+
+    def _file_lock(self, shared: bool = False):
+        return _FileLock(self._file(".lock"), shared=shared)
+
+    # -- state ---------------------------------------------------------
+
+    def _log_changed(self) -> bool:
+        try:
+            stat = os.stat(self._file("records.jsonl"))
+        except FileNotFoundError:
+            return False
+        return stat.st_ino != self._log_inode or stat.st_size != self._log_offset
+
+    def refresh(self):
+        """Pick up log lines appended since the last look (any process)."""
+        with self._lock:
+            if not self._log_changed():
+                return
+            # Shared lock: never observe a compaction half-way through
+            with self._file_lock(shared=True):
+                self._reload()
+
+    def _reload(self):
+        # Callers hold the file lock (shared or exclusive)
+        log_path = self._file("records.jsonl")
+        if not os.path.exists(log_path):
+            return
+
+        with open(log_path, "rb") as f:
+            inode = os.fstat(f.fileno()).st_ino
+            if inode != self._log_inode:
+                # First load, or the log was rewritten by a compaction
+                self._reset_state()
+                self._log_inode = inode
+                self._load_meta()
+
+            f.seek(self._log_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Partially written; pick it up next time
+                self._apply(json.loads(line))
+                self._log_offset += len(line)
+
+        # Map the data files now, while they match the replayed log
+        self._maps = {}
+        self._arrays = None
+        if self.codec is not None and self.ids:
+            self.matrix()
+            self.scales()
+            self.full()
+
+    def _apply(self, record: dict):
+        if record["op"] == "add":
+            row = record["row"]
+            while len(self.ids) <= row:
+                self.ids.append(None)
+                self.documents.append(None)
+                self.metadatas.append(None)
+                self.alive.append(False)
+                self.doc_codes.append(-1)
+
+            metadata = record["metadata"]
+            document_id = metadata["document_id"]
+            code = self.doc_code_of.setdefault(document_id, len(self.doc_code_of))
+
+            self.ids[row] = record["id"]
+            self.documents[row] = record["document"]
+            self.metadatas[row] = metadata
+            self.alive[row] = True
+            self.doc_codes[row] = code
+            self.row_of[record["id"]] = row
+            self._index_hash(row)
+
+        elif record["op"] == "metadata":
+            row = record["row"]
+            self._unindex_hash(row)
+            self.metadatas[row] = record["metadata"]
+            self._index_hash(row)
+
+        elif record["op"] == "delete":
+            for row in record["rows"]:
+                if not self.alive[row]:
+                    continue
+                self.alive[row] = False
+                self.row_of.pop(self.ids[row], None)
+                self._unindex_hash(row)
+
+    def _index_hash(self, row: int):
+        metadata = self.metadatas[row]
+        if "chunk_hash" in metadata and "embedding_model" in metadata:
+            self.rows_by_hash[(metadata["embedding_model"], metadata["chunk_hash"])] = row
+
+    def _unindex_hash(self, row: int):
+        metadata = self.metadatas[row]
+        key = (metadata.get("embedding_model"), metadata.get("chunk_hash"))
+        if self.rows_by_hash.get(key) == row:
+            del self.rows_by_hash[key]
+
+    def _map(self, name: str, dtype, width: int) -> np.ndarray:
+        if name not in self._maps:
+            rows = len(self.ids)
+            if rows == 0 or self.codec is None:
+                return np.empty((0, width), dtype=dtype)
+            self._maps[name] = np.memmap(
+                self._file(name), dtype=dtype, mode="r", shape=(rows, width)
+            )
+        return self._maps[name]
+
+    def matrix(self) -> np.ndarray:
+        """Compact search rows."""
+        return self._map("vectors.bin", self.codec.storage_dtype, self.compact_dim)
+
+    def scales(self) -> Optional[np.ndarray]:
+        if self.codec.dtype != "int8":
+            return None
+        return self._map("scales.bin", np.float32, 1)[:, 0]
+
+    def full(self) -> np.ndarray:
+        """Full-precision rows (the search rows when those are exact)."""
+        if self.codec.is_exact:
+            return self.matrix()
+        return self._map("full.bin", np.float32, self.dim)
+
+    def arrays(self):
+        if self._arrays is None:
+            self._arrays = (
+                np.asarray(self.alive, dtype=bool),
+                np.asarray(self.doc_codes, dtype=np.int32)
+            )
+        return self._arrays
+
+    # -- writes --------------------------------------------------------
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.where(norms == 0, 1, norms)
+
+        with self._lock, self._file_lock():
+            self._reload()
+
+            if self.codec is None:
+                self._create(embeddings)
+
+            # Existing ids are overwritten in place, new ones appended
+            next_row = len(self.ids)
+            rows = []
+            for id_ in ids:
+                row = self.row_of.get(id_)
+                if row is None:
+                    row = next_row
+                    next_row += 1
+                rows.append(row)
+
+            compact, scales = self.codec.encode(embeddings)
+            self._write_rows("vectors.bin", rows, compact)
+            if scales is not None:
+                self._write_rows("scales.bin", rows, scales[:, None])
+            if not self.codec.is_exact:
+                self._write_rows("full.bin", rows, embeddings)
+
+            lines = [
+                json.dumps({
+                    "op": "add",
+                    "row": row,
+                    "id": id_,
+                    "document": document,
+                    "metadata": metadata
+                })
+                for row, id_, document, metadata in zip(rows, ids, documents, metadatas)
+            ]
+            self._append_log(lines)
+            self._maybe_fit_pca()
+
+    def _maybe_fit_pca(self):
+        """Switch to the PCA layout once there are enough rows to fit it.
+
+        The projection is fit on every live row, then all rows are
+        re-encoded into new files that are swapped in like a compaction
+        (log last, so other processes reload). Callers hold the
+        exclusive lock.
+        """
+        if not self.pending_pca_dim:
+            return
+        alive, _ = self.arrays()
+        live = np.flatnonzero(alive)
+        if len(live) < self.pending_pca_dim * PCA_FIT_ROWS_PER_DIM:
+            return
+
+        full = np.array(self.full(), dtype=np.float32)
+        codec = VectorCodec(dtype=self.codec.dtype, reduced_dim=self.pending_pca_dim, reduction="pca")
+        rank = codec.fit(full[live])
+        if rank < codec.reduced_dim:
+            logger.info(
+                "Vectors of %s span only %d dimensions; PCA to %d keeps %d noise axes",
+                self.user_id, rank, codec.reduced_dim, codec.reduced_dim - rank
+            )
+
+        compact, scales = codec.encode(full)
+        files = {"vectors.bin": compact, "full.bin": full}
+        if scales is not None:
+            files["scales.bin"] = scales[:, None]
+        for name, data in files.items():
+            with open(self._file(name + ".refit"), "wb") as f:
+                f.write(np.ascontiguousarray(data).tobytes())
+        with open(self._file("projection.npz.refit"), "wb") as f:
+            np.savez(f, mean=codec.mean, components=codec.components)
+
+        self.codec, self.compact_dim, self.pending_pca_dim = codec, codec.output_dim(self.dim), 0
+        self._write_meta(self._file("meta.json.refit"))
+        shutil.copyfile(self._file("records.jsonl"), self._file("records.jsonl.refit"))
+
+        self._maps = {}
+        for name in [*files, "projection.npz", "meta.json", "records.jsonl"]:
+            os.replace(self._file(name + ".refit"), self._file(name))
+        self._reload()
+        logger.info(
+            "Fit PCA to %d dimensions on %d vectors of %s", self.compact_dim, len(live), self.user_id,
+            extra=log_fields(compact_dim=self.compact_dim, vectors=len(live), rank=rank)
+        )
+
+    def _write_rows(self, name: str, rows: List[int], data: np.ndarray):
+        path = self._file(name)
+        row_bytes = data.shape[1] * data.dtype.itemsize
+        with open(path, "r+b" if os.path.exists(path) else "w+b") as f:
+            for row, vector in zip(rows, data):
+                f.seek(row * row_bytes)
+                f.write(vector.tobytes())
+
+    def update_metadata(self, ids: List[str], metadatas: List[dict]):
+        with self._lock, self._file_lock():
+            self._reload()
+            lines = []
+            for id_, metadata in zip(ids, metadatas):
+                row = self.row_of.get(id_)
+                if row is None:
+                    raise KeyError(f"No chunk with id {id_}")
+                lines.append(json.dumps({"op": "metadata", "row": row, "metadata": metadata}))
+            if lines:
+                self._append_log(lines)
+
+    def delete(self, ids: Sequence[str]) -> int:
+        if not ids:
+            return 0
+        with self._lock, self._file_lock():
+            self._reload()
+            rows = [self.row_of[id_] for id_ in ids if id_ in self.row_of]
+            if rows:
+                self._append_log([json.dumps({"op": "delete", "rows": rows})])
+            return len(rows)
+
+    def delete_documents(self, document_ids: Sequence[str]) -> int:
+        with self._lock, self._file_lock():
+            self._reload()
+            rows = [int(row) for row in self.rows_for_documents(document_ids)]
+            if rows:
+                self._append_log([json.dumps({"op": "delete", "rows": rows})])
+            return len(rows)
+
+    def _append_log(self, lines: List[str]):
+        with open(self._file("records.jsonl"), "a") as f:
+            f.write("\n".join(lines) + "\n")
+        self._reload()
+
+    def disk_bytes(self) -> int:
+        return sum(
+            entry.stat().st_size for entry in os.scandir(self.path) if entry.is_file()
+        )
+
+    def compact(self) -> int:
+        """Rewrite the files without deleted rows; returns bytes reclaimed.
+
+        New files are written next to the old ones and swapped in with
+        os.replace, the log last, under the exclusive lock. Other processes
+        notice the new log inode on their next refresh and reload.
+        """
+        with self._lock, self._file_lock():
+            self._reload()
+            if self.codec is None:
+                return 0
+            alive, _ = self.arrays()
+            live = np.flatnonzero(alive)
+            if len(live) == len(self.ids):
+                return 0
+
+            before = self.disk_bytes()
+
+            sources = {"vectors.bin": self.matrix()}
+            if self.codec.dtype == "int8":
+                sources["scales.bin"] = self._map("scales.bin", np.float32, 1)
+            if not self.codec.is_exact:
+                sources["full.bin"] = self.full()
+
+            for name, source in sources.items():
+                with open(self._file(name + ".compact"), "wb") as f:
+                    for start in range(0, len(live), COMPACT_BLOCK_ROWS):
+                        block = live[start:start + COMPACT_BLOCK_ROWS]
+                        f.write(np.ascontiguousarray(source[block]).tobytes())
+
+            with open(self._file("records.jsonl.compact"), "w") as f:
+                for new_row, row in enumerate(live):
+                    f.write(json.dumps({
+                        "op": "add",
+                        "row": new_row,
+                        "id": self.ids[row],
+                        "document": self.documents[row],
+                        "metadata": self.metadatas[row]
+                    }) + "\n")
+
+            self._maps = {}
+            for name in sources:
+                os.replace(self._file(name + ".compact"), self._file(name))
+            os.replace(self._file("records.jsonl.compact"), self._file("records.jsonl"))
+
+            self._reload()
+            return before - self.disk_bytes()
+
+    # -- reads ---------------------------------------------------------
+
+    def rows_for_documents(self, document_ids: Optional[Sequence[str]]) -> np.ndarray:
+        alive, doc_codes = self.arrays()
+        if document_ids is None:
+            return np.flatnonzero(alive)
+        codes = [self.doc_code_of[d] for d in document_ids if d in self.doc_code_of]
+        return np.flatnonzero(alive & np.isin(doc_codes, codes))
+
+    def search(
+        self,
+        queries: np.ndarray,
+        top_k: int,
+        document_ids: Optional[List[str]]
+    ) -> List[List[VectorHit]]:
+        with self._lock:
+            self.refresh()
+            if self.codec is None:
+                return [[] for _ in range(len(queries))]
+
+            alive, _ = self.arrays()
+            candidates = self.rows_for_documents(document_ids or None)
+            if len(candidates) == 0:
+                return [[] for _ in range(len(queries))]
+
+            queries = np.asarray(queries, dtype=np.float32)
+            queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+            # One matmul for all queries; restrict rows only when filtering
+            matrix = self.matrix()
+            scales = self.scales()
+            if len(candidates) == len(alive):
+                scores = self.codec.scores(queries, matrix, scales)
+                scores[:, ~alive] = -np.inf
+                row_index = np.arange(len(alive))
+            else:
+                scores = self.codec.scores(
+                    queries,
+                    matrix[candidates],
+                    scales[candidates] if scales is not None else None
+                )
+                row_index = candidates
+
+            # Approximate rows: shortlist extra candidates, then re-score
+            # them exactly against the full-precision vectors
+            shortlist = top_k if self.codec.is_exact else top_k * self.rescore_factor
+            k = min(shortlist, len(candidates))
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+            results = []
+            for query, query_scores, query_top in zip(queries, scores, top):
+                rows = row_index[query_top]
+                if self.codec.is_exact:
+                    exact = query_scores[query_top]
+                else:
+                    exact = np.asarray(self.full()[rows], dtype=np.float32) @ query
+                order = np.argsort(-exact)[:top_k]
+                results.append([
+                    VectorHit(
+                        self.ids[rows[i]],
+                        self.documents[rows[i]],
+                        self.metadatas[rows[i]],
+                        float(1 - exact[i])
+                    )
+                    for i in order
+                ])
+            return results
+
+    def stats(self) -> dict:
+        alive, _ = self.arrays()
+        rows = len(self.ids)
+        stats = {
+            "rows": rows,
+            "live_rows": int(alive.sum()),
+            "dim": self.dim,
+            "search_bytes": 0,
+            "full_bytes": 0,
+        }
+        if self.codec is not None:
+            stats.update({
+                "dtype": self.codec.dtype,
+                "reduction": self.codec.reduction,
+                "compact_dim": self.compact_dim,
+                "pending_pca_dim": self.pending_pca_dim,
+                "search_bytes": rows * self.codec.bytes_per_vector(self.dim),
+                "full_bytes": 0 if self.codec.is_exact else rows * self.dim * 4,
+            })
+        return stats
+
+
+class _FileLock:
+    """Advisory lock across processes: exclusive for writers, shared for
+    readers reloading the log."""
+
+    def __init__(self, path: str, shared: bool = False):
+        self.path = path
+        self.shared = shared
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "a")
+        fcntl.flock(self._file, fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+
+class NumpyVectorStore(VectorStore):
+    """Brute-force exact search over memory-mapped matrices.
+
+    For per-student corpora of a few thousand chunks, one vectorised
+    matmul plus argpartition beats an ANN index on both latency and
+    cold start. Vectors are stored unit-length, distance is 1 - cosine.
+
+    With a compact `dtype` (float16/int8) or a dimensionality reduction
+    the search matrix shrinks, and the top `top_k * rescore_factor`
+    candidates are re-scored against full-precision copies on disk.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        dtype: str = "float32",
+        reduced_dim: int = 0,
+        reduction: str = "none",
+        rescore_factor: int = 4
+    ):
+        self.path = path
+        self.codec_options = {
+            "dtype": dtype,
+            "reduced_dim": reduced_dim,
+            "reduction": reduction,
+        }
+        VectorCodec(**self.codec_options)  # Fail fast on bad settings
+        self.rescore_factor = rescore_factor
+        self._collections: Dict[str, _NumpyCollection] = {}
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def _collection(self, user_id: str, create: bool = False) -> _NumpyCollection:
+        name = collection_name(user_id)
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                directory = os.path.join(self.path, name)
+                if not create and not os.path.isdir(directory):
+                    raise CollectionNotFoundError(f"No documents found for user {user_id}")
+                collection = _NumpyCollection(
+                    directory, user_id, self.codec_options, self.rescore_factor
+                )
+                self._collections[name] = collection
+            return collection
+
+    def upsert(self, user_id, ids, embeddings, documents, metadatas):
+        if not ids:
+            return
+        self._collection(user_id, create=True).upsert(ids, embeddings, documents, metadatas)
+
+    def query(self, user_id, query_embeddings, top_k, document_ids=None):
+        return self._collection(user_id).search(
+            np.atleast_2d(query_embeddings), top_k, document_ids
+        )
+
+    def get(self, user_id, document_id=None, include_embeddings=False, limit=None, offset=0):
+        try:
+            collection = self._collection(user_id)
+        except CollectionNotFoundError:
+            return VectorRecords([], [], [], None)
+
+        with collection._lock:
+            collection.refresh()
+            rows = collection.rows_for_documents(
+                [document_id] if document_id is not None else None
+            )
+            rows = rows[offset:offset + limit if limit is not None else None]
+
+            embeddings = None
+            if include_embeddings:
+                embeddings = np.asarray(collection.full()[rows], dtype=np.float32)
+            return VectorRecords(
+                [collection.ids[row] for row in rows],
+                [collection.documents[row] for row in rows],
+                [collection.metadatas[row] for row in rows],
+                embeddings
+            )
+
+    def count_document(self, user_id, document_id):
+        try:
+            collection = self._collection(user_id)
+        except CollectionNotFoundError:
+            return 0
+        with collection._lock:
+            collection.refresh()
+            return len(collection.rows_for_documents([document_id]))
+
+    def find_by_chunk_hash(self, user_id, chunk_hashes, embedding_model):
+        try:
+            collection = self._collection(user_id)
+        except CollectionNotFoundError:
+            return {}
+
+        with collection._lock:
+            collection.refresh()
+            found = {
+                chunk_hash: collection.rows_by_hash[(embedding_model, chunk_hash)]
+                for chunk_hash in set(chunk_hashes)
+                if (embedding_model, chunk_hash) in collection.rows_by_hash
+            }
+            if not found:
+                return {}
+            full = collection.full()
+            return {
+                chunk_hash: np.asarray(full[row], dtype=np.float32)
+                for chunk_hash, row in found.items()
+            }
+
+    def stats(self, user_id: str) -> dict:
+        collection = self._collection(user_id)
+        with collection._lock:
+            collection.refresh()
+            return collection.stats()
+
+    def update_metadata(self, user_id, ids, metadatas):
+        if ids:
+            self._collection(user_id).update_metadata(ids, metadatas)
+
+    def delete(self, user_id, ids):
+        if not ids:
+            return 0
+        try:
+            collection = self._collection(user_id)
+        except CollectionNotFoundError:
+            return 0
+        return collection.delete(ids)
+
+    def delete_documents(self, user_id, document_ids):
+        if not document_ids:
+            return 0
+        try:
+            collection = self._collection(user_id)
+        except CollectionNotFoundError:
+            return 0
+        return collection.delete_documents(document_ids)
+
+    def document_ids(self, user_id):
+        collection = self._collection(user_id)
+        with collection._lock:
+            collection.refresh()
+            alive, doc_codes = collection.arrays()
+            codes = set(np.unique(doc_codes[alive]).tolist())
+            return {
+                document_id for document_id, code in collection.doc_code_of.items()
+                if code in codes
+            }
+
+    def list_users(self):
+        users = []
+        for entry in sorted(os.scandir(self.path), key=lambda e: e.name):
+            meta_path = os.path.join(entry.path, "meta.json")
+            if entry.is_dir() and os.path.exists(meta_path):
+                with open(meta_path) as f:
+                    user_id = json.load(f).get("user_id")
+                if user_id:
+                    users.append(user_id)
+        return users
+
+    def compact(self, user_id):
+        return self._collection(user_id).compact()
+
+    def disk_usage(self):
+        return _directory_size(self.path)
+
+
+def _directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def create_vector_store() -> VectorStore:
+    if settings.VECTOR_BACKEND == "numpy":
+        return NumpyVectorStore(
+            settings.VECTOR_DIR,
+            dtype=settings.VECTOR_DTYPE,
+            reduced_dim=settings.VECTOR_REDUCED_DIM,
+            reduction=settings.VECTOR_REDUCTION,
+            rescore_factor=settings.VECTOR_RESCORE_FACTOR
+        )
+    if settings.VECTOR_BACKEND == "chroma":
+        return ChromaVectorStore(settings.CHROMA_DIR)
+    raise ValueError(f"Unknown VECTOR_BACKEND: {settings.VECTOR_BACKEND}")
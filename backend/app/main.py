@@ -1,22 +1,44 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from app.api import auth, documents, chat
+from app.config import settings
 from app.db.mongodb import db
+from app.core.jobs import ingestion_queue
+from app.core.rag import rag
+from app.core.security import password_executor, token_cache
+from app.core.metrics import HTTP_REQUESTS, HTTP_REQUEST_SECONDS, render_metrics
+from app.utils.logger import get_logger, trace_id_var
 from contextlib import asynccontextmanager
+import asyncio
+import time
+import uuid
+
+logger = get_logger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    print("\n Starting StudyMate API...")
+    logger.info("Starting StudyMate API")
     await db.connect_db()
-    print("All systems ready!\n")
+    
+    # Load the embedding model etc. off the event loop; /ready reports
+    # when it's done so traffic only reaches warmed workers
+    if settings.WARMUP_ON_STARTUP:
+        asyncio.get_running_loop().run_in_executor(None, rag.warmup)
+    
+    await documents.resume_interrupted_uploads()
+    logger.info("API started, warming up in the background")
     
     yield
     
     # Shutdown
-    print("\n Shutting down StudyMate API...")
+    logger.info("Shutting down StudyMate API")
+    ingestion_queue.shutdown()
+    rag.shutdown()
+    password_executor.shutdown(wait=False, cancel_futures=True)
     await db.close_db()
-    print(" Cleanup complete\n")
+    logger.info("Cleanup complete")
 
 # Create FastAPI app
 app = FastAPI(
@@ -41,6 +63,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Tag the request with a trace id (X-Request-ID) for logs and time it."""
+    trace_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    token = trace_id_var.set(trace_id)
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        response.headers["X-Request-ID"] = trace_id
+        return response
+    finally:
+        # Route templates, not raw paths, keep label cardinality bounded
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        HTTP_REQUESTS.labels(request.method, path, str(status_code)).inc()
+        HTTP_REQUEST_SECONDS.labels(request.method, path).observe(time.perf_counter() - start)
+        trace_id_var.reset(token)
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(documents.router)
@@ -59,8 +101,33 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
+    # Don't open the cache just to report on it
+    embedding_cache = rag.components["embedding_cache"].peek()
     return {
         "status": "healthy",
         "database": "connected",
-        "rag": "initialized"
-    }
\ No newline at end of file
+        "rag": "ready" if rag.is_ready() else "warming_up",
+        "embedding_cache": embedding_cache.stats() if embedding_cache else None,
+        "answer_cache": rag.answer_cache.stats(),
+        "context_assembler": rag.context_assembler.stats(),
+        "token_cache": token_cache.stats(),
+        "embedding_batcher": rag.embedding_batcher.stats()
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe - 503 until every component is loaded"""
+    components = rag.readiness()
+    components["database"] = {"status": "ready" if db.client is not None else "pending"}
+    
+    ready = all(component["status"] == "ready" for component in components.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "components": components}
+    )
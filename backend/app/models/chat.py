@@ -10,12 +10,54 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     message: str
     document_ids: Optional[List[str]] = None  # Which docs to search (optional)
+    session_id: Optional[str] = None  # Continue a conversation (from POST /chat/sessions)
 
 class ChatResponse(BaseModel):
     answer: str
     sources: List[str]  # Which documents were used
+    session_id: Optional[str] = None
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
+class ChatSessionInfo(BaseModel):
+    id: str = Field(alias="_id")
+    turns: int = 0  # Questions answered in this session
+    created_at: datetime
+    updated_at: datetime
+    
+    class Config:
+        populate_by_name = True
+
+class BatchChatRequest(BaseModel):
+    questions: List[str] = Field(min_length=1)
+    document_ids: Optional[List[str]] = None  # Searched for every question
+
+class BatchChatItem(BaseModel):
+    question: str
+    answer: Optional[str] = None
+    sources: List[str] = []
+    error: Optional[str] = None  # Set instead of answer when this question failed
+
+class BatchChatResponse(BaseModel):
+    results: List[BatchChatItem]  # Same order as the questions
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+
+class ChatHistoryItem(BaseModel):
+    id: str = Field(alias="_id")
+    question: str
+    answer: str  # Truncated in the summary view
+    answer_truncated: bool = False
+    sources: Optional[List[str]] = None  # Full view only
+    document_ids: Optional[List[str]] = None  # Full view only
+    session_id: Optional[str] = None  # Full view only
+    timestamp: datetime
+    
+    class Config:
+        populate_by_name = True
+
+class ChatHistoryPage(BaseModel):
+    items: List[ChatHistoryItem]
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next page
+
 class DocumentInfo(BaseModel):
     id: str = Field(alias="_id")
     filename: str
@@ -23,4 +65,16 @@ class DocumentInfo(BaseModel):
     num_chunks: int
     
     class Config:
-        populate_by_name = True
\ No newline at end of file
+        populate_by_name = True
+
+class DocumentPage(BaseModel):
+    items: List[DocumentInfo]
+    next_cursor: Optional[str] = None
+
+class DocumentStatus(BaseModel):
+    document_id: str
+    status: str  # "queued", "processing", "done" or "failed"
+    chunks_processed: int = 0
+    chunks_total: Optional[int] = None
+    num_chunks: Optional[int] = None
+    error: Optional[str] = None
\ No newline at end of file
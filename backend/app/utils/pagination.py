@@ -0,0 +1,29 @@
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+
+def encode_cursor(timestamp: datetime, item_id: str) -> str:
+    """Opaque keyset cursor for the last item of a page."""
+    payload = json.dumps({"t": timestamp.isoformat(), "id": item_id})
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Raises ValueError for cursors we didn't issue."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(payload["t"]), str(payload["id"])
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def after_cursor(field: str, timestamp: datetime, item_id) -> dict:
+    """Filter for items after (timestamp, _id) in descending order."""
+    return {
+        "$or": [
+            {field: {"$lt": timestamp}},
+            {field: timestamp, "_id": {"$lt": item_id}},
+        ]
+    }
@@ -0,0 +1,140 @@
+"""Chunking throughput: the built-in TextChunker vs LangChain's splitter.
+
+Splits synthetic study text (wrapped into lines like extracted PDF text)
+with each configuration, checks the chunks (offsets, sizes, nothing
+skipped) and reports MB/s. LangChain is optional; its row is skipped
+when it isn't installed.
+
+Usage (from backend/):
+    python -m benchmarks.chunking --pages 500
+"""
+import argparse
+import time
+from typing import Callable, List, Optional, Tuple
+
+from app.core.chunking import _TOKEN, CHARS, TOKENS, TextChunker, TextSpan
+from app.core.pdf import PAGE_SEPARATOR
+from benchmarks.corpus import LINE_CHARS, _wrap, generate_pages
+
+
+def _corpus_text(pages: int, seed: int) -> str:
+    return PAGE_SEPARATOR.join(
+        "\n".join(_wrap(page, LINE_CHARS)) for page in generate_pages(pages, seed)
+    )
+
+
+def _stream(chunker: TextChunker, text: str, window: int) -> List[TextSpan]:
+    # Same windowed splitting as RAGPipeline._iter_chunks
+    spans: List[TextSpan] = []
+    buffer_offset, position = 0, 0
+    buffer = ""
+    while position < len(text):
+        buffer += text[position:position + window]
+        position += window
+        if position < len(text):
+            partial, resume = chunker.split_partial(buffer)
+            spans += [TextSpan(buffer_offset + s, buffer_offset + e) for s, e in partial]
+            buffer = buffer[resume:]
+            buffer_offset += resume
+    spans += [TextSpan(buffer_offset + s, buffer_offset + e) for s, e in chunker.split(buffer)]
+    return spans
+
+
+def _langchain_splitter(chunk_size: int, chunk_overlap: int) -> Optional[Callable[[str], List[TextSpan]]]:
+    try:
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+    except ImportError:
+        return None
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        add_start_index=True,
+    )
+
+    def split(text: str) -> List[TextSpan]:
+        return [
+            TextSpan(doc.metadata["start_index"], doc.metadata["start_index"] + len(doc.page_content))
+            for doc in splitter.create_documents([text])
+        ]
+    return split
+
+
+def _check(text: str, spans: List[TextSpan], chunk_size: int, unit: str) -> List[str]:
+    """Problems with a split: bad offsets, oversized chunks, skipped text."""
+    problems = []
+    covered = 0
+    for start, end in spans:
+        chunk = text[start:end]
+        if not chunk or chunk != chunk.strip():
+            problems.append(f"empty or unstripped chunk at {start}")
+        size = len(_TOKEN.findall(chunk)) if unit == TOKENS else len(chunk)
+        if size > chunk_size:
+            problems.append(f"chunk at {start} has {size} {unit} (max {chunk_size})")
+        if start > covered and text[covered:start].strip():
+            problems.append(f"text skipped at {covered}-{start}")
+        covered = max(covered, end)
+    if text[covered:].strip():
+        problems.append(f"text skipped at {covered}-{len(text)}")
+    return problems[:5]
+
+
+def _time(split: Callable[[str], List[TextSpan]], text: str, repeat: int) -> Tuple[float, List[TextSpan]]:
+    best, spans = float("inf"), []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        spans = split(text)
+        best = min(best, time.perf_counter() - started)
+    return best, spans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--token-chunk-size", type=int, default=250)
+    parser.add_argument("--token-chunk-overlap", type=int, default=50)
+    parser.add_argument("--window", type=int, default=50000, help="Streaming window, in characters")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per configuration (best is reported)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    text = _corpus_text(args.pages, args.seed)
+    megabytes = len(text.encode()) / 1e6
+    print(f" 📚 {args.pages} pages, {megabytes:.1f} MB of text\n")
+
+    chars = TextChunker(args.chunk_size, args.chunk_overlap)
+    sentences = TextChunker(args.chunk_size, args.chunk_overlap, sentence_boundaries=True)
+    tokens = TextChunker(args.token_chunk_size, args.token_chunk_overlap, unit=TOKENS)
+    configurations = [
+        ("native chars", chars.split, args.chunk_size, CHARS),
+        ("native chars, streamed", lambda t: _stream(chars, t, args.window), args.chunk_size, CHARS),
+        ("native chars + sentences", sentences.split, args.chunk_size, CHARS),
+        ("native tokens", tokens.split, args.token_chunk_size, TOKENS),
+    ]
+    langchain = _langchain_splitter(args.chunk_size, args.chunk_overlap)
+    if langchain is None:
+        print(" ⚠️ langchain is not installed; skipping the comparison\n")
+    else:
+        configurations.append(("langchain recursive", langchain, args.chunk_size, CHARS))
+
+    results = {}
+    print(f" {'splitter':<26}{'MB/s':>8}{'chunks':>8}{'avg len':>9}  check")
+    for label, split, chunk_size, unit in configurations:
+        seconds, spans = _time(split, text, args.repeat)
+        results[label] = (seconds, spans)
+        problems = _check(text, spans, chunk_size, unit)
+        average = sum(end - start for start, end in spans) / max(len(spans), 1)
+        print(f" {label:<26}{megabytes / seconds:>8.1f}{len(spans):>8}{average:>9.0f}  "
+              f"{'ok' if not problems else '; '.join(problems)}")
+
+    if results["native chars, streamed"][1] != results["native chars"][1]:
+        print("\n ❌ Streamed split differs from the whole-text split")
+    if langchain is not None:
+        speedup = results["langchain recursive"][0] / results["native chars"][0]
+        print(f"\n native chars is {speedup:.1f}x the throughput of langchain")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Compare two benchmark result files.
+
+Usage (from backend/):
+    python -m benchmarks.compare benchmarks/results/before.json benchmarks/results/after.json
+"""
+import argparse
+import json
+from typing import List, Optional, Tuple
+
+# (label, value in a results file, True if higher is better)
+Metric = Tuple[str, Optional[float], bool]
+
+
+def _metrics(results: dict) -> List[Metric]:
+    ingestion = results.get("ingestion", {})
+    metrics = [
+        ("ingestion pages/s", ingestion.get("pages_per_second"), True),
+        ("ingestion chunks/s", ingestion.get("chunks_per_second"), True),
+        ("warmup s", results.get("warmup_seconds"), False),
+        ("peak RSS MB", results.get("peak_rss_mb", {}).get("process"), False),
+    ]
+    for level in results.get("queries", []):
+        concurrency = level["concurrency"]
+        metrics += [
+            (f"query p50 ms @{concurrency}", level["p50_ms"], False),
+            (f"query p95 ms @{concurrency}", level["p95_ms"], False),
+            (f"query p99 ms @{concurrency}", level["p99_ms"], False),
+            (f"query req/s @{concurrency}", level["requests_per_second"], True),
+        ]
+    return metrics
+
+
+def _change(before: Optional[float], after: Optional[float], higher_is_better: bool) -> str:
+    if before is None or after is None:
+        return ""
+    if not before:
+        return "n/a"
+    percent = (after - before) / before * 100
+    better = percent > 0 if higher_is_better else percent < 0
+    marker = "better" if better else "worse" if percent else ""
+    return f"{percent:+.1f}% {marker}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    if before.get("options") != after.get("options"):
+        print(" ⚠️ Runs used different options; numbers may not be comparable\n")
+
+    after_metrics = {label: value for label, value, _ in _metrics(after)}
+    print(f" {'metric':<24}{'before':>12}{'after':>12}  change")
+    for label, value, higher_is_better in _metrics(before):
+        new_value = after_metrics.get(label)
+        print(f" {label:<24}{str(value):>12}{str(new_value):>12}  "
+              f"{_change(value, new_value, higher_is_better)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Synthetic PDF corpus for benchmarks.
+
+Pages are filled with seeded pseudo-random study text built around a few
+topics, so the same seed always produces byte-identical PDFs and the
+questions from `sample_questions` have something to retrieve. The PDFs
+are written by hand (one Helvetica text block per page) to keep this
+free of extra dependencies; pypdf extracts them like any other PDF.
+
+Usage (from backend/):
+    python -m benchmarks.corpus /tmp/corpus --pages 10 50 200
+"""
+import argparse
+import os
+import random
+from typing import List, NamedTuple, Sequence
+
+TOPICS = {
+    "photosynthesis": ["chlorophyll", "light reactions", "Calvin cycle", "glucose", "stomata"],
+    "cell division": ["mitosis", "meiosis", "chromosomes", "spindle fibers", "cytokinesis"],
+    "thermodynamics": ["entropy", "enthalpy", "heat engines", "Carnot efficiency", "free energy"],
+    "calculus": ["derivatives", "integrals", "limits", "chain rule", "Taylor series"],
+    "world history": ["industrial revolution", "treaty of Versailles", "cold war", "renaissance", "colonialism"],
+    "economics": ["supply and demand", "inflation", "opportunity cost", "monopoly", "fiscal policy"],
+    "data structures": ["linked lists", "hash tables", "binary trees", "heaps", "graphs"],
+    "genetics": ["alleles", "DNA replication", "transcription", "mutations", "natural selection"],
+}
+
+_VERBS = ["explains", "determines", "depends on", "is related to", "limits", "describes", "drives"]
+_FILLER = [
+    "In practice", "As the lecture notes", "For the exam", "In most textbooks",
+    "Historically", "By definition", "In this chapter", "As a rule of thumb",
+]
+
+LINE_CHARS = 90  # Characters per line of text on a page
+LINES_PER_PAGE = 60  # Fits an A4 page at 12pt leading
+
+
+class CorpusDocument(NamedTuple):
+    path: str
+    pages: int
+
+
+def _sentence(rng: random.Random, topic: str) -> str:
+    terms = TOPICS[topic]
+    return (
+        f"{rng.choice(_FILLER)}, {rng.choice(terms)} {rng.choice(_VERBS)} "
+        f"{rng.choice(terms)} in {topic} (note {rng.randint(1, 999)})."
+    )
+
+
+def generate_pages(num_pages: int, seed: int = 0, words_per_page: int = 400) -> List[str]:
+    """Page texts; each page sticks to one topic, like a textbook section."""
+    rng = random.Random(seed)
+    topics = sorted(TOPICS)
+    pages = []
+    for _ in range(num_pages):
+        topic = rng.choice(topics)
+        words: List[str] = []
+        while len(words) < words_per_page:
+            words.extend(_sentence(rng, topic).split())
+        pages.append(" ".join(words[:words_per_page]))
+    return pages
+
+
+def _wrap(text: str, width: int) -> List[str]:
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + 1 + len(word) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        lines.append(line)
+    return lines
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: Sequence[str]):
+    """Minimal PDF 1.4 with one text-only page per entry of `pages`."""
+    # Object numbers: 1 catalog, 2 page tree, 3 font, then (page, content) pairs
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    kids = []
+    for i, text in enumerate(pages):
+        page_num, content_num = 4 + 2 * i, 5 + 2 * i
+        kids.append(f"{page_num} 0 R")
+
+        lines = _wrap(text, LINE_CHARS)[:LINES_PER_PAGE]
+        stream = "BT /F1 9 Tf 12 TL 40 800 Td\n"
+        stream += "".join(f"({_escape(line)}) Tj T*\n" for line in lines)
+        stream += "ET"
+        data = stream.encode("latin-1", errors="replace")
+
+        objects[page_num] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_num} 0 R >>"
+        ).encode("ascii")
+        objects[content_num] = (
+            f"<< /Length {len(data)} >>\nstream\n".encode("ascii") + data + b"\nendstream"
+        )
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>".encode("ascii")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for num in sorted(objects):
+        offsets[num] = len(out)
+        out += f"{num} 0 obj\n".encode("ascii") + objects[num] + b"\nendobj\n"
+
+    xref_start = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("ascii")
+    for num in sorted(objects):
+        out += f"{offsets[num]:010d} 00000 n \n".encode("ascii")
+    out += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref_start}\n%%EOF\n"
+    ).encode("ascii")
+
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def generate_corpus(
+    out_dir: str,
+    page_counts: Sequence[int],
+    seed: int = 0,
+    words_per_page: int = 400
+) -> List[CorpusDocument]:
+    """One PDF per entry of `page_counts`, each with its own derived seed."""
+    os.makedirs(out_dir, exist_ok=True)
+    documents = []
+    for i, num_pages in enumerate(page_counts):
+        path = os.path.join(out_dir, f"doc_{i:03d}_{num_pages}p.pdf")
+        write_pdf(path, generate_pages(num_pages, seed=seed * 1000 + i, words_per_page=words_per_page))
+        documents.append(CorpusDocument(path, num_pages))
+    return documents
+
+
+def sample_questions(count: int, seed: int = 0) -> List[str]:
+    """Distinct questions about corpus topics (distinct so the semantic
+    answer cache can't serve them all, unless enabled on purpose)."""
+    rng = random.Random(seed)
+    topics = sorted(TOPICS)
+    templates = [
+        "What does the material say about {term} in {topic}?",
+        "Explain how {term} works. (question {n})",
+        "How is {term} related to {topic}? (question {n})",
+        "Summarize the notes on {term} and {other}.",
+    ]
+    questions = []
+    for n in range(count):
+        topic = rng.choice(topics)
+        term, other = rng.sample(TOPICS[topic], 2)
+        questions.append(
+            rng.choice(templates).format(term=term, other=other, topic=topic, n=n)
+        )
+    return questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("out_dir")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 200],
+                        help="Page count of each generated PDF")
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for document in generate_corpus(args.out_dir, args.pages, args.seed, args.words_per_page):
+        print(f" {document.path}: {document.pages} pages")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Deterministic embedding backend for benchmarking without the model.
+
+Hashes words into a fixed number of dimensions (feature hashing), so
+texts sharing vocabulary still land near each other and retrieval has
+realistic work to do, at a fraction of the model's CPU cost. Use it to
+measure everything around embedding; leave it off to include the model.
+"""
+import hashlib
+import re
+import numpy as np
+from app.core.embeddings import EmbeddingBackend
+
+DIMENSIONS = 384  # Same as all-MiniLM-L6-v2
+
+_WORD = re.compile(r"\w+")
+
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+
+    name = "hashing"
+
+    def __init__(self, dimensions: int = DIMENSIONS):
+        self.dimensions = dimensions
+
+    def _bucket(self, word: str) -> int:
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little") % self.dimensions
+
+    def encode(self, texts):
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in _WORD.findall(text.lower()):
+                vectors[row, self._bucket(word)] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
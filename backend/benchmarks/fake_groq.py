@@ -0,0 +1,196 @@
+"""Stand-in for the Groq chat completions API.
+
+Answers every request with filler text after `latency_ms` (time to first
+token), then produces tokens at `tokens_per_second`, streamed or not, in
+the OpenAI-compatible format the groq SDK parses. Point the app at it
+with GROQ_BASE_URL.
+
+Usage (from backend/), e.g. for benchmarking a separately started API:
+    python -m benchmarks.fake_groq --port 8900 --latency-ms 300 --tokens-per-second 250
+    GROQ_BASE_URL=http://127.0.0.1:8900 python run.py
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+_WORDS = (
+    "the notes explain this concept using the examples from the uploaded "
+    "material and relate it to the earlier chapters of the course"
+).split()
+
+
+class FakeGroqServer:
+
+    def __init__(
+        self,
+        latency_ms: float = 300,
+        tokens_per_second: float = 250,
+        answer_tokens: int = 150,
+        host: str = "127.0.0.1",
+        port: int = 0  # 0 picks a free port
+    ):
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+        self.requests = 0
+        self.tokens_sent = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _handler_for(self))
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeGroqServer":
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="fake-groq", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "tokens_sent": self.tokens_sent,
+            "latency_ms": self.latency_ms,
+            "tokens_per_second": self.tokens_per_second,
+            "answer_tokens": self.answer_tokens,
+        }
+
+    def _record(self, tokens: int):
+        with self._lock:
+            self.requests += 1
+            self.tokens_sent += tokens
+
+    def _token_delay(self) -> float:
+        return 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+
+def _tokens(count: int):
+    # Words with their leading space, like typical BPE tokens
+    for i in range(count):
+        word = _WORDS[i % len(_WORDS)]
+        yield word if i == 0 else f" {word}"
+
+
+def _handler_for(server: FakeGroqServer):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if not self.path.endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                return
+            request = json.loads(body or b"{}")
+
+            count = min(server.answer_tokens, request.get("max_tokens") or server.answer_tokens)
+            prompt_tokens = sum(
+                len(str(m.get("content", ""))) // 4 for m in request.get("messages", [])
+            )
+            model = request.get("model", "fake")
+            completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+            time.sleep(server.latency_ms / 1000)
+            if request.get("stream"):
+                self._stream(completion_id, model, count)
+            else:
+                time.sleep(count * server._token_delay())
+                self._send_json(200, {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "".join(_tokens(count))},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": count,
+                        "total_tokens": prompt_tokens + count,
+                    },
+                })
+            server._record(count)
+
+        def _send_json(self, status: int, payload: dict):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _stream(self, completion_id: str, model: str, count: int):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def chunk(delta: dict, finish_reason=None):
+                event = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }
+                self._write_chunk(f"data: {json.dumps(event)}\n\n")
+
+            delay = server._token_delay()
+            chunk({"role": "assistant", "content": ""})
+            for token in _tokens(count):
+                chunk({"content": token})
+                if delay:
+                    time.sleep(delay)
+            chunk({}, finish_reason="stop")
+            self._write_chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _write_chunk(self, text: str):
+            data = text.encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=300, help="Time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=250, help="0 = instant")
+    parser.add_argument("--answer-tokens", type=int, default=150)
+    args = parser.parse_args()
+
+    server = FakeGroqServer(
+        args.latency_ms, args.tokens_per_second, args.answer_tokens, args.host, args.port
+    )
+    print(f" Fake Groq API on {server.base_url} (set GROQ_BASE_URL to this)")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
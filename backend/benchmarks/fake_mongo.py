@@ -0,0 +1,327 @@
+"""In-memory stand-in for the motor client, for offline benchmarks.
+
+Implements the subset of the motor API the app uses: find/find_one with
+projections, sort and limit; inserts, updates and deletes; the aggregate
+stages used by the history endpoint; unique indexes. Documents are
+copied in and out, as a round trip through MongoDB would. Not a general
+MongoDB emulator: unsupported operators raise NotImplementedError.
+"""
+import copy
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+_MISSING = object()
+
+
+def _compare(op: str, value, arg) -> bool:
+    if op == "$eq":
+        return value == arg
+    if op == "$ne":
+        return value != arg
+    if op == "$in":
+        return value in arg
+    if op == "$nin":
+        return value not in arg
+    if op == "$exists":
+        return (value is not _MISSING) == bool(arg)
+    if value is _MISSING or value is None:
+        return False
+    if op == "$lt":
+        return value < arg
+    if op == "$lte":
+        return value <= arg
+    if op == "$gt":
+        return value > arg
+    if op == "$gte":
+        return value >= arg
+    raise NotImplementedError(f"Query operator {op}")
+
+
+def _matches_value(value, condition) -> bool:
+    if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+        return all(_compare(op, value, arg) for op, arg in condition.items())
+    # Array fields match if any element does
+    if isinstance(value, list) and not isinstance(condition, list):
+        return condition in value
+    return value == condition
+
+
+def matches(document: dict, query: Optional[dict]) -> bool:
+    for key, condition in (query or {}).items():
+        if key == "$or":
+            if not any(matches(document, part) for part in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(document, part) for part in condition):
+                return False
+        elif key.startswith("$"):
+            raise NotImplementedError(f"Query operator {key}")
+        elif not _matches_value(document.get(key, _MISSING), condition):
+            return False
+    return True
+
+
+def _evaluate(expression, document: dict):
+    """Aggregation expressions used in $project."""
+    if isinstance(expression, str) and expression.startswith("$"):
+        return document.get(expression[1:])
+    if isinstance(expression, dict) and len(expression) == 1:
+        (op, args), = expression.items()
+        if op == "$substrCP":
+            text, start, length = (_evaluate(a, document) for a in args)
+            return (text or "")[start:start + length]
+        if op == "$strLenCP":
+            return len(_evaluate(args, document) or "")
+        if op == "$ifNull":
+            value = _evaluate(args[0], document)
+            return _evaluate(args[1], document) if value is None else value
+        if op in ("$eq", "$ne", "$lt", "$lte", "$gt", "$gte"):
+            left, right = (_evaluate(a, document) for a in args)
+            return _compare(op, left, right)
+        if op.startswith("$"):
+            raise NotImplementedError(f"Expression operator {op}")
+    return expression
+
+
+def project(document: dict, projection: Optional[dict]) -> dict:
+    if not projection:
+        return document
+    fields = {k: v for k, v in projection.items() if k != "_id"}
+    include_id = projection.get("_id", 1) not in (0, False)
+
+    if fields and all(v in (0, False) for v in fields.values()):
+        # Exclusion projection
+        result = {k: v for k, v in document.items() if k not in fields}
+        if not include_id:
+            result.pop("_id", None)
+        return result
+
+    result = {"_id": document["_id"]} if include_id and "_id" in document else {}
+    for key, spec in fields.items():
+        if spec in (1, True):
+            if key in document:
+                result[key] = document[key]
+        else:
+            result[key] = _evaluate(spec, document)
+    return result
+
+
+def _sort_key(value):
+    # MongoDB orders missing/null first; keeps mixed types from raising
+    if value is _MISSING or value is None:
+        return (0, 0)
+    return (1, value)
+
+
+def sort_documents(documents: List[dict], keys: Iterable[Tuple[str, int]]) -> List[dict]:
+    # Stable sorts applied from the least significant key
+    for field, direction in reversed(list(keys)):
+        documents.sort(key=lambda d: _sort_key(d.get(field, _MISSING)), reverse=direction < 0)
+    return documents
+
+
+class FakeCursor:
+
+    def __init__(self, documents: List[dict], projection: Optional[dict] = None):
+        self._documents = documents
+        self._projection = projection
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key_or_list, direction: int = 1) -> "FakeCursor":
+        keys = [(key_or_list, direction)] if isinstance(key_or_list, str) else key_or_list
+        sort_documents(self._documents, keys)
+        return self
+
+    def skip(self, count: int) -> "FakeCursor":
+        self._skip = count
+        return self
+
+    def limit(self, count: int) -> "FakeCursor":
+        self._limit = count
+        return self
+
+    def _results(self) -> List[dict]:
+        documents = self._documents[self._skip:]
+        if self._limit:
+            documents = documents[:self._limit]
+        return [copy.deepcopy(project(d, self._projection)) for d in documents]
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        results = self._results()
+        return results[:length] if length is not None else results
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self._results():
+            yield document
+
+
+class FakeCollection:
+
+    def __init__(self, name: str):
+        self.name = name
+        self._documents: Dict[Any, dict] = {}
+        self._unique: List[Tuple[str, Tuple[str, ...]]] = []
+
+    def _check_unique(self, document: dict, ignore_id=None):
+        for name, fields in self._unique:
+            key = tuple(document.get(f) for f in fields)
+            for other in self._documents.values():
+                if other["_id"] != ignore_id and tuple(other.get(f) for f in fields) == key:
+                    raise DuplicateKeyError(f"E11000 duplicate key error index: {name}")
+
+    async def create_indexes(self, indexes) -> List[str]:
+        names = []
+        for index in indexes:
+            spec = index.document
+            if spec.get("unique"):
+                self._unique.append((spec["name"], tuple(spec["key"].keys())))
+            names.append(spec["name"])
+        return names
+
+    async def insert_one(self, document: dict):
+        # motor sets _id on the caller's dict too
+        document.setdefault("_id", ObjectId())
+        if document["_id"] in self._documents:
+            raise DuplicateKeyError(f"E11000 duplicate key error: _id {document['_id']}")
+        self._check_unique(document)
+        self._documents[document["_id"]] = copy.deepcopy(document)
+        return SimpleNamespace(inserted_id=document["_id"], acknowledged=True)
+
+    async def insert_many(self, documents: List[dict], ordered: bool = True):
+        ids = [(await self.insert_one(document)).inserted_id for document in documents]
+        return SimpleNamespace(inserted_ids=ids, acknowledged=True)
+
+    def find(self, filter: Optional[dict] = None, projection: Optional[dict] = None) -> FakeCursor:
+        return FakeCursor(
+            [d for d in self._documents.values() if matches(d, filter)], projection
+        )
+
+    async def find_one(self, filter: Optional[dict] = None, projection: Optional[dict] = None, sort=None):
+        cursor = self.find(filter, projection)
+        if sort:
+            cursor.sort(sort)
+        results = await cursor.limit(1).to_list(1)
+        return results[0] if results else None
+
+    async def count_documents(self, filter: dict) -> int:
+        return sum(1 for d in self._documents.values() if matches(d, filter))
+
+    async def distinct(self, key: str, filter: Optional[dict] = None) -> list:
+        values = []
+        for document in self._documents.values():
+            if matches(document, filter) and key in document and document[key] not in values:
+                values.append(document[key])
+        return values
+
+    def _apply_update(self, document: dict, update: dict):
+        for op, fields in update.items():
+            for key, value in fields.items():
+                if op == "$set":
+                    document[key] = copy.deepcopy(value)
+                elif op == "$inc":
+                    document[key] = document.get(key, 0) + value
+                elif op == "$push":
+                    document.setdefault(key, []).append(copy.deepcopy(value))
+                elif op == "$unset":
+                    document.pop(key, None)
+                else:
+                    raise NotImplementedError(f"Update operator {op}")
+
+    async def _update(self, filter: dict, update: dict, many: bool, upsert: bool):
+        targets = [d for d in self._documents.values() if matches(d, filter)]
+        if not many:
+            targets = targets[:1]
+        for document in targets:
+            updated = copy.deepcopy(document)
+            self._apply_update(updated, update)
+            self._check_unique(updated, ignore_id=document["_id"])
+            self._documents[document["_id"]] = updated
+
+        upserted_id = None
+        if not targets and upsert:
+            document = {k: v for k, v in filter.items() if not k.startswith("$")}
+            self._apply_update(document, update)
+            upserted_id = (await self.insert_one(document)).inserted_id
+        return SimpleNamespace(
+            matched_count=len(targets), modified_count=len(targets), upserted_id=upserted_id
+        )
+
+    async def update_one(self, filter: dict, update: dict, upsert: bool = False):
+        return await self._update(filter, update, many=False, upsert=upsert)
+
+    async def update_many(self, filter: dict, update: dict, upsert: bool = False):
+        return await self._update(filter, update, many=True, upsert=upsert)
+
+    async def _delete(self, filter: dict, many: bool):
+        targets = [d["_id"] for d in self._documents.values() if matches(d, filter)]
+        if not many:
+            targets = targets[:1]
+        for document_id in targets:
+            del self._documents[document_id]
+        return SimpleNamespace(deleted_count=len(targets))
+
+    async def delete_one(self, filter: dict):
+        return await self._delete(filter, many=False)
+
+    async def delete_many(self, filter: dict):
+        return await self._delete(filter, many=True)
+
+    def aggregate(self, pipeline: List[dict]) -> FakeCursor:
+        documents = list(self._documents.values())
+        for stage in pipeline:
+            (op, arg), = stage.items()
+            if op == "$match":
+                documents = [d for d in documents if matches(d, arg)]
+            elif op == "$sort":
+                documents = sort_documents(documents, arg.items())
+            elif op == "$skip":
+                documents = documents[arg:]
+            elif op == "$limit":
+                documents = documents[:arg]
+            elif op == "$project":
+                documents = [project(d, arg) for d in documents]
+            else:
+                raise NotImplementedError(f"Aggregation stage {op}")
+        return FakeCursor(documents)
+
+
+class FakeDatabase:
+
+    def __init__(self, name: str):
+        self.name = name
+        self._collections: Dict[str, FakeCollection] = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(name)
+        return self._collections[name]
+
+
+class _FakeAdmin:
+
+    async def command(self, name: str, *args, **kwargs) -> dict:
+        if name != "ping":
+            raise NotImplementedError(f"Admin command {name}")
+        return {"ok": 1.0}
+
+
+class FakeMongoClient:
+    """Drop-in for AsyncIOMotorClient: `db.client = FakeMongoClient()`."""
+
+    def __init__(self):
+        self._databases: Dict[str, FakeDatabase] = {}
+        self.admin = _FakeAdmin()
+
+    def __getitem__(self, name: str) -> FakeDatabase:
+        if name not in self._databases:
+            self._databases[name] = FakeDatabase(name)
+        return self._databases[name]
+
+    def close(self):
+        pass
@@ -0,0 +1,329 @@
+"""Ingestion and query benchmark for the API, runnable offline.
+
+Generates a synthetic PDF corpus, starts a fake Groq server and an
+in-memory MongoDB, then drives the real FastAPI app in-process: uploads
+every PDF through /documents/upload (waiting for ingestion to finish),
+then sends questions to /chat/query at each concurrency level. Reports
+pages/sec, chunks/sec, query latency percentiles and peak RSS, and saves
+them as JSON; compare two runs with `python -m benchmarks.compare`.
+
+Every run uses fresh upload/vector directories and disables the answer
+cache and the on-disk embedding cache, so results don't depend on
+earlier runs. Other settings (VECTOR_BACKEND, EMBEDDING_BACKEND, ...)
+come from the environment / .env as usual.
+
+Usage (from backend/):
+    python -m benchmarks.run
+    python -m benchmarks.run --pages 20 100 400 --concurrency 1 8 32 --queries 200
+    python -m benchmarks.run --fake-embeddings --llm-latency-ms 0 --output before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import List, Optional
+import numpy as np
+from benchmarks.corpus import CorpusDocument, generate_corpus, sample_questions
+from benchmarks.fake_groq import FakeGroqServer
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+STATUS_POLL_SECONDS = 0.05
+
+
+def _percentiles(latencies: List[float]) -> dict:
+    if not latencies:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None}
+    values = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "mean_ms": round(float(values.mean()), 2),
+    }
+
+
+def _peak_rss_mb() -> dict:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 2**20 if sys.platform == "darwin" else 2**10
+    return {
+        "process": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        # Terminated PDF extraction workers
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def _ingest_one(client, headers, document: CorpusDocument) -> dict:
+    start = time.perf_counter()
+
+    # A full ingestion queue answers 503; wait for room like a client would
+    while True:
+        with open(document.path, "rb") as f:
+            response = await client.post(
+                "/documents/upload",
+                headers=headers,
+                files={"file": (os.path.basename(document.path), f, "application/pdf")}
+            )
+        if response.status_code != 503:
+            break
+        await asyncio.sleep(0.5)
+    response.raise_for_status()
+    document_id = response.json()["document_id"]
+
+    while True:
+        status = (await client.get(f"/documents/{document_id}/status", headers=headers)).json()
+        if status["status"] in ("done", "failed"):
+            break
+        await asyncio.sleep(STATUS_POLL_SECONDS)
+
+    return {
+        "pages": document.pages,
+        "status": status["status"],
+        "error": status.get("error"),
+        "chunks": status.get("num_chunks") or 0,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+async def bench_ingestion(client, headers, corpus: List[CorpusDocument], concurrency: int) -> dict:
+    limit = asyncio.Semaphore(concurrency)
+
+    async def run(document):
+        async with limit:
+            return await _ingest_one(client, headers, document)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run(document) for document in corpus))
+    elapsed = time.perf_counter() - start
+
+    done = [r for r in results if r["status"] == "done"]
+    pages = sum(r["pages"] for r in done)
+    chunks = sum(r["chunks"] for r in done)
+    return {
+        "documents": len(corpus),
+        "failed": len(results) - len(done),
+        "errors": sorted({r["error"] for r in results if r["error"]}),
+        "concurrency": concurrency,
+        "pages": pages,
+        "chunks": chunks,
+        "seconds": round(elapsed, 3),
+        "pages_per_second": round(pages / elapsed, 2),
+        "chunks_per_second": round(chunks / elapsed, 2),
+        "document_latency": _percentiles([r["seconds"] for r in done]),
+    }
+
+
+async def bench_queries(client, headers, questions: List[str], concurrency: int) -> dict:
+    pending = iter(questions)
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for question in pending:
+            start = time.perf_counter()
+            response = await client.post("/chat/query", headers=headers, json={"message": question})
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(questions),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 2),
+        **_percentiles(latencies),
+    }
+
+
+async def run_benchmark(args, corpus: List[CorpusDocument]) -> dict:
+    # Imported here: settings are read from the environment set up in main()
+    import httpx
+    from app.config import settings
+    from app.core.jobs import ingestion_queue
+    from app.core.lazy import LazyComponent
+    from app.core.rag import rag
+    from app.db.mongodb import MongoDB, db
+    from app.main import app
+
+    if args.mongo_url:
+        await db.connect_db()
+    else:
+        from benchmarks.fake_mongo import FakeMongoClient
+        MongoDB.client = FakeMongoClient()
+        await db.ensure_indexes()
+
+    if args.fake_embeddings:
+        from benchmarks.fake_embeddings import HashingEmbeddingBackend
+        rag.components["embedding_model"] = LazyComponent("embedding_model", HashingEmbeddingBackend)
+
+    # Model loading is reported separately, not charged to the first requests
+    start = time.perf_counter()
+    await asyncio.get_running_loop().run_in_executor(None, rag.warmup)
+    warmup_seconds = time.perf_counter() - start
+    if not rag.is_ready():
+        raise RuntimeError(f"Pipeline failed to load: {rag.readiness()}")
+
+    results = {"warmup_seconds": round(warmup_seconds, 3)}
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            response = await client.post("/auth/register", json={
+                "email": "benchmark@example.com",
+                "username": "benchmark",
+                "password": "benchmark-password"
+            })
+            response.raise_for_status()
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            print(f" Ingesting {len(corpus)} documents ({sum(d.pages for d in corpus)} pages)...")
+            results["ingestion"] = await bench_ingestion(client, headers, corpus, args.upload_concurrency)
+            _print_ingestion(results["ingestion"])
+
+            results["queries"] = []
+            for concurrency in args.concurrency:
+                questions = sample_questions(args.queries, seed=args.seed * 1000 + concurrency)
+                result = await bench_queries(client, headers, questions, concurrency)
+                results["queries"].append(result)
+                _print_queries(result)
+    finally:
+        ingestion_queue.shutdown()
+        rag.shutdown()
+        if args.mongo_url:
+            await db.client.drop_database(settings.DATABASE_NAME)
+        await db.close_db()
+
+    results["settings"] = {
+        key: getattr(settings, key)
+        for key in (
+            "EMBEDDING_BACKEND", "EMBEDDING_MODEL", "VECTOR_BACKEND", "VECTOR_DTYPE",
+            "VECTOR_REDUCED_DIM", "INGESTION_WORKERS", "INGESTION_EMBED_BATCH_SIZE",
+            "PDF_EXTRACT_WORKERS", "QUERY_WORKERS", "EMBED_BATCH_MAX_SIZE",
+            "CONTEXT_MAX_TOKENS", "CONTEXT_MAX_CHUNKS",
+        )
+    }
+    return results
+
+
+def _print_ingestion(result: dict):
+    print(f" Ingestion: {result['pages_per_second']} pages/s, {result['chunks_per_second']} chunks/s "
+          f"({result['pages']} pages, {result['chunks']} chunks in {result['seconds']} s, "
+          f"{result['failed']} failed)")
+
+
+def _print_queries(result: dict):
+    print(f" Queries @ {result['concurrency']:>3}: p50 {result['p50_ms']} ms, "
+          f"p95 {result['p95_ms']} ms, p99 {result['p99_ms']} ms, "
+          f"{result['requests_per_second']} req/s, {result['errors']} errors")
+
+
+def _configure_environment(args, workdir: str, groq_url: str):
+    # Isolated state for this run
+    os.environ["UPLOAD_DIR"] = os.path.join(workdir, "uploads")
+    os.environ["VECTOR_DIR"] = os.path.join(workdir, "vector_store")
+    os.environ["CHROMA_DIR"] = os.path.join(workdir, "chroma_db")
+    os.environ["EMBEDDING_CACHE_PATH"] = ""
+    os.environ["ANSWER_CACHE_ENABLED"] = "true" if args.answer_cache else "false"
+    os.environ["WARMUP_ON_STARTUP"] = "false"
+    os.environ["GROQ_BASE_URL"] = groq_url
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # Only needed to construct settings; nothing leaves the machine
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    if args.mongo_url:
+        os.environ["MONGODB_URL"] = args.mongo_url
+        os.environ["DATABASE_NAME"] = f"studymate_benchmark_{int(time.time())}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 200],
+                        help="Page count of each generated PDF")
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument("--upload-concurrency", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16],
+                        help="Concurrent /chat/query clients per level")
+    parser.add_argument("--queries", type=int, default=100, help="Questions per concurrency level")
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="Fake Groq time to first token")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=250, help="0 = instant")
+    parser.add_argument("--llm-answer-tokens", type=int, default=150)
+    parser.add_argument("--fake-embeddings", action="store_true",
+                        help="Hashing embeddings instead of the model (no model files needed)")
+    parser.add_argument("--answer-cache", action="store_true", help="Leave the semantic answer cache on")
+    parser.add_argument("--mongo-url", help="Use this MongoDB (a throwaway database) instead of the in-memory one")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="Where the corpus and indexes go (default: a temp dir)")
+    parser.add_argument("--keep", action="store_true", help="Keep the temp dir afterwards")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<timestamp>.json)")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="studymate-bench-")
+    groq = FakeGroqServer(
+        latency_ms=args.llm_latency_ms,
+        tokens_per_second=args.llm_tokens_per_second,
+        answer_tokens=args.llm_answer_tokens
+    ).start()
+
+    try:
+        _configure_environment(args, workdir, groq.base_url)
+        corpus = generate_corpus(
+            os.path.join(workdir, "corpus"), args.pages, args.seed, args.words_per_page
+        )
+        results = asyncio.run(run_benchmark(args, corpus))
+        # Before any other subprocess (git) counts as a child
+        peak_rss_mb = _peak_rss_mb()
+    finally:
+        groq.stop()
+        if not args.workdir and not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {
+        "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "options": {k: v for k, v in vars(args).items() if k not in ("output", "workdir", "keep")},
+        **results,
+        "llm": groq.stats(),
+        "peak_rss_mb": peak_rss_mb,
+    }
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, datetime.utcnow().strftime("%Y%m%d-%H%M%S") + ".json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f" Peak RSS: {results['peak_rss_mb']['process']} MB "
+          f"(extraction workers: {results['peak_rss_mb']['children']} MB)")
+    print(f"\n Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
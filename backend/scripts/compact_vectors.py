@@ -0,0 +1,74 @@
+"""Remove orphaned chunks from the vector index and reclaim their space.
+
+A chunk is orphaned when its document has no MongoDB record and no
+pending upload (a manifest in UPLOAD_DIR), e.g. documents deleted before
+the delete endpoint cleaned up the index, or ingestions that failed
+half-way. After removing orphans each collection is compacted.
+
+Usage (from backend/):
+    python -m scripts.compact_vectors --dry-run
+    python -m scripts.compact_vectors --user student@example.com
+"""
+import argparse
+import json
+import os
+from pymongo import MongoClient
+from app.config import settings
+from app.db.vector import CollectionNotFoundError, create_vector_store
+
+
+def pending_documents(upload_dir: str) -> dict:
+    # user_id -> document ids still being ingested
+    pending = {}
+    if not os.path.isdir(upload_dir):
+        return pending
+    for name in os.listdir(upload_dir):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(upload_dir, name)) as f:
+            manifest = json.load(f)
+        pending.setdefault(manifest["user_id"], set()).add(manifest["document_id"])
+    return pending
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--user", help="Only this user's collection")
+    parser.add_argument("--dry-run", action="store_true", help="Report orphans without deleting")
+    args = parser.parse_args()
+
+    store = create_vector_store()
+    documents = MongoClient(settings.MONGODB_URL)[settings.DATABASE_NAME]["documents"]
+    pending = pending_documents(settings.UPLOAD_DIR)
+
+    users = [args.user] if args.user else store.list_users()
+    total_removed = total_reclaimed = 0
+
+    for user_id in users:
+        known = set(documents.distinct("_id", {"user_id": user_id}))
+        known |= pending.get(user_id, set())
+        try:
+            orphans = sorted(store.document_ids(user_id) - known)
+        except CollectionNotFoundError:
+            print(f" {user_id}: no vector collection")
+            continue
+
+        if args.dry_run:
+            print(f" {user_id}: {len(orphans)} orphaned documents {orphans}")
+            continue
+
+        removed = store.delete_documents(user_id, orphans) if orphans else 0
+        reclaimed = store.compact(user_id)
+        total_removed += removed
+        total_reclaimed += reclaimed
+        print(f" {user_id}: {len(orphans)} orphaned documents, "
+              f"{removed} chunks removed, {reclaimed / 2**20:.2f} MB reclaimed")
+
+    if not args.dry_run:
+        print(f"\n Total: {total_removed} chunks removed, "
+              f"{total_reclaimed / 2**20:.2f} MB reclaimed, "
+              f"{store.disk_usage() / 2**20:.2f} MB on disk")
+
+
+if __name__ == "__main__":
+    main()
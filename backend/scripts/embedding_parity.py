@@ -0,0 +1,94 @@
+"""Compare the ONNX embedding backends with the sentence-transformers model.
+
+Reports cosine similarity to the reference embeddings and encode
+throughput for the reference, ONNX fp32 and ONNX int8 variants. Uses
+the saved ONNX export if there is one; otherwise exports to a temporary
+directory, so an export failing the parity check is reported, not saved.
+
+Usage (from backend/):
+    python -m scripts.embedding_parity
+    python -m scripts.embedding_parity --texts chunks.txt --threads 2
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from contextlib import ExitStack
+from app.config import settings
+from app.core.embeddings import (
+    PARITY_SENTENCES,
+    OnnxEmbeddingBackend,
+    SentenceTransformerBackend,
+    cosine_parity,
+    export_onnx_model,
+    onnx_model_dir,
+)
+
+
+def timed_encode(backend, texts):
+    start = time.perf_counter()
+    vectors = backend.encode(texts)
+    return vectors, len(texts) / (time.perf_counter() - start)
+
+
+def compare(model_dir: str, texts, threads: int) -> list:
+    reference = SentenceTransformerBackend(settings.EMBEDDING_MODEL, threads)
+    reference.encode(["warmup"])
+    expected, reference_rate = timed_encode(reference, texts)
+
+    results = [{
+        "backend": "sentence_transformers",
+        "min_cosine": 1.0,
+        "mean_cosine": 1.0,
+        "texts_per_second": reference_rate,
+        "passes": True,
+    }]
+    for quantized in (False, True):
+        backend = OnnxEmbeddingBackend(model_dir, quantized, threads)
+        backend.encode(["warmup"])
+        vectors, rate = timed_encode(backend, texts)
+        parity = cosine_parity(vectors, expected)
+        results.append({
+            "backend": "onnx-int8" if quantized else "onnx-fp32",
+            "min_cosine": parity["min_cosine"],
+            "mean_cosine": parity["mean_cosine"],
+            "texts_per_second": rate,
+            "passes": parity["min_cosine"] >= settings.EMBEDDING_PARITY_MIN_COSINE,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--texts", help="File with one text per line (default: built-in sentences)")
+    parser.add_argument("--threads", type=int, default=settings.EMBEDDING_THREADS)
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    args = parser.parse_args()
+
+    texts = PARITY_SENTENCES
+    if args.texts:
+        with open(args.texts) as f:
+            texts = [line.strip() for line in f if line.strip()]
+
+    with ExitStack() as stack:
+        model_dir = onnx_model_dir(settings.EMBEDDING_MODEL)
+        if not os.path.exists(os.path.join(model_dir, "export.json")):
+            model_dir = os.path.join(stack.enter_context(tempfile.TemporaryDirectory()), "model")
+            export_onnx_model(settings.EMBEDDING_MODEL, model_dir, min_cosine=-1)
+        results = compare(model_dir, texts, args.threads)
+
+    if args.json:
+        print(json.dumps({"model": settings.EMBEDDING_MODEL, "texts": len(texts), "results": results}, indent=2))
+        return
+
+    print(f"{settings.EMBEDDING_MODEL}: {len(texts)} texts, {args.threads or 'default'} threads\n")
+    print(f"{'backend':<24}{'min cos':>10}{'mean cos':>10}{'texts/s':>10}  parity")
+    for r in results:
+        check = "ok" if r["passes"] else f"below {settings.EMBEDDING_PARITY_MIN_COSINE}"
+        print(f"{r['backend']:<24}{r['min_cosine']:>10.4f}{r['mean_cosine']:>10.4f}"
+              f"{r['texts_per_second']:>10.1f}  {check}")
+
+
+if __name__ == "__main__":
+    main()
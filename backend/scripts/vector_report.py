@@ -0,0 +1,137 @@
+"""Memory saved and recall@k of compact vector layouts for one user.
+
+Loads the user's full-precision vectors from the configured vector store,
+encodes them with each candidate layout and compares top-k results with
+exact search. Queries are sampled stored chunks (leave-one-out).
+
+Usage (from backend/):
+    python -m scripts.vector_report --user student@example.com
+    python -m scripts.vector_report --user student@example.com \
+        --layouts float16 int8 int8:pca:128 float32:truncate:192 --k 5
+"""
+import argparse
+import json
+import numpy as np
+from app.db.quantization import VectorCodec
+from app.db.vector import create_vector_store
+
+
+def parse_layout(spec: str) -> VectorCodec:
+    # dtype[:reduction:dim], e.g. "int8" or "int8:pca:128"
+    parts = spec.split(":")
+    if len(parts) == 1:
+        return VectorCodec(dtype=parts[0])
+    dtype, reduction, dim = parts
+    return VectorCodec(dtype=dtype, reduction=reduction, reduced_dim=int(dim))
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def recall(expected: np.ndarray, found: np.ndarray) -> float:
+    k = expected.shape[1]
+    return float(np.mean([
+        len(set(e) & set(f)) / k for e, f in zip(expected, found)
+    ]))
+
+
+def evaluate(
+    vectors: np.ndarray,
+    layout: str,
+    num_queries: int,
+    k: int,
+    rescore_factor: int,
+    seed: int
+) -> dict:
+    rng = np.random.default_rng(seed)
+    query_rows = rng.choice(len(vectors), size=min(num_queries, len(vectors)), replace=False)
+    queries = vectors[query_rows]
+
+    # Exact baseline, leaving each query's own row out
+    exact = queries @ vectors.T
+    exact[np.arange(len(query_rows)), query_rows] = -np.inf
+    expected = top_k(exact, k)
+
+    codec = parse_layout(layout)
+    if codec.needs_fit():
+        if len(vectors) < codec.reduced_dim:
+            return {"layout": layout, "error": f"needs at least {codec.reduced_dim} vectors"}
+        codec.fit(vectors)
+    rows, scales = codec.encode(vectors)
+    approx = codec.scores(queries, rows, scales)
+    approx[np.arange(len(query_rows)), query_rows] = -np.inf
+
+    # Shortlist, then re-score exactly (what NumpyVectorStore does)
+    shortlist = top_k(approx, min(k * rescore_factor, len(vectors) - 1))
+    rescored = np.take_along_axis(exact, shortlist, axis=1)
+    order = np.argsort(-rescored, axis=1)[:, :k]
+    reranked = np.take_along_axis(shortlist, order, axis=1)
+
+    full_bytes = vectors.shape[1] * 4
+    compact_bytes = codec.bytes_per_vector(vectors.shape[1])
+    return {
+        "layout": layout,
+        "bytes_per_vector": compact_bytes,
+        "search_matrix_mb": compact_bytes * len(vectors) / 2**20,
+        "memory_saved_pct": 100 * (1 - compact_bytes / full_bytes),
+        f"recall@{k}": recall(expected, top_k(approx, k)),
+        f"recall@{k}_rescored": recall(expected, reranked),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--user", required=True, help="User email (collection owner)")
+    parser.add_argument(
+        "--layouts",
+        nargs="+",
+        default=["float16", "int8", "int8:pca:128", "float16:pca:192"],
+        help="dtype[:reduction:dim] layouts to compare"
+    )
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    args = parser.parse_args()
+
+    records = create_vector_store().get(args.user, include_embeddings=True)
+    vectors = records.embeddings
+    if vectors is None or len(vectors) <= args.k:
+        raise SystemExit(f"Not enough vectors for {args.user} ({len(records.ids)})")
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    results = [
+        evaluate(vectors, layout, args.queries, args.k, args.rescore_factor, args.seed)
+        for layout in args.layouts
+    ]
+
+    if args.json:
+        print(json.dumps({
+            "user": args.user,
+            "vectors": len(vectors),
+            "dim": vectors.shape[1],
+            "float32_mb": len(vectors) * vectors.shape[1] * 4 / 2**20,
+            "results": results,
+        }, indent=2))
+        return
+
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims "
+          f"({len(vectors) * vectors.shape[1] * 4 / 2**20:.2f} MB as float32)\n")
+    print(f"{'layout':<20}{'B/vec':>8}{'MB':>9}{'saved':>8}{'recall':>9}{'rescored':>10}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['layout']:<20}  skipped: {r['error']}")
+            continue
+        print(
+            f"{r['layout']:<20}{r['bytes_per_vector']:>8}{r['search_matrix_mb']:>9.2f}"
+            f"{r['memory_saved_pct']:>7.1f}%{r[f'recall@{args.k}']:>9.3f}"
+            f"{r[f'recall@{args.k}_rescored']:>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+import os
+
+# Settings are read at import time; keep tests off real services and files
+os.environ.setdefault("GROQ_API_KEY", "test")
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("EMBEDDING_CACHE_PATH", "")
+os.environ.setdefault("WARMUP_ON_STARTUP", "false")
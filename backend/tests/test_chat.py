@@ -0,0 +1,30 @@
+import asyncio
+import gc
+import warnings
+import pytest
+from fastapi import HTTPException
+from app.api import chat
+from app.db.mongodb import MongoDB
+from benchmarks.fake_mongo import FakeMongoClient
+
+
+@pytest.fixture
+def mongo():
+    MongoDB.client = FakeMongoClient()
+    yield
+    MongoDB.client = None
+
+
+@pytest.mark.parametrize("session_id", ["not-an-object-id", "6530d2f2a3b4c5d6e7f80910"])
+def test_unknown_session_is_404_without_dangling_coroutines(mongo, session_id):
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(chat._load_conversation("student@example.com", session_id))
+        status_code = error.value.status_code
+        # The traceback keeps the frames (and any unawaited coroutine) alive
+        del error
+        gc.collect()
+
+    assert status_code == 404
+    assert not [w for w in caught if "never awaited" in str(w.message)]
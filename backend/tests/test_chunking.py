@@ -0,0 +1,54 @@
+import pytest
+
+from app.core.chunking import TOKENS, TextChunker
+from benchmarks.chunking import _check, _corpus_text, _stream
+
+CHUNKERS = {
+    "chars": TextChunker(300, 60),
+    "sentences": TextChunker(300, 60, sentence_boundaries=True),
+    "tokens": TextChunker(60, 12, unit=TOKENS),
+    "no overlap": TextChunker(300, 0),
+}
+
+
+@pytest.fixture(scope="module")
+def text():
+    return _corpus_text(pages=8, seed=3)
+
+
+@pytest.mark.parametrize("name", CHUNKERS)
+def test_split_is_well_formed(name, text):
+    chunker = CHUNKERS[name]
+    spans = chunker.split(text)
+
+    assert len(spans) > 10
+    assert _check(text, spans, chunker.chunk_size, chunker.unit) == []
+    assert all(a.start < b.start for a, b in zip(spans, spans[1:]))
+
+
+@pytest.mark.parametrize("window", [97, 1000, 4096])
+@pytest.mark.parametrize("name", CHUNKERS)
+def test_streamed_split_matches_whole_text(name, window, text):
+    chunker = CHUNKERS[name]
+    assert _stream(chunker, text, window) == chunker.split(text)
+
+
+def test_unbroken_text_is_cut_at_chunk_size():
+    chunker = TextChunker(50, 10)
+    text = "x" * 175
+
+    spans = chunker.split(text)
+    assert [end - start for start, end in spans] == [50, 50, 50, 50, 15]
+    assert _stream(chunker, text, 30) == spans
+
+
+def test_short_text_is_one_chunk():
+    assert TextChunker(100, 20).split("  Short text.  ") == [(2, 13)]
+    assert TextChunker(100, 20).split("   ") == []
+
+
+def test_invalid_settings_are_rejected():
+    with pytest.raises(ValueError):
+        TextChunker(100, 100)
+    with pytest.raises(ValueError):
+        TextChunker(100, 10, unit="words")
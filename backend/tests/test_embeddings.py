@@ -0,0 +1,54 @@
+import json
+import os
+import pytest
+from app.config import settings
+from app.core import embeddings
+
+
+def _save_export(model_dir: str, fp32: float, int8: float):
+    os.makedirs(model_dir, exist_ok=True)
+    with open(os.path.join(model_dir, "export.json"), "w") as f:
+        json.dump({"parity": {
+            "fp32": {"min_cosine": fp32},
+            "int8": {"min_cosine": int8},
+        }}, f)
+
+
+def test_export_parity_is_checked_per_variant(tmp_path):
+    _save_export(str(tmp_path), fp32=0.999, int8=0.95)
+
+    assert embeddings.export_meets_parity(str(tmp_path), quantized=False, min_cosine=0.99)
+    assert not embeddings.export_meets_parity(str(tmp_path), quantized=True, min_cosine=0.99)
+
+
+@pytest.fixture
+def onnx_settings(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_ONNX_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "EMBEDDING_ONNX_QUANTIZE", True)
+    monkeypatch.setattr(settings, "EMBEDDING_PARITY_MIN_COSINE", 0.99)
+    exports = []
+
+    def export(model_name, model_dir, min_cosine):
+        exports.append(min_cosine)
+        _save_export(model_dir, fp32=0.999, int8=0.995)
+
+    monkeypatch.setattr(embeddings, "export_onnx_model", export)
+    monkeypatch.setattr(embeddings, "OnnxEmbeddingBackend", lambda model_dir, quantized, threads: model_dir)
+    return exports
+
+
+def test_export_below_the_threshold_is_redone(onnx_settings):
+    model_dir = embeddings.onnx_model_dir(settings.EMBEDDING_MODEL)
+    _save_export(model_dir, fp32=0.999, int8=0.5)  # e.g. saved by a check-less export
+
+    assert embeddings.create_embedding_backend("onnx") == model_dir
+    assert onnx_settings == [0.99]
+    assert embeddings.export_meets_parity(model_dir, quantized=True, min_cosine=0.99)
+
+
+def test_export_meeting_the_threshold_is_reused(onnx_settings):
+    model_dir = embeddings.onnx_model_dir(settings.EMBEDDING_MODEL)
+    _save_export(model_dir, fp32=0.999, int8=0.995)
+
+    assert embeddings.create_embedding_backend("onnx") == model_dir
+    assert onnx_settings == []
@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+from app.api import documents
+from app.config import settings
+from app.core.jobs import FAILED, ingestion_queue
+from app.core.lazy import LazyComponent
+from app.core.rag import rag
+from app.db.mongodb import MongoDB, db
+from app.db.vector import NumpyVectorStore
+from benchmarks.corpus import generate_pages, write_pdf
+from benchmarks.fake_embeddings import HashingEmbeddingBackend
+from benchmarks.fake_mongo import FakeMongoClient
+
+
+class _FailingEmbeddings(HashingEmbeddingBackend):
+    """Encodes the first batch, then fails."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def encode(self, texts):
+        self.calls += 1
+        if self.calls > 1:
+            raise RuntimeError("embedding backend went away")
+        return super().encode(texts)
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    MongoDB.client = FakeMongoClient()
+    store = NumpyVectorStore(str(tmp_path / "vectors"))
+    embeddings = _FailingEmbeddings()
+    monkeypatch.setitem(rag.components, "vector_store", LazyComponent("vector_store", lambda: store))
+    monkeypatch.setitem(rag.components, "embedding_model", LazyComponent("embedding_model", lambda: embeddings))
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path / "uploads"))
+    monkeypatch.setattr(settings, "INGESTION_EMBED_BATCH_SIZE", 4)
+    monkeypatch.setattr(settings, "PDF_EXTRACT_WORKERS", 1)
+    yield store, embeddings
+    MongoDB.client = None
+
+
+def test_failed_ingestion_leaves_no_chunks(pipeline, tmp_path):
+    store, embeddings = pipeline
+    (tmp_path / "uploads").mkdir()
+    file_path = str(tmp_path / "uploads" / "doc.pdf")
+    write_pdf(file_path, generate_pages(6, seed=7))
+    manifest = {
+        "document_id": "student_doc",
+        "user_id": "student@example.com",
+        "filename": "doc.pdf",
+        "file_path": file_path,
+        "content_hash": "hash-of-doc",
+    }
+    documents._write_manifest(manifest)
+
+    async def run():
+        job = documents._queue_ingestion(manifest)
+        await asyncio.gather(*ingestion_queue._tasks)
+        return job
+
+    job = asyncio.run(run())
+
+    assert job.status == FAILED
+    assert embeddings.calls == 2  # The first batch was stored before the failure
+    assert store.count_document("student@example.com", "student_doc") == 0
+    assert not (tmp_path / "uploads" / "doc.pdf").exists()
+    assert not (tmp_path / "uploads" / "student_doc.json").exists()
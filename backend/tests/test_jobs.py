@@ -0,0 +1,72 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from app.config import settings
+from app.core.jobs import DONE, FAILED, PROCESSING, IngestionQueue
+from app.db.mongodb import MongoDB, db
+from benchmarks.fake_mongo import FakeMongoClient
+
+
+@pytest.fixture
+def mongo():
+    MongoDB.client = FakeMongoClient()
+    yield db.get_db()
+    MongoDB.client = None
+
+
+def _run_jobs(queue: IngestionQueue, jobs):
+    async def run():
+        for job_id, handler in jobs:
+            queue.submit(job_id, "student@example.com", f"{job_id}.pdf", handler)
+        await asyncio.gather(*queue._tasks)
+    asyncio.run(run())
+
+
+def test_job_status_is_saved_for_other_workers(mongo):
+    async def ingest(job):
+        job.update_progress(3, 3)
+        return 3
+
+    async def broken(job):
+        raise ValueError("not a PDF")
+
+    queue = IngestionQueue(max_workers=1, max_pending=10, max_finished=0)
+    _run_jobs(queue, [("doc-1", ingest), ("doc-2", broken)])
+    queue.shutdown()
+    queue._prune()
+
+    # Pruned from memory, still answerable from MongoDB
+    assert queue.get("doc-1") is None and queue.get("doc-2") is None
+    done = asyncio.run(mongo["ingestion_jobs"].find_one({"_id": "doc-1"}))
+    failed = asyncio.run(mongo["ingestion_jobs"].find_one({"_id": "doc-2"}))
+    assert done["status"] == DONE and done["num_chunks"] == 3
+    assert done["user_id"] == "student@example.com"
+    assert failed["status"] == FAILED and failed["error"] == "not a PDF"
+    assert failed["finished_at"] is not None
+
+
+def test_only_one_worker_claims_an_interrupted_job(mongo):
+    jobs = mongo["ingestion_jobs"]
+    queue = IngestionQueue(max_workers=1, max_pending=10)
+
+    async def claim():
+        return await queue.claim("doc-1", "student@example.com", "doc-1.pdf")
+
+    # No record yet: the first claim wins, the next finds a live lease
+    assert asyncio.run(claim())
+    assert not asyncio.run(claim())
+
+    # Still processing elsewhere, lease renewed recently
+    asyncio.run(jobs.update_one({"_id": "doc-1"}, {"$set": {"status": PROCESSING, "owner": "other"}}))
+    assert not asyncio.run(claim())
+
+    # The owner stopped renewing its lease
+    stale = datetime.utcnow() - timedelta(seconds=settings.INGESTION_JOB_LEASE_SECONDS + 1)
+    asyncio.run(jobs.update_one({"_id": "doc-1"}, {"$set": {"updated_at": stale}}))
+    assert asyncio.run(claim())
+    assert not asyncio.run(claim())
+
+    # A finished job can be run again (a replacement)
+    asyncio.run(jobs.update_one({"_id": "doc-1"}, {"$set": {"status": FAILED}}))
+    assert asyncio.run(claim())
+    queue.shutdown()
@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.utils.pagination import after_cursor, decode_cursor, encode_cursor
+from benchmarks.fake_mongo import matches, sort_documents
+
+
+def test_cursor_round_trip():
+    timestamp = datetime(2024, 3, 1, 12, 30, 15, 123456)
+    cursor = encode_cursor(timestamp, "65e1c0ffee")
+
+    assert decode_cursor(cursor) == (timestamp, "65e1c0ffee")
+    # Safe to pass in a query string as is
+    assert set(cursor) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_=")
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not base64!",
+    "bm90IGpzb24=",  # "not json"
+    "eyJ0IjogInllc3RlcmRheSIsICJpZCI6ICJ4In0=",  # {"t": "yesterday", "id": "x"}
+])
+def test_cursor_rejects_what_we_did_not_issue(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_after_cursor_pages_through_ties_without_gaps():
+    start = datetime(2024, 1, 1)
+    # Pairs of items share a timestamp, so pages must break ties on _id
+    items = [{"_id": f"item{i:02d}", "timestamp": start + timedelta(minutes=i // 2)} for i in range(11)]
+    order = [("timestamp", -1), ("_id", -1)]
+
+    seen, cursor = [], None
+    while True:
+        query = {}
+        if cursor:
+            query = after_cursor("timestamp", *decode_cursor(cursor))
+        page = sort_documents([item for item in items if matches(item, query)], order)[:3]
+        seen += [item["_id"] for item in page]
+        if len(page) < 3:
+            break
+        cursor = encode_cursor(page[-1]["timestamp"], page[-1]["_id"])
+
+    assert seen == [item["_id"] for item in sort_documents(items, order)]
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from app.db.quantization import VectorCodec, quantize_int8
+
+
+def _unit_vectors(count: int, dim: int = 64, rank: int = 16, seed: int = 0) -> np.ndarray:
+    # Embedding-like: most variance in a few directions, plus noise
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, rank)) @ rng.normal(size=(rank, dim))
+    vectors += 0.1 * rng.normal(size=(count, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def test_float32_without_reduction_is_exact():
+    vectors = _unit_vectors(50)
+    codec = VectorCodec()
+    rows, scales = codec.encode(vectors)
+
+    assert codec.is_exact
+    assert scales is None
+    np.testing.assert_allclose(codec.scores(vectors[:5], rows), vectors[:5] @ vectors.T, atol=1e-6)
+
+
+@pytest.mark.parametrize("dtype, tolerance", [("float16", 1e-3), ("int8", 1e-2)])
+def test_compact_dtypes_round_trip(dtype, tolerance):
+    vectors = _unit_vectors(50)
+    codec = VectorCodec(dtype=dtype)
+    rows, scales = codec.encode(vectors)
+
+    assert rows.dtype == np.dtype(dtype)
+    decoded = rows.astype(np.float32) * (scales[:, None] if scales is not None else 1)
+    assert np.abs(decoded - vectors).max() < tolerance
+    np.testing.assert_allclose(codec.scores(vectors[:5], rows, scales), vectors[:5] @ vectors.T, atol=0.05)
+
+
+def test_int8_scales_use_the_full_range():
+    quantized, scales = quantize_int8(np.array([[0.5, -0.25], [0.0, 0.0]], dtype=np.float32))
+
+    assert quantized[0].tolist() == [127, -64]
+    assert scales[1] == 1  # All-zero rows don't divide by zero
+
+
+def test_pca_refuses_to_fit_fewer_vectors_than_axes():
+    codec = VectorCodec(dtype="int8", reduced_dim=16, reduction="pca")
+
+    with pytest.raises(ValueError):
+        codec.fit(_unit_vectors(4))
+    assert codec.needs_fit()
+
+
+def test_pca_reports_rank_below_reduced_dim():
+    codec = VectorCodec(reduced_dim=16, reduction="pca")
+    rng = np.random.default_rng(0)
+    low_rank = rng.normal(size=(100, 4)) @ rng.normal(size=(4, 64))
+
+    assert codec.fit(low_rank) == 4
+    assert codec.output_dim(64) == 16  # Never silently smaller than configured
+
+
+@pytest.mark.parametrize("dtype, reduction, reduced_dim", [
+    ("float16", "none", 0),
+    ("int8", "none", 0),
+    ("int8", "pca", 16),
+    ("float16", "pca", 16),
+])
+def test_rescoring_recovers_exact_top_k(dtype, reduction, reduced_dim):
+    vectors = _unit_vectors(1000)
+    queries = _unit_vectors(50, seed=1)
+    k, rescore_factor = 5, 4
+
+    codec = VectorCodec(dtype=dtype, reduced_dim=reduced_dim, reduction=reduction)
+    if codec.needs_fit():
+        codec.fit(vectors)
+    rows, scales = codec.encode(vectors)
+
+    exact = queries @ vectors.T
+    expected = _top_k(exact, k)
+    shortlist = _top_k(codec.scores(queries, rows, scales), k * rescore_factor)
+    rescored = np.take_along_axis(exact, shortlist, axis=1)
+    found = np.take_along_axis(shortlist, _top_k(rescored, k), axis=1)
+
+    recall = np.mean([len(set(e) & set(f)) / k for e, f in zip(expected, found)])
+    assert recall >= 0.95
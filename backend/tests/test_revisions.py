@@ -0,0 +1,113 @@
+from typing import List, Tuple
+
+from app.core import pdf
+from app.core.chunking import TextChunker
+from app.core.revisions import PageIndex, plan_revision
+
+DOCUMENT_ID = "doc"
+CHUNKER = TextChunker(chunk_size=200, chunk_overlap=40)
+
+
+def _page(number: int) -> str:
+    return " ".join(f"Page {number} makes point {i} about topic {number * 7 + i}." for i in range(20))
+
+
+def _ingest(pages: List[str]) -> Tuple[List[str], List[dict], List[str]]:
+    """Chunk ids, metadatas and texts, as ingestion stores them."""
+    text = pdf.PAGE_SEPARATOR.join(pages)
+    page_starts = PageIndex.from_pages(pages).starts()
+    ids, metadatas, texts = [], [], []
+    for i, (start, end) in enumerate(CHUNKER.split(text)):
+        ids.append(f"{DOCUMENT_ID}_chunk_{i}")
+        texts.append(text[start:end])
+        metadatas.append({
+            "document_id": DOCUMENT_ID,
+            "chunk_index": i,
+            "char_start": start,
+            "char_end": end,
+            "page_start": pdf.page_for_offset(page_starts, start),
+            "page_end": pdf.page_for_offset(page_starts, end - 1),
+        })
+    return ids, metadatas, texts
+
+
+def _plan(old_pages: List[str], new_pages: List[str]):
+    ids, metadatas, texts = _ingest(old_pages)
+    new_text = pdf.PAGE_SEPARATOR.join(new_pages)
+    plan = plan_revision(
+        PageIndex.from_pages(old_pages),
+        PageIndex.from_pages(new_pages),
+        new_text,
+        ids,
+        metadatas,
+        DOCUMENT_ID,
+        revision=1
+    )
+    return plan, dict(zip(ids, texts)), new_text
+
+
+def _check_plan(plan, old_texts: dict, new_text: str):
+    # Kept chunks point at the same text in the new version
+    for chunk_id, metadata in plan.kept:
+        assert new_text[metadata["char_start"]:metadata["char_end"]] == old_texts[chunk_id]
+    assert {chunk_id for chunk_id, _ in plan.kept}.isdisjoint(plan.removed)
+    assert len(plan.kept) + len(plan.removed) == len(old_texts)
+
+    # Together, kept chunks and the spans to split again cover all the text
+    covered = [False] * len(new_text)
+    ranges = [(m["char_start"], m["char_end"]) for _, m in plan.kept] + plan.spans
+    for start, end in ranges:
+        covered[start:end] = [True] * (end - start)
+    assert all(covered[i] or new_text[i].isspace() for i in range(len(new_text)))
+
+
+def test_unchanged_pages_keep_every_chunk():
+    pages = [_page(n) for n in range(5)]
+    plan, old_texts, new_text = _plan(pages, pages)
+
+    assert plan.changed_pages == 0
+    assert plan.removed == [] and plan.spans == []
+    assert len(plan.kept) == len(old_texts)
+    _check_plan(plan, old_texts, new_text)
+
+
+def test_inserted_page_shifts_the_chunks_after_it():
+    old = [_page(n) for n in range(5)]
+    new = old[:2] + [_page(99)] + old[2:]
+    plan, old_texts, new_text = _plan(old, new)
+
+    assert plan.changed_pages == 1
+    _check_plan(plan, old_texts, new_text)
+    # Only the text around the new page is split again
+    assert len(plan.spans) == 1
+    start, end = plan.spans[0]
+    assert new_text.index(new[2]) >= start and new_text.index(new[3]) < end
+    assert end - start < len(new_text) / 2
+    # Chunks of the last pages moved one page down
+    kept = dict(plan.kept)
+    last = max(kept, key=lambda chunk_id: kept[chunk_id]["char_start"])
+    assert kept[last]["page_end"] == 6
+
+
+def test_removed_page_drops_its_chunks():
+    old = [_page(n) for n in range(5)]
+    new = old[:1] + old[2:]
+    plan, old_texts, new_text = _plan(old, new)
+
+    assert plan.changed_pages == 0
+    _check_plan(plan, old_texts, new_text)
+    # Nothing kept still holds text of the removed page
+    assert all("Page 1 " not in old_texts[chunk_id] for chunk_id, _ in plan.kept)
+    assert any("Page 1 " in old_texts[chunk_id] for chunk_id in plan.removed)
+    assert max(metadata["page_end"] for _, metadata in plan.kept) == 4
+
+
+def test_without_old_page_hashes_everything_is_split_again():
+    pages = [_page(n) for n in range(3)]
+    ids, metadatas, _ = _ingest(pages)
+    new_text = pdf.PAGE_SEPARATOR.join(pages)
+    plan = plan_revision(None, PageIndex.from_pages(pages), new_text, ids, metadatas, DOCUMENT_ID, 1)
+
+    assert plan.kept == [] and plan.removed == ids
+    assert plan.spans == [(0, len(new_text))]
+    assert plan.changed_pages == 3
@@ -0,0 +1,191 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+from app.db.vector import (
+    CHROMA_SQLITE_FILE,
+    ChromaVectorStore,
+    CollectionNotFoundError,
+    NumpyVectorStore,
+)
+
+
+def _vectors(count: int, dim: int = 16, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+
+
+def _metadatas(document_id: str, count: int):
+    return [{"document_id": document_id, "chunk_index": i} for i in range(count)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return NumpyVectorStore(str(tmp_path / "vectors"))
+
+
+class _ChromaCollection:
+    """Mimics Chroma: get(ids=[]) applies no filter and returns every id."""
+
+    def __init__(self, ids):
+        self.ids = list(ids)
+
+    def get(self, ids=None, where=None, include=None):
+        if ids:
+            return {"ids": [id_ for id_ in ids if id_ in self.ids]}
+        return {"ids": list(self.ids)}
+
+    def delete(self, ids):
+        self.ids = [id_ for id_ in self.ids if id_ not in ids]
+
+
+class _ChromaClient:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def get_collection(self, name):
+        return self.collection
+
+
+def test_chroma_delete_with_no_ids_deletes_nothing():
+    collection = _ChromaCollection(["a_chunk_0", "a_chunk_1", "b_chunk_0"])
+    store = ChromaVectorStore.__new__(ChromaVectorStore)
+    store.client = _ChromaClient(collection)
+
+    assert store.delete("user", []) == 0
+    assert store.delete_documents("user", []) == 0
+    assert collection.ids == ["a_chunk_0", "a_chunk_1", "b_chunk_0"]
+
+    assert store.delete("user", ["a_chunk_1"]) == 1
+    assert collection.ids == ["a_chunk_0", "b_chunk_0"]
+
+
+def test_numpy_delete_with_no_ids_deletes_nothing(store):
+    store.upsert("user", ["a_chunk_0", "a_chunk_1"], _vectors(2), ["x", "y"], _metadatas("a", 2))
+
+    assert store.delete("user", []) == 0
+    assert store.delete_documents("user", []) == 0
+    assert store.count_document("user", "a") == 2
+
+
+def test_pca_is_fit_once_there_are_enough_vectors(tmp_path):
+    store = NumpyVectorStore(str(tmp_path / "vectors"), dtype="int8", reduced_dim=4, reduction="pca")
+    vectors = _vectors(20)
+
+    # A single first chunk must not fix the layout at one dimension
+    store.upsert("user", ["a_chunk_0"], vectors[:1], ["x"], _metadatas("a", 1))
+    stats = store.stats("user")
+    assert (stats["reduction"], stats["compact_dim"], stats["pending_pca_dim"]) == ("none", 16, 4)
+    assert store.query("user", vectors[:1], 1)[0][0].id == "a_chunk_0"
+
+    ids = [f"b_chunk_{i}" for i in range(19)]
+    store.upsert("user", ids, vectors[1:], ["y"] * 19, _metadatas("b", 19))
+    stats = store.stats("user")
+    assert (stats["reduction"], stats["compact_dim"], stats["pending_pca_dim"]) == ("pca", 4, 0)
+
+    # Another process opening the directory sees the fitted layout
+    reopened = NumpyVectorStore(str(tmp_path / "vectors"), dtype="int8", reduced_dim=4, reduction="pca")
+    assert reopened.stats("user")["compact_dim"] == 4
+    hits = reopened.query("user", vectors[5:6], 1)[0]
+    assert hits[0].id == "b_chunk_4"
+
+
+def test_chroma_compact_vacuums_its_database(tmp_path):
+    database = sqlite3.connect(str(tmp_path / CHROMA_SQLITE_FILE))
+    database.execute("CREATE TABLE embeddings (id TEXT, document TEXT)")
+    database.executemany(
+        "INSERT INTO embeddings VALUES (?, ?)",
+        [(f"chunk_{i}", "x" * 1000) for i in range(500)]
+    )
+    database.commit()
+    database.execute("DELETE FROM embeddings")
+    database.commit()
+    database.close()
+
+    store = ChromaVectorStore.__new__(ChromaVectorStore)
+    store.path = str(tmp_path)
+    store.client = _ChromaClient(_ChromaCollection([]))
+
+    before = store.disk_usage()
+    reclaimed = store.compact("user")
+    assert reclaimed > 0
+    assert store.disk_usage() == before - reclaimed
+    # Nothing left to free
+    assert store.compact("user") == 0
+
+
+def test_numpy_upsert_replaces_rows_with_the_same_id(store):
+    vectors = _vectors(4)
+    store.upsert("user", ["a_chunk_0", "a_chunk_1"], vectors[:2], ["x", "y"], _metadatas("a", 2))
+    store.upsert("user", ["a_chunk_1", "a_chunk_2"], vectors[2:], ["y2", "z"], _metadatas("a", 2))
+
+    records = store.get("user", "a", include_embeddings=True)
+    assert sorted(records.ids) == ["a_chunk_0", "a_chunk_1", "a_chunk_2"]
+    by_id = dict(zip(records.ids, records.documents))
+    assert by_id["a_chunk_1"] == "y2"
+    hit = store.query("user", vectors[2:3], 1)[0][0]
+    assert (hit.id, hit.document) == ("a_chunk_1", "y2")
+
+
+def test_numpy_delete_removes_chunks_from_search(store):
+    vectors = _vectors(6)
+    store.upsert("user", [f"a_chunk_{i}" for i in range(3)], vectors[:3], ["a"] * 3, _metadatas("a", 3))
+    store.upsert("user", [f"b_chunk_{i}" for i in range(3)], vectors[3:], ["b"] * 3, _metadatas("b", 3))
+
+    assert store.delete("user", ["a_chunk_0", "missing"]) == 1
+    assert store.delete_documents("user", ["b"]) == 3
+    assert store.document_ids("user") == {"a"}
+
+    hits = store.query("user", vectors[:1], 6)[0]
+    assert {hit.id for hit in hits} == {"a_chunk_1", "a_chunk_2"}
+
+
+def test_numpy_compact_reclaims_deleted_rows(tmp_path):
+    path = str(tmp_path / "vectors")
+    store = NumpyVectorStore(path, dtype="int8")
+    vectors = _vectors(40)
+    store.upsert("user", [f"a_chunk_{i}" for i in range(20)], vectors[:20], ["a"] * 20, _metadatas("a", 20))
+    store.upsert("user", [f"b_chunk_{i}" for i in range(20)], vectors[20:], ["b"] * 20, _metadatas("b", 20))
+    store.delete_documents("user", ["a"])
+
+    before = store.disk_usage()
+    reclaimed = store.compact("user")
+    assert reclaimed > 0
+    assert store.disk_usage() == before - reclaimed
+    assert store.compact("user") == 0
+
+    # Surviving rows are intact, here and in a freshly opened store
+    for opened in (store, NumpyVectorStore(path, dtype="int8")):
+        assert opened.count_document("user", "b") == 20
+        assert opened.count_document("user", "a") == 0
+        assert opened.query("user", vectors[25:26], 1)[0][0].id == "b_chunk_5"
+
+
+def test_numpy_compact_without_a_collection(store):
+    with pytest.raises(CollectionNotFoundError):
+        store.compact("nobody")
+
+
+def test_numpy_chunk_hash_lookup_is_scoped_to_the_embedding_model(tmp_path):
+    path = str(tmp_path / "vectors")
+    store = NumpyVectorStore(path)
+    vectors = _vectors(2)
+    metadatas = [
+        {"document_id": "a", "chunk_index": 0, "chunk_hash": "h", "embedding_model": "model-a"},
+        {"document_id": "b", "chunk_index": 0, "chunk_hash": "h", "embedding_model": "model-b"},
+    ]
+    store.upsert("user", ["a_chunk_0", "b_chunk_0"], vectors, ["x", "x"], metadatas)
+    # Chunks stored before models were recorded are never reused
+    legacy = [{"document_id": "c", "chunk_index": 0, "chunk_hash": "g"}]
+    store.upsert("user", ["c_chunk_0"], _vectors(1, seed=1), ["y"], legacy)
+
+    for opened in (store, NumpyVectorStore(path)):
+        found = opened.find_by_chunk_hash("user", ["h", "g"], "model-a")
+        assert list(found) == ["h"]
+        np.testing.assert_allclose(found["h"], vectors[0] / np.linalg.norm(vectors[0]), atol=1e-6)
+        assert list(opened.find_by_chunk_hash("user", ["h"], "model-b")) == ["h"]
+        assert opened.find_by_chunk_hash("user", ["h", "g"], "model-c") == {}
+
+    store.delete_documents("user", ["b"])
+    assert store.find_by_chunk_hash("user", ["h"], "model-b") == {}
+    assert list(store.find_by_chunk_hash("user", ["h"], "model-a")) == ["h"]
@@ -46,6 +46,7 @@ export function ChatInterface({ className }: ChatInterfaceProps) {
   const [isLoading, setIsLoading] = useState(false);
   const [selectedDocIds, setSelectedDocIds] = useState<string[]>([]);
   const [showDocSelector, setShowDocSelector] = useState(false);
+  const sessionIdRef = useRef<string | null>(null);
   const messagesEndRef = useRef<HTMLDivElement>(null);
   const textareaRef = useRef<HTMLTextAreaElement>(null);
   const { toast } = useToast();
@@ -59,7 +60,7 @@ export function ChatInterface({ className }: ChatInterfaceProps) {
   useEffect(() => {
     const loadHistory = async () => {
       try {
-        const history = await chatApi.history();
+        const { items: history } = await chatApi.history({ view: 'full' });
         const formattedMessages: Message[] = [];
         
         history.forEach((item: ChatHistoryItem) => {
@@ -73,7 +74,7 @@ export function ChatInterface({ className }: ChatInterfaceProps) {
             id: `a-${item.timestamp}`,
             type: 'assistant',
             content: item.answer,
-            sources: item.sources,
+            sources: item.sources ?? undefined,
             timestamp: new Date(item.timestamp),
           });
         });
@@ -104,9 +105,15 @@ export function ChatInterface({ className }: ChatInterfaceProps) {
     setIsLoading(true);
 
     try {
+      // Follow-up questions are answered in the context of this conversation
+      if (!sessionIdRef.current) {
+        sessionIdRef.current = (await chatApi.createSession())._id;
+      }
+
       const response = await chatApi.query({
         message: userMessage.content,
         document_ids: selectedDocIds.length > 0 ? selectedDocIds : undefined,
+        session_id: sessionIdRef.current,
       });
 
       const assistantMessage: Message = {
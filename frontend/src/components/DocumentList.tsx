@@ -2,10 +2,10 @@
 // Document List Component
 // ===================================
 
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
 import { format } from 'date-fns';
-import { FileText, Trash2, MoreVertical, Search, Layers } from 'lucide-react';
+import { FileText, Trash2, MoreVertical, Search, Layers, RefreshCw } from 'lucide-react';
 import { documentsApi } from '@/services/api';
 import { Document } from '@/types/api';
 import { Button } from '@/components/ui/button';
@@ -49,6 +49,9 @@ export function DocumentList({
   const [searchQuery, setSearchQuery] = useState('');
   const [deleteDocId, setDeleteDocId] = useState<string | null>(null);
   const [isDeleting, setIsDeleting] = useState(false);
+  const [replaceDocId, setReplaceDocId] = useState<string | null>(null);
+  const [replacingId, setReplacingId] = useState<string | null>(null);
+  const replaceInputRef = useRef<HTMLInputElement>(null);
   const { toast } = useToast();
 
   const fetchDocuments = async () => {
@@ -94,6 +97,34 @@ export function DocumentList({
     }
   };
 
+  const handleReplace = async (e: React.ChangeEvent<HTMLInputElement>) => {
+    const file = e.target.files?.[0];
+    e.target.value = '';
+    if (!file || !replaceDocId) return;
+
+    const docId = replaceDocId;
+    try {
+      setReplacingId(docId);
+      const result = await documentsApi.replace(docId, file);
+      setDocuments(prev => prev.map(d =>
+        d.id === docId ? { ...d, filename: result.filename, num_chunks: result.chunks } : d
+      ));
+      toast({
+        title: 'Document updated',
+        description: `${result.filename} now has ${result.chunks} chunks`,
+      });
+    } catch (error) {
+      toast({
+        title: 'Update failed',
+        description: 'Could not replace the document',
+        variant: 'destructive',
+      });
+    } finally {
+      setReplacingId(null);
+      setReplaceDocId(null);
+    }
+  };
+
   const handleSelect = (docId: string) => {
     if (!selectable || !onDocumentSelect) return;
 
@@ -119,6 +150,14 @@ export function DocumentList({
 
   return (
     <div className="space-y-4">
+      <input
+        ref={replaceInputRef}
+        type="file"
+        accept=".pdf"
+        className="hidden"
+        onChange={handleReplace}
+      />
+
       {/* Search */}
       {documents.length > 0 && (
         <div className="relative">
@@ -190,6 +229,7 @@ export function DocumentList({
                             <Layers className="h-3 w-3" />
                             {doc.num_chunks} chunks
                           </span>
+                          {replacingId === doc.id && <Spinner size="sm" />}
                         </div>
                       </div>
                       {!selectable && (
@@ -205,6 +245,17 @@ export function DocumentList({
                             </Button>
                           </DropdownMenuTrigger>
                           <DropdownMenuContent align="end">
+                            <DropdownMenuItem
+                              disabled={replacingId === doc.id}
+                              onClick={(e) => {
+                                e.stopPropagation();
+                                setReplaceDocId(doc.id);
+                                replaceInputRef.current?.click();
+                              }}
+                            >
+                              <RefreshCw className="h-4 w-4 mr-2" />
+                              Upload new version
+                            </DropdownMenuItem>
                             <DropdownMenuItem
                               className="text-destructive focus:text-destructive"
                               onClick={(e) => {
@@ -37,7 +37,10 @@ export default function DashboardPage() {
       try {
         const [documents, chatHistory] = await Promise.all([
           documentsApi.list(),
-          chatApi.history().catch(() => []),
+          chatApi
+            .history({ view: 'summary', limit: 100 })
+            .then((page) => page.items)
+            .catch(() => []),
         ]);
 
         setStats({
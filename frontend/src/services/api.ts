@@ -10,9 +10,14 @@ import {
   LoginRequest,
   Document,
   UploadResponse,
+  UploadQueuedResponse,
+  DocumentStatus,
   ChatQuery,
   ChatResponse,
   ChatHistoryItem,
+  ChatHistoryView,
+  ChatSession,
+  Page,
   ApiError,
 } from '@/types/api';
 
@@ -109,26 +114,75 @@ export const authApi = {
 
 export const documentsApi = {
   /**
-   * Upload a PDF document
+   * Upload a PDF document and wait until it has been processed
    */
   upload: async (file: File): Promise<UploadResponse> => {
     const formData = new FormData();
     formData.append('file', file);
     
-    const response = await apiClient.post<UploadResponse>('/documents/upload', formData, {
+    const response = await apiClient.post<UploadQueuedResponse>('/documents/upload', formData, {
       headers: {
         'Content-Type': 'multipart/form-data',
       },
     });
+    return documentsApi.waitForProcessing(response.data);
+  },
+
+  /**
+   * Upload a new version of a document (same ID) and wait until it has
+   * been processed; only changed pages are re-processed
+   */
+  replace: async (documentId: string, file: File): Promise<UploadResponse> => {
+    const formData = new FormData();
+    formData.append('file', file);
+
+    const response = await apiClient.put<UploadQueuedResponse>(`/documents/${documentId}`, formData, {
+      headers: {
+        'Content-Type': 'multipart/form-data',
+      },
+    });
+    return documentsApi.waitForProcessing(response.data);
+  },
+
+  /**
+   * Processing runs in the background - poll until it finishes
+   */
+  waitForProcessing: async ({ document_id, filename }: UploadQueuedResponse): Promise<UploadResponse> => {
+    for (;;) {
+      const status = await documentsApi.status(document_id);
+      if (status.status === 'done') {
+        return { document_id, filename, chunks: status.num_chunks ?? 0 };
+      }
+      if (status.status === 'failed') {
+        throw new Error(status.error || 'Processing failed');
+      }
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+    }
+  },
+
+  /**
+   * Get the processing status of an uploaded document
+   */
+  status: async (documentId: string): Promise<DocumentStatus> => {
+    const response = await apiClient.get<DocumentStatus>(`/documents/${documentId}/status`);
     return response.data;
   },
 
   /**
-   * List all uploaded documents
+   * List all uploaded documents (follows pagination cursors)
    */
   list: async (): Promise<Document[]> => {
-    const response = await apiClient.get<Document[]>('/documents/list');
-    return response.data;
+    const documents: Document[] = [];
+    let cursor: string | null = null;
+    do {
+      const response: { data: Page<Document> } = await apiClient.get<Page<Document>>(
+        '/documents/list',
+        { params: { limit: 100, cursor: cursor ?? undefined } }
+      );
+      documents.push(...response.data.items);
+      cursor = response.data.next_cursor;
+    } while (cursor);
+    return documents;
   },
 
   /**
@@ -153,10 +207,30 @@ export const chatApi = {
   },
 
   /**
-   * Get chat history
+   * Start a conversation; send its id with each question as session_id
+   */
+  createSession: async (): Promise<ChatSession> => {
+    const response = await apiClient.post<ChatSession>('/chat/sessions');
+    return response.data;
+  },
+
+  /**
+   * Get one page of chat history, newest first
+   */
+  history: async (
+    options: { view?: ChatHistoryView; limit?: number; cursor?: string } = {}
+  ): Promise<Page<ChatHistoryItem>> => {
+    const response = await apiClient.get<Page<ChatHistoryItem>>('/chat/history', {
+      params: options,
+    });
+    return response.data;
+  },
+
+  /**
+   * Get a single chat entry with its full answer and sources
    */
-  history: async (): Promise<ChatHistoryItem[]> => {
-    const response = await apiClient.get<ChatHistoryItem[]>('/chat/history');
+  historyEntry: async (entryId: string): Promise<ChatHistoryItem> => {
+    const response = await apiClient.get<ChatHistoryItem>(`/chat/history/${entryId}`);
     return response.data;
   },
 };
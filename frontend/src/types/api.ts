@@ -39,10 +39,38 @@ export interface UploadResponse {
   chunks: number;
 }
 
+export interface UploadQueuedResponse {
+  message: string;
+  document_id: string;
+  job_id: string;
+  filename: string;
+  status: DocumentStatusValue;
+  revision?: number; // Replacements only
+}
+
+export type DocumentStatusValue = 'queued' | 'processing' | 'done' | 'failed';
+
+export interface DocumentStatus {
+  document_id: string;
+  status: DocumentStatusValue;
+  chunks_processed: number;
+  chunks_total: number | null;
+  num_chunks: number | null;
+  error: string | null;
+}
+
 // Chat Types
 export interface ChatQuery {
   message: string;
   document_ids?: string[];
+  session_id?: string; // Continue a conversation
+}
+
+export interface ChatSession {
+  _id: string;
+  turns: number;
+  created_at: string;
+  updated_at: string;
 }
 
 export interface ChatSource {
@@ -55,16 +83,26 @@ export interface ChatSource {
 export interface ChatResponse {
   answer: string;
   sources: ChatSource[];
+  session_id: string | null;
   timestamp: string;
 }
 
 export interface ChatHistoryItem {
+  _id: string;
   question: string;
   answer: string;
-  sources: ChatSource[];
+  answer_truncated: boolean;
+  sources: ChatSource[] | null; // null in the summary view
   timestamp: string;
 }
 
+export type ChatHistoryView = 'summary' | 'full';
+
+export interface Page<T> {
+  items: T[];
+  next_cursor: string | null;
+}
+
 // API Error Type
 export interface ApiError {
   message: string;